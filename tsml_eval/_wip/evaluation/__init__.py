@@ -21,6 +21,10 @@ __all__ = [
     "metric_result_to_summary",
     "from_metric_dataset_format_to_metric_summary",
     "from_metric_summary_to_dataset_format",
+    "bootstrap_confidence_intervals",
+    "metric_result_to_bootstrap_summary",
+    "StreamingMetricAggregator",
+    "stream_experiment_metrics",
 ]
 
 from tsml_eval._wip.evaluation._bulit_in_evaluation import fetch_classifier_metric
@@ -30,3 +34,25 @@ from tsml_eval._wip.evaluation._result_evaluation import (
     evaluate_metric_results,
     evaluate_raw_results,
 )
+from tsml_eval._wip.evaluation._utils import (
+    Dataset,
+    Estimator,
+    EstimatorExperiment,
+    EstimatorMetricResults,
+    Experiment,
+    ExperimentResamples,
+    MetricCallable,
+    MetricResults,
+    StreamingMetricAggregator,
+    bootstrap_confidence_intervals,
+    extract_estimator_experiment,
+    from_metric_dataset_format_to_metric_summary,
+    from_metric_summary_to_dataset_format,
+    metric_result_to_bootstrap_summary,
+    metric_result_to_summary,
+    read_clusterer_result_from_uea_format,
+    read_metric_results,
+    read_results_from_uea_format,
+    resolve_experiment_paths,
+    stream_experiment_metrics,
+)
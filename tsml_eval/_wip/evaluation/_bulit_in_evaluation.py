@@ -5,8 +5,8 @@ from typing import List, Union
 import numpy as np
 import pandas as pd
 
-from tsml_eval.evaluation._result_evaluation import evaluate_metric_results
-from tsml_eval.evaluation._utils import MetricResults, metric_result_to_summary
+from tsml_eval._wip.evaluation._result_evaluation import evaluate_metric_results
+from tsml_eval._wip.evaluation._utils import MetricResults, metric_result_to_summary
 
 ListOrString = Union[List[str], str]
 
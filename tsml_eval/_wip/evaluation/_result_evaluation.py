@@ -23,7 +23,7 @@ from sklearn.metrics import (
     top_k_accuracy_score,
 )
 
-from tsml_eval.evaluation._utils import (
+from tsml_eval._wip.evaluation._utils import (
     EstimatorMetricResults,
     Experiment,
     MetricCallable,
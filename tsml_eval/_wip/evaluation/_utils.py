@@ -8,6 +8,7 @@ from typing import Callable, Dict, List, Tuple, TypedDict, Union
 
 import numpy as np
 import pandas as pd
+from scipy.stats import rankdata
 
 
 # Typing for experiment reading
@@ -447,6 +448,211 @@ def _csv_results_to_metric(
     return metric_results
 
 
+class StreamingMetricAggregator:
+    """Aggregate metric results over resamples one results file at a time.
+
+    Running count, mean, variance (using Welford's algorithm), min and max are kept
+    for each (estimator, dataset, metric), so memory is constant in the number of
+    resample files consumed.
+
+    Parameters
+    ----------
+    metric_callables: List[MetricCallable]
+        List of metric callables to evaluate each results file with.
+    """
+
+    def __init__(self, metric_callables: List[MetricCallable]):
+        self.metric_callables = metric_callables
+        self.metric_names = [metric["name"] for metric in metric_callables]
+        # (estimator, dataset) -> array of count, mean, m2, min and max per metric
+        self._stats = {}
+
+    def update(self, estimator: str, dataset: str, metric_values: Dict) -> None:
+        """Add the metric values of a single resample.
+
+        Parameters
+        ----------
+        estimator: str
+            Name of the estimator.
+        dataset: str
+            Name of the dataset.
+        metric_values: Dict
+            Dict of {'metric_name': metric_value} for every metric name.
+        """
+        values = np.array([metric_values[name] for name in self.metric_names])
+
+        stats = self._stats.get((estimator, dataset), None)
+        if stats is None:
+            stats = np.zeros((5, len(values)))
+            stats[3] = np.inf
+            stats[4] = -np.inf
+            self._stats[(estimator, dataset)] = stats
+
+        stats[0] += 1
+        delta = values - stats[1]
+        stats[1] += delta / stats[0]
+        stats[2] += delta * (values - stats[1])
+        np.minimum(stats[3], values, out=stats[3])
+        np.maximum(stats[4], values, out=stats[4])
+
+    def update_from_file(self, csv_path: str, estimator: str, dataset: str) -> None:
+        """Evaluate a results file and add its metric values.
+
+        Parameters
+        ----------
+        csv_path: str
+            Path to csv file containing the results of a single resample.
+        estimator: str
+            Name of the estimator.
+        dataset: str
+            Name of the dataset.
+        """
+        self.update(
+            estimator,
+            dataset,
+            _csv_results_to_metric(csv_path, self.metric_callables),
+        )
+
+    def summary(self) -> pd.DataFrame:
+        """Summarise the metrics consumed so far.
+
+        Returns
+        -------
+        pd.DataFrame
+            Data frame of the format:
+            ------------------------------------------------------------------
+            | estimator | dataset | metric | count | mean | std | min | max |
+            | cls1      | data1   | ACC    | 30    | 0.8  | 0.1 | 0.6 | 0.9 |
+            ------------------------------------------------------------------
+            std is the sample standard deviation, NaN for a single resample.
+        """
+        rows = []
+        for (estimator, dataset), stats in self._stats.items():
+            count = stats[0]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                std = np.sqrt(stats[2] / (count - 1))
+            std[count < 2] = np.nan
+            for i, metric_name in enumerate(self.metric_names):
+                rows.append(
+                    [
+                        estimator,
+                        dataset,
+                        metric_name,
+                        int(count[i]),
+                        stats[1, i],
+                        std[i],
+                        stats[3, i],
+                        stats[4, i],
+                    ]
+                )
+
+        return pd.DataFrame(
+            rows,
+            columns=[
+                "estimator",
+                "dataset",
+                "metric",
+                "count",
+                "mean",
+                "std",
+                "min",
+                "max",
+            ],
+        )
+
+    def rank_summary(self) -> pd.DataFrame:
+        """Summarise the rank of each estimator by its mean metric on each dataset.
+
+        Only datasets with results for every estimator are ranked. Higher metric
+        values are given better ranks, ties are given the average rank.
+
+        Returns
+        -------
+        pd.DataFrame
+            Data frame of the format:
+            --------------------------------------------------------
+            | estimator | metric | average_rank | wins | datasets |
+            | cls1      | ACC    | 1.5          | 10   | 20       |
+            --------------------------------------------------------
+        """
+        estimators = sorted({key[0] for key in self._stats})
+        datasets = sorted({key[1] for key in self._stats})
+        estimator_index = {e: i for i, e in enumerate(estimators)}
+        dataset_index = {d: i for i, d in enumerate(datasets)}
+
+        means = np.full(
+            (len(self.metric_names), len(estimators), len(datasets)), np.nan
+        )
+        for (estimator, dataset), stats in self._stats.items():
+            means[:, estimator_index[estimator], dataset_index[dataset]] = stats[1]
+
+        rows = []
+        for i, metric_name in enumerate(self.metric_names):
+            complete = means[i][:, ~np.isnan(means[i]).any(axis=0)]
+            ranks = rankdata(-complete, axis=0)
+            for j, estimator in enumerate(estimators):
+                rows.append(
+                    [
+                        estimator,
+                        metric_name,
+                        ranks[j].mean() if ranks.shape[1] > 0 else np.nan,
+                        int(np.count_nonzero(ranks[j] == 1)),
+                        ranks.shape[1],
+                    ]
+                )
+
+        return pd.DataFrame(
+            rows, columns=["estimator", "metric", "average_rank", "wins", "datasets"]
+        )
+
+
+def stream_experiment_metrics(
+    path: str,
+    experiment_name: str,
+    metric_callables: List[MetricCallable],
+    split: str = "test",
+) -> StreamingMetricAggregator:
+    """Evaluate the results files of an experiment one at a time.
+
+    Unlike extract_estimator_experiment, no per resample metric lists or data frames
+    are created, each file is evaluated and folded into a StreamingMetricAggregator.
+
+    Parameters
+    ----------
+    path: str
+        Path to an experiment directory. See resolve_experiment_paths.
+    experiment_name: str
+        Name of the experiment results reading in.
+    metric_callables: List[MetricCallable]
+        List of metric callables to use.
+    split: str, default='test'
+        Either 'test' or 'train'.
+
+    Returns
+    -------
+    StreamingMetricAggregator
+        Aggregator containing the summary statistics of every estimator experiment.
+        Estimators are named estimator_name if there is a single experiment for the
+        estimator, else estimator_name:::experiment_name.
+    """
+    if split != "test" and split != "train":
+        raise ValueError("split must be test or train")
+
+    aggregator = StreamingMetricAggregator(metric_callables)
+    experiment = resolve_experiment_paths(path, experiment_name)
+    for estimator in experiment["estimators"]:
+        for estimator_experiment in estimator["experiment_results"]:
+            name = estimator["estimator_name"]
+            if len(estimator["experiment_results"]) > 1:
+                name = f"{name}:::{estimator_experiment['experiment_name']}"
+
+            for dataset in estimator_experiment["datasets"]:
+                for resample in dataset["resamples"][f"{split}_resamples"]:
+                    aggregator.update_from_file(resample, name, dataset["dataset_name"])
+
+    return aggregator
+
+
 class EstimatorMetricResults(TypedDict):
     estimator_name: str
     result: pd.DataFrame
@@ -585,6 +791,203 @@ def metric_result_to_summary(
         return test_data, train_data
 
 
+def _metric_results_to_array(
+    result: List[MetricResults], metric_name: str, split: str = "test"
+) -> Tuple[List[str], List[str], np.ndarray]:
+    """Stack the results of a metric into an (estimators, datasets, resamples) array.
+
+    Only datasets present for every estimator are kept. Estimators with fewer
+    resamples are padded with NaN.
+
+    Parameters
+    ----------
+    result: List[MetricResults]
+        Metric results to convert.
+    metric_name: str
+        Name of the metric to extract.
+    split: str, default='test'
+        Either 'test' or 'train'.
+
+    Returns
+    -------
+    List[str]
+        The estimator names.
+    List[str]
+        The dataset names.
+    np.ndarray
+        3d array of shape (n_estimators, n_datasets, n_resamples).
+    """
+    if split != "test" and split != "train":
+        raise ValueError("split must be test or train")
+
+    metric_result = None
+    for curr_metric_result in result:
+        if curr_metric_result["metric_name"] == metric_name:
+            metric_result = curr_metric_result
+            break
+    if metric_result is None:
+        raise ValueError(f"Metric {metric_name} not found.")
+
+    estimators = []
+    frames = []
+    for estimator_result in metric_result[f"{split}_estimator_results"]:
+        data = estimator_result["result"]
+        values = data.iloc[:, 1:].to_numpy(dtype=np.float64)
+        frames.append(pd.DataFrame(values, index=list(data.iloc[:, 0])))
+        estimators.append(estimator_result["estimator_name"])
+
+    datasets = sorted(set.intersection(*[set(frame.index) for frame in frames]))
+    n_resamples = max(frame.shape[1] for frame in frames)
+    array = np.full((len(estimators), len(datasets), n_resamples), np.nan)
+    for i, frame in enumerate(frames):
+        array[i, :, : frame.shape[1]] = frame.loc[datasets].to_numpy()
+
+    return estimators, datasets, array
+
+
+def bootstrap_confidence_intervals(
+    results: np.ndarray,
+    n_bootstrap: int = 1000,
+    confidence: float = 0.95,
+    random_state: int = 0,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Bootstrap confidence intervals for mean metrics and pairwise differences.
+
+    Datasets are resampled with replacement. All replicates are drawn as a single
+    (n_bootstrap, n_datasets) index matrix, and the same replicates are used for
+    every estimator so the pairwise differences are paired.
+
+    Parameters
+    ----------
+    results: np.ndarray
+        Array of shape (n_estimators, n_datasets) or (n_estimators, n_datasets,
+        n_resamples). Resamples are averaged for each dataset first, ignoring NaN.
+    n_bootstrap: int, default=1000
+        The number of bootstrap replicates.
+    confidence: float, default=0.95
+        The confidence level of the intervals.
+    random_state: int, default=0
+        Seed for the bootstrap replicates.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (n_estimators,) containing the mean metric of each estimator.
+    np.ndarray
+        Array of shape (n_estimators, 2) containing the lower and upper bounds of
+        the confidence interval for each estimator mean.
+    np.ndarray
+        Array of shape (n_estimators, n_estimators) containing the mean difference
+        between the row and column estimators.
+    np.ndarray
+        Array of shape (n_estimators, n_estimators, 2) containing the lower and
+        upper bounds of the confidence interval for each pairwise difference.
+    """
+    if results.ndim == 3:
+        results = np.nanmean(results, axis=2)
+
+    n_datasets = results.shape[1]
+    rng = np.random.default_rng(random_state)
+    indices = rng.integers(0, n_datasets, size=(n_bootstrap, n_datasets))
+
+    # (n_estimators, n_bootstrap)
+    replicates = results[:, indices].mean(axis=2)
+    quantiles = [(1 - confidence) / 2, 1 - (1 - confidence) / 2]
+
+    means = results.mean(axis=1)
+    intervals = np.quantile(replicates, quantiles, axis=1).T
+
+    differences = means[:, None] - means[None, :]
+    difference_replicates = replicates[:, None, :] - replicates[None, :, :]
+    difference_intervals = np.moveaxis(
+        np.quantile(difference_replicates, quantiles, axis=2), 0, -1
+    )
+
+    return means, intervals, differences, difference_intervals
+
+
+def metric_result_to_bootstrap_summary(
+    result: List[MetricResults],
+    split: str = "test",
+    n_bootstrap: int = 1000,
+    confidence: float = 0.95,
+    random_state: int = 0,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Summarise metric results with bootstrap confidence intervals.
+
+    See bootstrap_confidence_intervals for how the intervals are computed.
+
+    Parameters
+    ----------
+    result: List[MetricResults]
+        Metric results to summarise.
+    split: str, default='test'
+        Either 'test' or 'train'.
+    n_bootstrap: int, default=1000
+        The number of bootstrap replicates.
+    confidence: float, default=0.95
+        The confidence level of the intervals.
+    random_state: int, default=0
+        Seed for the bootstrap replicates.
+
+    Returns
+    -------
+    pd.DataFrame
+        Data frame of mean metrics of the format:
+        ----------------------------------------
+        | estimator | metric | mean | lower | upper |
+        | cls1      | ACC    | 0.8  | 0.75  | 0.85  |
+        ----------------------------------------
+    pd.DataFrame
+        Data frame of pairwise mean differences of the format:
+        -------------------------------------------------------
+        | estimator1 | estimator2 | metric | mean | lower | upper |
+        | cls1       | cls2       | ACC    | 0.1  | 0.05  | 0.15  |
+        -------------------------------------------------------
+    """
+    summary_rows = []
+    difference_rows = []
+    for metric_result in result:
+        metric_name = metric_result["metric_name"]
+        estimators, _, array = _metric_results_to_array(result, metric_name, split)
+        (
+            means,
+            intervals,
+            differences,
+            difference_intervals,
+        ) = bootstrap_confidence_intervals(
+            array,
+            n_bootstrap=n_bootstrap,
+            confidence=confidence,
+            random_state=random_state,
+        )
+
+        for i, estimator in enumerate(estimators):
+            summary_rows.append(
+                [estimator, metric_name, means[i], intervals[i, 0], intervals[i, 1]]
+            )
+            for j in range(i + 1, len(estimators)):
+                difference_rows.append(
+                    [
+                        estimator,
+                        estimators[j],
+                        metric_name,
+                        differences[i, j],
+                        difference_intervals[i, j, 0],
+                        difference_intervals[i, j, 1],
+                    ]
+                )
+
+    summary = pd.DataFrame(
+        summary_rows, columns=["estimator", "metric", "mean", "lower", "upper"]
+    )
+    pairwise = pd.DataFrame(
+        difference_rows,
+        columns=["estimator1", "estimator2", "metric", "mean", "lower", "upper"],
+    )
+    return summary, pairwise
+
+
 def from_metric_summary_to_dataset_format(
     summary_format: pd.DataFrame, return_numpy: np.ndarray = False
 ) -> Union[pd.DataFrame, np.ndarray, List[pd.DataFrame], List[np.ndarray]]:
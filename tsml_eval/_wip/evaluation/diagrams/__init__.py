@@ -1,7 +1,17 @@
 # -*- coding: utf-8 -*-
 """Critical difference diagram."""
-__all__ = ["critical_difference_diagram", "scatter_diagram"]
+__all__ = [
+    "critical_difference_diagram",
+    "critical_difference_statistics",
+    "pairwise_comparison",
+    "scatter_diagram",
+    "render_diagrams",
+]
 
+from tsml_eval._wip.evaluation.diagrams._batch_diagrams import render_diagrams
 from tsml_eval._wip.evaluation.diagrams._critical_difference_diagram import (
     critical_difference_diagram,
+    critical_difference_statistics,
+    pairwise_comparison,
 )
+from tsml_eval._wip.evaluation.diagrams._scatter_diagrams import scatter_diagram
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""Render many evaluation diagrams headlessly in parallel."""
+import os
+from typing import Dict, List, Tuple, TypedDict
+
+import pandas as pd
+from joblib import Parallel, delayed
+from matplotlib.figure import Figure
+
+from tsml_eval._wip.evaluation.diagrams._critical_difference_diagram import (
+    CriticalDifferenceStatistics,
+    _form_cliques_from_matrix,
+    _plot_critical_difference_diagram,
+    critical_difference_statistics,
+)
+from tsml_eval._wip.evaluation.diagrams._scatter_diagrams import _plot_scatter_diagram
+from tsml_eval._wip.evaluation.diagrams._utils import metric_result_to_df
+
+_CRITICAL_DIFFERENCE_KWARGS = {
+    "alpha",
+    "clique_method",
+    "color",
+    "space_between_labels",
+    "title",
+    "fontsize",
+    "title_fontsize",
+    "figure_width",
+    "figure_height",
+}
+_SCATTER_KWARGS = {
+    "top_half_color": "turquoise",
+    "top_half_alpha": 0.5,
+    "bottom_half_color": "white",
+    "bottom_half_alpha": 0.0,
+    "figure_width": 5,
+    "figure_height": 5,
+    "label_font_size": 10,
+    "label_x": 0.2,
+    "label_y": 0.8,
+}
+
+
+class DiagramSpecification(TypedDict, total=False):
+    diagram: str
+    output_path: str
+    metric_results: pd.DataFrame
+    metric: str
+    estimators: List[str]
+    statistics: CriticalDifferenceStatistics
+    source_paths: List[str]
+    kwargs: Dict
+
+
+def render_diagrams(
+    specifications: List[DiagramSpecification],
+    n_jobs: int = 1,
+    overwrite: bool = False,
+) -> List[str]:
+    """Render a list of diagrams to file using a process pool.
+
+    Each figure is drawn on its own Agg canvas without pyplot, so the pyplot backend
+    and open figures of the caller are left untouched. Critical difference
+    statistics are computed once for every distinct set of results, metric and alpha
+    in the parent process and shared between specifications, only the statistics
+    are sent to the workers. Results are matched by the content of their estimator,
+    dataset and metric columns.
+
+    Parameters
+    ----------
+    specifications: List[DiagramSpecification]
+        List of dicts describing the diagrams to draw. Each dict contains:
+        diagram: str
+            Either "critical_difference" or "scatter".
+        output_path: str
+            Path of the image file to write.
+        metric_results: pd.DataFrame
+            Data frame in the format accepted by critical_difference_diagram. Not
+            required for critical difference diagrams if statistics is given.
+        metric: str, optional
+            Name of the metric column to use. Defaults to the first metric column.
+        estimators: List[str]
+            The two estimators to compare for a scatter diagram.
+        statistics: CriticalDifferenceStatistics, optional
+            Precomputed statistics from critical_difference_statistics.
+        source_paths: List[str], optional
+            Files the results were read from. If the output exists and is newer
+            than all of these it is considered up to date.
+        kwargs: dict, optional
+            Extra keyword arguments for the diagram. For critical difference
+            diagrams these are alpha, clique_method, color, space_between_labels,
+            title, fontsize, title_fontsize, figure_width and figure_height, alpha
+            is used when computing the statistics. For scatter diagrams these are
+            the colour, alpha, figure size and label arguments of scatter_diagram.
+    n_jobs: int, defaults = 1
+        The number of processes to render the diagrams over. -1 uses all available
+        processors.
+    overwrite: bool, defaults = False
+        If False, diagrams which are up to date are skipped. Outputs without
+        source_paths are up to date if the file exists.
+
+    Returns
+    -------
+    List[str]
+        The output paths of the diagrams written, in specification order.
+
+    Raises
+    ------
+    ValueError
+        If a diagram is unknown or given keyword arguments it does not accept.
+    """
+    statistics_cache = {}
+    tasks = []
+    for spec in specifications:
+        if not overwrite and _is_up_to_date(
+            spec["output_path"], spec.get("source_paths", None)
+        ):
+            continue
+
+        kwargs = dict(spec.get("kwargs", {}))
+        if spec["diagram"] == "critical_difference":
+            _check_kwargs(spec, kwargs, _CRITICAL_DIFFERENCE_KWARGS)
+            alpha = kwargs.pop("alpha", 0.05)
+            statistics = spec.get("statistics", None)
+            if statistics is None:
+                df = metric_result_to_df(spec["metric_results"])
+                metric = spec.get("metric", df.columns[2])
+                df = df[[df.columns[0], df.columns[1], metric]]
+                key = (_hash_metric_results(df), alpha)
+                if key not in statistics_cache:
+                    statistics_cache[key] = critical_difference_statistics(
+                        df, alpha=alpha
+                    )
+                statistics = statistics_cache[key]
+
+            if "title" not in kwargs:
+                kwargs["title"] = spec.get("metric", "")
+            tasks.append(
+                delayed(_render_critical_difference_diagram)(
+                    statistics, spec["output_path"], kwargs
+                )
+            )
+        elif spec["diagram"] == "scatter":
+            _check_kwargs(spec, kwargs, _SCATTER_KWARGS)
+            df = metric_result_to_df(spec["metric_results"])
+            estimators = spec["estimators"]
+            metric = spec.get("metric", df.columns[2])
+            df = df[df.iloc[:, 0].isin(estimators)]
+            df = df[[df.columns[0], df.columns[1], metric]]
+            tasks.append(
+                delayed(_render_scatter_diagram)(
+                    df, spec["output_path"], {**_SCATTER_KWARGS, **kwargs}
+                )
+            )
+        else:
+            raise ValueError(
+                f"Unknown diagram {spec['diagram']}, use critical_difference or "
+                f"scatter."
+            )
+
+    return Parallel(n_jobs=n_jobs)(tasks)
+
+
+def _is_up_to_date(output_path: str, source_paths: List[str] = None) -> bool:
+    """Check whether an output file exists and is newer than its sources.
+
+    Parameters
+    ----------
+    output_path: str
+        Path of the output file.
+    source_paths: List[str], defaults = None
+        Paths of the files the output was created from.
+
+    Returns
+    -------
+    bool
+        True if the output does not need to be created again.
+    """
+    if not os.path.exists(output_path):
+        return False
+    if source_paths is None or len(source_paths) == 0:
+        return True
+
+    output_time = os.path.getmtime(output_path)
+    return all(os.path.getmtime(path) <= output_time for path in source_paths)
+
+
+def _check_kwargs(spec: DiagramSpecification, kwargs: Dict, allowed) -> None:
+    unknown = sorted(set(kwargs) - set(allowed))
+    if len(unknown) > 0:
+        raise ValueError(
+            f"Unknown keyword arguments {unknown} for a {spec['diagram']} diagram, "
+            f"use any of {sorted(allowed)}."
+        )
+
+
+def _hash_metric_results(df: pd.DataFrame) -> Tuple:
+    return (
+        tuple(df.columns),
+        pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes(),
+    )
+
+
+def _render_critical_difference_diagram(
+    statistics: CriticalDifferenceStatistics, output_path: str, kwargs: Dict
+) -> str:
+    clique_method = kwargs.pop("clique_method", "ordered")
+    figure = _plot_critical_difference_diagram(
+        estimators=list(statistics["estimators"]),
+        ranks=list(statistics["average_ranks"]),
+        cliques=_form_cliques_from_matrix(
+            statistics["significant"], method=clique_method
+        ),
+        headless=True,
+        **kwargs,
+    )
+    return _save_figure(figure, output_path)
+
+
+def _render_scatter_diagram(df: pd.DataFrame, output_path: str, kwargs: Dict) -> str:
+    figure = _plot_scatter_diagram(
+        df,
+        output_path=None,
+        metrics=[df.columns[2]],
+        datasets=list(df.iloc[:, 1].unique()),
+        headless=True,
+        **kwargs,
+    )[0]
+    return _save_figure(figure, output_path)
+
+
+def _save_figure(figure: Figure, output_path: str) -> str:
+    output_dir = os.path.dirname(output_path)
+    if output_dir != "":
+        os.makedirs(output_dir, exist_ok=True)
+    figure.savefig(output_path)
+    return output_path
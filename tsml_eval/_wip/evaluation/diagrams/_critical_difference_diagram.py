@@ -4,16 +4,21 @@ import math
 import warnings
 from itertools import combinations
 from operator import itemgetter
-from typing import Generator, List, Tuple, Union
+from typing import Generator, List, Tuple, TypedDict, Union
 
 import matplotlib.pyplot as plt
 import networkx
 import numpy as np
 import pandas as pd
-from scipy.stats import friedmanchisquare, wilcoxon
+from aeon.utils.validation import check_n_jobs
+from joblib import Parallel, delayed
+from scipy.stats import friedmanchisquare, rankdata, wilcoxon
 
-from tsml_eval._wip.evaluation.diagrams._utils import metric_result_to_df
-from tsml_eval.evaluation import MetricResults
+from tsml_eval._wip.evaluation.diagrams._utils import (
+    _create_figure,
+    metric_result_to_df,
+)
+from tsml_eval._wip.evaluation._utils import MetricResults
 
 warnings.filterwarnings(
     "ignore"
@@ -31,6 +36,8 @@ def critical_difference_diagram(
     title_fontsize: float = 10,
     figure_width: float = None,
     figure_height: float = None,
+    clique_method: str = "ordered",
+    n_jobs: int = 1,
 ) -> Union[plt.Figure, List[plt.Figure]]:
     """Create a critical difference diagram.
 
@@ -70,6 +77,13 @@ def critical_difference_diagram(
         Width of the figure. If not set then will be automatically defined.
     figure_height: float, defaults = None
         Height of figure. If not set then will be automatically defined.
+    clique_method: str, defaults = "ordered"
+        The method used to group estimators that are not critically different.
+        "ordered" finds contiguous runs of estimators in rank order, "clique"
+        enumerates all maximal cliques and can be very slow for many estimators.
+    n_jobs: int, defaults = 1
+        The number of threads to run the pairwise Wilcoxon tests over. -1 uses all
+        available processors.
 
     Returns
     -------
@@ -86,13 +100,17 @@ def critical_difference_diagram(
             graph_title = df.columns[i]
         curr_df = df.iloc[:, 0:2]
         curr_df["metric"] = df.iloc[:, i]
-        avg_ranks = _compute_average_rank(curr_df)
-        p_values = _compute_wilcoxon_signed_rank(curr_df, alpha)
-        cliques = form_cliques(p_values, avg_ranks.keys())
+        scores, estimators, _ = _metric_df_to_matrix(curr_df)
+        statistics = _critical_difference_statistics_from_matrix(
+            scores, estimators, alpha=alpha, n_jobs=n_jobs
+        )
+        cliques = _form_cliques_from_matrix(
+            statistics["significant"], method=clique_method
+        )
 
         figure = _plot_critical_difference_diagram(
-            estimators=list(avg_ranks.keys()),
-            ranks=list(avg_ranks.values),
+            estimators=list(statistics["estimators"]),
+            ranks=list(statistics["average_ranks"]),
             cliques=cliques,
             color=color,
             space_between_labels=space_between_labels,
@@ -208,23 +226,109 @@ def _k_cliques(graph: List[List[int]]) -> List[List[int]]:
     return valid_cliques
 
 
-def form_cliques(p_values, nnames):
-    """
-    This method forms the cliques
+def form_cliques(p_values, nnames, method: str = "ordered") -> List[List[int]]:
+    """Form cliques of estimators that are not critically different.
+
+    Parameters
+    ----------
+    p_values: List[Tuple]
+        List of tuples of length 4. Where index 0 is the name of the first estimator,
+        index 1 is the name of the estimator it was compared to, index 2 is the p value
+        and index 3 is a boolean that when true means two classifiers are critically
+        different and false means they are not critically different.
+    nnames: np.ndarray
+        The estimator names, ordered by average rank.
+    method: str, defaults = "ordered"
+        The method used to find the cliques. "ordered" finds the maximal contiguous
+        runs of estimators in rank order that are not critically different in a
+        linear sweep. "clique" enumerates the maximal cliques of the graph of
+        estimators that are not critically different, which can be very slow for
+        many estimators.
+
+    Returns
+    -------
+    List[List[int]]
+        List where each list contains the index of the estimators that are not
+        critically different.
     """
     # first form the numpy matrix data
     m = len(nnames)
-    g_data = np.zeros((m, m), dtype=np.int64)
+    significant = np.ones((m, m), dtype=bool)
+    np.fill_diagonal(significant, False)
     for p in p_values:
-        if p[3] == False:
+        if not p[3]:
             i = np.where(nnames == p[0])[0][0]
             j = np.where(nnames == p[1])[0][0]
-            min_i = min(i, j)
-            max_j = max(i, j)
-            g_data[min_i, max_j] = 1
+            significant[i, j] = False
+            significant[j, i] = False
+
+    return _form_cliques_from_matrix(significant, method=method)
+
+
+def _form_cliques_from_matrix(
+    significant: np.ndarray, method: str = "ordered"
+) -> List[List[int]]:
+    """Form cliques from a boolean matrix of critical differences.
+
+    Parameters
+    ----------
+    significant: np.ndarray
+        Symmetric boolean 2d array where True means the two estimators are critically
+        different. Rows and columns must be ordered by average rank.
+    method: str, defaults = "ordered"
+        The method used to find the cliques, either "ordered" or "clique". See
+        form_cliques.
+
+    Returns
+    -------
+    List[List[int]]
+        List where each list contains the index of the estimators that are not
+        critically different.
+    """
+    if method == "ordered":
+        return _ordered_cliques(significant)
+    elif method == "clique":
+        g_data = np.triu(~significant, k=1).astype(np.int64)
+        g = networkx.Graph(g_data)
+        return list(networkx.find_cliques(g))
+    else:
+        raise ValueError(f"Unknown clique method {method}, use ordered or clique.")
+
+
+def _ordered_cliques(significant: np.ndarray) -> List[List[int]]:
+    """Find maximal contiguous runs of estimators that are not critically different.
+
+    If the estimators i to j form a clique then so do i + 1 to j, so the end of the
+    longest run starting at each estimator never decreases and both ends of the run
+    only move forward.
+
+    Parameters
+    ----------
+    significant: np.ndarray
+        Symmetric boolean 2d array where True means the two estimators are critically
+        different. Rows and columns must be ordered by average rank.
+
+    Returns
+    -------
+    List[List[int]]
+        List of the maximal runs containing more than one estimator, each a list of
+        estimator indices.
+    """
+    m = len(significant)
+    cliques = []
+    prev_end = 0
+    end = 0
+    for start in range(m):
+        end = max(end, start)
+        while end + 1 < m and not significant[start : end + 1, end + 1].any():
+            end += 1
+
+        # runs contained in the previous run are not maximal
+        if end > start and (start == 0 or end > prev_end):
+            cliques.append(list(range(start, end + 1)))
+        prev_end = end
 
-    g = networkx.Graph(g_data)
-    return networkx.find_cliques(g)
+    return cliques
 
 
 # def form_cliques(p_values, estimators) -> List[List[int]]:
@@ -262,9 +366,354 @@ def form_cliques(p_values, nnames):
 #     return _k_cliques(graph)
 
 
+class CriticalDifferenceStatistics(TypedDict):
+    estimators: np.ndarray
+    average_ranks: np.ndarray
+    p_values: np.ndarray
+    significant: np.ndarray
+    friedman_p_value: Union[float, None]
+
+
+def critical_difference_statistics(
+    metric_results: Union[pd.DataFrame, List[MetricResults]],
+    metric: str = None,
+    alpha: float = 0.05,
+    n_jobs: int = 1,
+) -> CriticalDifferenceStatistics:
+    """Compute the statistics used to draw a critical difference diagram.
+
+    The results are pivoted once into an (n_estimators, n_datasets) matrix, from
+    which the average ranks, the Friedman test and all pairwise Wilcoxon signed rank
+    tests with Holm correction are computed.
+
+    Parameters
+    ----------
+    metric_results: pd.DataFrame or List[MetricResults]
+        If a List[MetricResults] is passed, then it is formatted to correct DF. If a
+        data frame is passed it should have three columns index 0 should be the
+        estimator names, index 1 should be the dataset and index 3 and onwards should
+        be the estimators metric scored for the datasets. For examples:
+        ----------------------------------
+        | estimator | dataset | metric1  | metric2 |
+        | cls1      | data1   | 1.2      | 1.2     |
+        | cls2      | data2   | 3.4      | 1.4     |
+        | cls1      | data2   | 1.4      | 1.3     |
+        | cls2      | data1   | 1.3      | 1.2     |
+        ----------------------------------
+    metric: str, defaults = None
+        Name of the metric column to use. If not specified then the first metric
+        column is used.
+    alpha: float, defaults = 0.05
+        Alpha value to use to reject Holm hypothesis.
+    n_jobs: int, defaults = 1
+        The number of threads to run the pairwise Wilcoxon tests over. -1 uses all
+        available processors.
+
+    Returns
+    -------
+    CriticalDifferenceStatistics
+        Dict containing the estimator names ordered by descending average rank, the
+        average ranks, the (n_estimators, n_estimators) matrix of Wilcoxon p values,
+        the matching boolean matrix where True means the two estimators are
+        critically different after Holm correction and the Friedman test p value
+        (None if there are fewer than three estimators). The matrices follow the
+        order of the estimator names.
+    """
+    df = metric_result_to_df(metric_results)
+    if metric is None:
+        metric = df.columns[2]
+    curr_df = df.iloc[:, 0:2]
+    curr_df["metric"] = df[metric]
+    scores, estimators, _ = _metric_df_to_matrix(curr_df)
+    return _critical_difference_statistics_from_matrix(
+        scores, estimators, alpha=alpha, n_jobs=n_jobs
+    )
+
+
+def _metric_df_to_matrix(
+    df: pd.DataFrame,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pivot a single metric data frame into an (estimators, datasets) matrix.
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        The data frame should have three columns index 0 should be the estimators
+        names, index 1 should be the dataset and index 2 should be the estimators
+        metric scored for the datasets.
+
+    Returns
+    -------
+    np.ndarray
+        2d array of shape (n_estimators, n_datasets) containing the metric scores.
+    np.ndarray
+        The estimator names, sorted, for each row of the matrix.
+    np.ndarray
+        The dataset names, sorted, for each column of the matrix.
+    """
+    pivot = (
+        df.pivot_table(
+            index=df.columns[0],
+            columns=df.columns[1],
+            values=df.columns[-1],
+            aggfunc="first",
+        )
+        .sort_index(axis=0)
+        .sort_index(axis=1)
+    )
+
+    return (
+        pivot.to_numpy(dtype=np.float64),
+        pivot.index.to_numpy(),
+        pivot.columns.to_numpy(),
+    )
+
+
+def _critical_difference_statistics_from_matrix(
+    scores: np.ndarray,
+    estimators: np.ndarray,
+    alpha: float = 0.05,
+    n_jobs: int = 1,
+) -> CriticalDifferenceStatistics:
+    """Compute critical difference statistics from an (estimators, datasets) matrix.
+
+    Parameters
+    ----------
+    scores: np.ndarray
+        2d array of shape (n_estimators, n_datasets) containing the metric scores.
+        Higher scores are considered better.
+    estimators: np.ndarray
+        The estimator names for each row of scores.
+    alpha: float, defaults = 0.05
+        Alpha value to use to reject Holm hypothesis.
+    n_jobs: int, defaults = 1
+        The number of threads to run the pairwise Wilcoxon tests over.
+
+    Returns
+    -------
+    CriticalDifferenceStatistics
+        See critical_difference_statistics.
+    """
+    average_ranks = _compute_rank_matrix(scores).mean(axis=1)
+
+    # order from worst to best average rank, stable so ties keep the input order
+    order = np.argsort(-average_ranks, kind="stable")
+    scores = scores[order]
+    estimators = np.asarray(estimators)[order]
+    average_ranks = average_ranks[order]
+
+    friedman_p_value = None
+    if len(scores) >= 3:
+        friedman_p_value = friedmanchisquare(*scores)[1]
+
+    p_values = _compute_pairwise_wilcoxon(scores, n_jobs=n_jobs)
+    significant = _holm_correction(p_values, alpha=alpha)
+
+    return CriticalDifferenceStatistics(
+        estimators=estimators,
+        average_ranks=average_ranks,
+        p_values=p_values,
+        significant=significant,
+        friedman_p_value=friedman_p_value,
+    )
+
+
+class PairwiseComparison(TypedDict):
+    estimators: np.ndarray
+    wins: np.ndarray
+    draws: np.ndarray
+    losses: np.ndarray
+    mean_differences: np.ndarray
+    p_values: np.ndarray
+
+
+def pairwise_comparison(
+    scores: np.ndarray,
+    estimators: List[str] = None,
+    n_jobs: int = 1,
+) -> PairwiseComparison:
+    """Compare every pair of estimators over a matrix of metric scores.
+
+    Win/draw/loss counts and mean differences for all pairs are computed in a single
+    broadcast over the (n_estimators, n_estimators, n_datasets) differences, and the
+    pairwise Wilcoxon signed rank tests are optionally run over a thread pool. Each
+    output is an (n_estimators, n_estimators) matrix comparing the row estimator to
+    the column estimator, ready to be drawn as a heatmap.
+
+    Parameters
+    ----------
+    scores: np.ndarray
+        2d array of shape (n_estimators, n_datasets) containing the metric scores.
+        Higher scores are considered better.
+    estimators: List[str], defaults = None
+        The estimator names for each row of scores. If not specified the row index
+        is used.
+    n_jobs: int, defaults = 1
+        The number of threads to run the pairwise Wilcoxon tests over. -1 uses all
+        available processors.
+
+    Returns
+    -------
+    PairwiseComparison
+        Dict containing the estimator names, the number of datasets the row
+        estimator wins, draws and loses against the column estimator, the mean
+        difference in score (row minus column) and the Wilcoxon p values.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if estimators is None:
+        estimators = np.arange(len(scores))
+
+    differences = scores[:, None, :] - scores[None, :, :]
+    wins = np.count_nonzero(differences > 0, axis=2)
+    draws = np.count_nonzero(differences == 0, axis=2)
+
+    return PairwiseComparison(
+        estimators=np.asarray(estimators),
+        wins=wins,
+        draws=draws,
+        losses=wins.T,
+        mean_differences=differences.mean(axis=2),
+        p_values=_compute_pairwise_wilcoxon(scores, n_jobs=n_jobs),
+    )
+
+
+def _compute_rank_matrix(scores: np.ndarray) -> np.ndarray:
+    """Rank the estimators for each dataset.
+
+    Parameters
+    ----------
+    scores: np.ndarray
+        2d array of shape (n_estimators, n_datasets) containing the metric scores.
+
+    Returns
+    -------
+    np.ndarray
+        2d array of shape (n_estimators, n_datasets) where the highest score for a
+        dataset has rank 1. Ties are given the average rank.
+    """
+    return rankdata(-scores, axis=0)
+
+
+def _compute_pairwise_wilcoxon(scores: np.ndarray, n_jobs: int = 1) -> np.ndarray:
+    """Compute the Wilcoxon signed rank test p value for every pair of estimators.
+
+    Parameters
+    ----------
+    scores: np.ndarray
+        2d array of shape (n_estimators, n_datasets) containing the metric scores.
+    n_jobs: int, defaults = 1
+        The number of threads to run the tests over.
+
+    Returns
+    -------
+    np.ndarray
+        Symmetric 2d array of shape (n_estimators, n_estimators) containing the p
+        values. The diagonal and pairs with identical scores on every dataset have
+        a p value of 1.
+    """
+    n_estimators = len(scores)
+    p_values = np.ones((n_estimators, n_estimators))
+    rows, cols = np.triu_indices(n_estimators, k=1)
+
+    # the test is undefined when all differences are zero, these are left at 1
+    differs = np.any(scores[rows] != scores[cols], axis=1)
+    rows = rows[differs]
+    cols = cols[differs]
+    if len(rows) == 0:
+        return p_values
+
+    n_jobs = check_n_jobs(n_jobs)
+    chunks = np.array_split(np.arange(len(rows)), min(n_jobs, len(rows)))
+    results = Parallel(n_jobs=n_jobs, prefer="threads")(
+        delayed(_wilcoxon_chunk)(scores, rows[chunk], cols[chunk]) for chunk in chunks
+    )
+
+    p_values[rows, cols] = np.concatenate(results)
+    p_values[cols, rows] = p_values[rows, cols]
+    return p_values
+
+
+def _wilcoxon_chunk(
+    scores: np.ndarray, rows: np.ndarray, cols: np.ndarray
+) -> np.ndarray:
+    return np.array(
+        [
+            wilcoxon(scores[i], scores[j], zero_method="pratt")[1]
+            for i, j in zip(rows, cols)
+        ]
+    )
+
+
+def _holm_correction(p_values: np.ndarray, alpha: float = 0.05) -> np.ndarray:
+    """Apply the Holm step-down procedure to a symmetric p value matrix.
+
+    Parameters
+    ----------
+    p_values: np.ndarray
+        Symmetric 2d array of shape (n_estimators, n_estimators) containing the
+        pairwise p values.
+    alpha: float, defaults = 0.05
+        Alpha value to use to reject Holm hypothesis.
+
+    Returns
+    -------
+    np.ndarray
+        Symmetric boolean 2d array where True means the null hypothesis is rejected,
+        i.e. the two estimators are critically different.
+    """
+    n_estimators = len(p_values)
+    rows, cols = np.triu_indices(n_estimators, k=1)
+    pair_p_values = p_values[rows, cols]
+    n_pairs = len(pair_p_values)
+
+    order = np.argsort(pair_p_values, kind="stable")
+    thresholds = alpha / (n_pairs - np.arange(n_pairs))
+    passed = pair_p_values[order] <= thresholds
+    # step-down, stop rejecting at the first hypothesis that cannot be rejected
+    n_rejected = n_pairs if passed.all() else np.argmin(passed)
+
+    significant = np.zeros((n_estimators, n_estimators), dtype=bool)
+    rejected = order[:n_rejected]
+    significant[rows[rejected], cols[rejected]] = True
+    significant[cols[rejected], rows[rejected]] = True
+    return significant
+
+
+def _statistics_to_p_value_list(
+    statistics: CriticalDifferenceStatistics,
+) -> List[Tuple]:
+    """Convert critical difference statistics to a list of pairwise p values.
+
+    Parameters
+    ----------
+    statistics: CriticalDifferenceStatistics
+        Statistics from critical_difference_statistics.
+
+    Returns
+    -------
+    List[Tuple]
+        List of tuples of length 4, sorted by p value. See
+        _compute_wilcoxon_signed_rank.
+    """
+    estimators = statistics["estimators"]
+    rows, cols = np.triu_indices(len(estimators), k=1)
+    p_values = [
+        (
+            estimators[i],
+            estimators[j],
+            statistics["p_values"][i, j],
+            bool(statistics["significant"][i, j]),
+        )
+        for i, j in zip(rows, cols)
+    ]
+    p_values.sort(key=itemgetter(2))
+    return p_values
+
+
 def _compute_wilcoxon_signed_rank(
     df: pd.DataFrame,
     alpha=0.05,
+    n_jobs: int = 1,
 ) -> List[Tuple]:
     """Compute the wilcoxon signed rank for a dataframe of result.
 
@@ -283,60 +732,22 @@ def _compute_wilcoxon_signed_rank(
         ----------------------------------
     alpha: float, defaults = 0.05
         Alpha values to use to reject Holm hypothesis.
+    n_jobs: int, defaults = 1
+        The number of threads to run the pairwise tests over.
 
     Returns
     -------
     List[Tuple]
         List of tuples of length 4. Where index 0 is the name of the first estimator,
         index 1 is the name of the estimator it was compared to, index 2 is the p value
-        and index 3 is a boolean that when true means two classifiers are not critically
-        different and false means they are critically different.
+        and index 3 is a boolean that when true means two classifiers are critically
+        different and false means they are not critically different.
     """
-    estimators = (df.iloc[:, 0]).unique()
-
-    acc_arr = []
-    for estimator in estimators:
-        acc_arr.append(
-            (df.loc[df[df.columns[0]] == estimator][df.columns[-1]]).to_numpy()
-        )
-
-    if len(acc_arr) >= 3:
-        friedman_p_value = friedmanchisquare(*acc_arr)[1]
-
-        # if friedman_p_value >= alpha:
-        #     raise ValueError(
-        #         "The estimators results provided cannot reject the null" "hypothesis."
-        #     )
-    p_values = []
-
-    for i in range(len(estimators)):
-        curr_estimator = estimators[i]
-        curr_estimator_accuracy = (
-            df.loc[df[df.columns[0]] == curr_estimator][df.columns[-1]]
-        ).to_numpy()
-        for j in range(i + 1, len(estimators)):
-            curr_compare_estimator = estimators[j]
-            curr_compare_estimator_accuracy = (
-                df.loc[df[df.columns[0]] == curr_compare_estimator][df.columns[-1]]
-            ).to_numpy()
-
-            p_value = wilcoxon(
-                curr_estimator_accuracy,
-                curr_compare_estimator_accuracy,
-                zero_method="pratt",
-            )[1]
-
-            p_values.append((curr_estimator, curr_compare_estimator, p_value, False))
-
-    p_values.sort(key=itemgetter(2))
-
-    for i in range(len(p_values)):
-        new_alpha = float(alpha / (len(p_values) - i))
-        if not p_values[i][2] <= new_alpha:
-            break
-        p_values[i] = (p_values[i][0], p_values[i][1], p_values[i][2], True)
-
-    return p_values
+    scores, estimators, _ = _metric_df_to_matrix(df)
+    statistics = _critical_difference_statistics_from_matrix(
+        scores, estimators, alpha=alpha, n_jobs=n_jobs
+    )
+    return _statistics_to_p_value_list(statistics)
 
 
 def _compute_average_rank(df: pd.DataFrame) -> pd.Series:
@@ -362,29 +773,11 @@ def _compute_average_rank(df: pd.DataFrame) -> pd.Series:
         Series where each element is a series where the classifier is index 0 and the
         rank is index 1.
     """
-    datasets = (df.iloc[:, 1]).unique()
-    num_datasets = len(datasets)
-    estimators = (df.iloc[:, 0]).unique()
-
-    sorted_df = df.loc[df[df.columns[0]].isin(estimators)].sort_values(
-        [df.columns[0], df.columns[1]]
-    )
-
-    rank_data = np.array(sorted_df[df.columns[-1]]).reshape(
-        len(estimators), num_datasets
+    scores, estimators, _ = _metric_df_to_matrix(df)
+    ranking_values = pd.Series(
+        _compute_rank_matrix(scores).mean(axis=1), index=estimators
     )
-
-    df_ranks = pd.DataFrame(
-        data=rank_data,
-        index=np.sort(estimators),
-        columns=np.unique(sorted_df[df.columns[1]]),
-    )
-
-    ranking_values = (
-        df_ranks.rank(ascending=False).mean(axis=1).sort_values(ascending=False)
-    )
-
-    return ranking_values
+    return ranking_values.iloc[np.argsort(-ranking_values.to_numpy(), kind="stable")]
 
 
 def _plot_critical_difference_diagram(
@@ -398,6 +791,7 @@ def _plot_critical_difference_diagram(
     title_fontsize: float = 20,
     figure_width: float = None,
     figure_height: float = None,
+    headless: bool = False,
 ):
     """Plot the critical difference diagram.
 
@@ -425,6 +819,8 @@ def _plot_critical_difference_diagram(
         Width of the figure. If not set then will be automatically defined.
     figure_height: float, defaults = None
         Height of figure. If not set then will be automatically defined.
+    headless: bool, defaults = False
+        If True the figure is drawn on an Agg canvas without pyplot.
 
     Returns
     -------
@@ -470,7 +866,7 @@ def _plot_critical_difference_diagram(
 
     x_point_on_line = np.array(ranks)
     y_point_on_line = np.array([number_line_y] * len(ranks))
-    fig, ax = plt.subplots()
+    fig, ax = _create_figure(headless=headless)
 
     min_y = min(labels_y_positions)
     max_y = number_line_y + space_between_labels
@@ -565,9 +961,9 @@ def _plot_critical_difference_diagram(
             ax.plot([curr, curr], [number_line_y, number_line_y + 0.015], color=color)
 
     ax.set_title(title, fontsize=title_fontsize)
-    plt.gca().invert_xaxis()
+    ax.invert_xaxis()
 
-    plt.axis("off")
+    ax.axis("off")
     fig.tight_layout()
 
     # if figure_width is None:
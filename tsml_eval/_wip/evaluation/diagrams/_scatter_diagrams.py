@@ -7,8 +7,11 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
-from tsml_eval._wip.evaluation.diagrams._utils import metric_result_to_df
-from tsml_eval.evaluation import MetricResults
+from tsml_eval._wip.evaluation.diagrams._utils import (
+    _create_figure,
+    metric_result_to_df,
+)
+from tsml_eval._wip.evaluation._utils import MetricResults
 
 
 def scatter_diagram(
@@ -145,6 +148,7 @@ def _plot_scatter_diagram(
     label_font_size: float,
     figure_width: float,
     figure_height: float,
+    headless: bool = False,
 ):
     """Create scatter plot for two classifiers.
 
@@ -189,6 +193,8 @@ def _plot_scatter_diagram(
         Y-coordinate for labels of graphic.
     label_x: float
         X-coordinate for labels of graphic.
+    headless: bool, defaults = False
+        If True the figures are drawn on an Agg canvas without pyplot.
     """
     figures = []
     estimators = list(set(df["estimator"]))
@@ -220,7 +226,9 @@ def _plot_scatter_diagram(
         zeros[-1] = 1
         middle_line = list(zeros)
 
-        fig, ax = plt.subplots(1, 1, figsize=(figure_width, figure_height))
+        fig, ax = _create_figure(
+            figsize=(figure_width, figure_height), headless=headless
+        )
         ax.plot(x, y, "k.")
 
         # bottom triangle fill
@@ -232,10 +240,10 @@ def _plot_scatter_diagram(
             middle_line, middle_line, color=top_half_color, alpha=top_half_alpha
         )
 
-        plt.xlim(0, 1)
-        plt.ylim(0, 1)
-        plt.xlabel(f"{estimators[0]} {metric}")
-        plt.ylabel(f"{estimators[1]} {metric}")
+        ax.set_xlim(0, 1)
+        ax.set_ylim(0, 1)
+        ax.set_xlabel(f"{estimators[0]} {metric}")
+        ax.set_ylabel(f"{estimators[1]} {metric}")
         ax.text(
             label_y,
             label_x,
@@ -2,10 +2,13 @@
 import warnings
 from typing import List, Union
 
+import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 
-from tsml_eval.evaluation import MetricResults, metric_result_to_summary
+from tsml_eval._wip.evaluation._utils import MetricResults, metric_result_to_summary
 
 
 def metric_result_to_df(
@@ -38,6 +41,33 @@ def metric_result_to_df(
     return df
 
 
+def _create_figure(figsize=None, headless: bool = False):
+    """Create a figure with a single axes.
+
+    Parameters
+    ----------
+    figsize: Tuple[float, float], defaults = None
+        Width and height of the figure in inches. If not set the matplotlib default
+        is used.
+    headless: bool, defaults = False
+        If True the figure is drawn on an Agg canvas and is not registered with
+        pyplot, so the pyplot backend and open figures are left untouched. Otherwise
+        the figure is created with plt.subplots.
+
+    Returns
+    -------
+    plt.Figure
+        The new figure.
+    plt.Axes
+        The axes of the figure.
+    """
+    if headless:
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        return fig, fig.add_subplot()
+    return plt.subplots(figsize=figsize)
+
+
 def _check_df(df: pd.DataFrame) -> pd.DataFrame:
     """Check if data frame is valid.
 
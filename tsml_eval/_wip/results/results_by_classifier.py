@@ -110,42 +110,147 @@ def get_single_classifier_results(
         results = {}
         for line in file:
             all = line.split(",")
-            res = np.array(all[1:]).astype(np.float)
+            res = np.array(all[1:]).astype(float)
             #            results
             results[all[0]] = res
         # return dictionary of problem/accurcacy
         return results
 
 
+_results_stores = {}
+
+
+def load_classifier_results_store(
+    root="../", package="tsml", type="Univariate", cache_path=None
+):
+    """Load all local results for a package and type into a single array store.
+
+    All _TESTFOLDS.csv files in results/<package>/ByClassifier/<type> are parsed once
+    into a (classifier x dataset x resample) array, which is kept in memory for the
+    rest of the session. If cache_path is given the store is also written to that
+    .npz file and read back in later sessions. The store is only rebuilt when a csv
+    file is added, removed or modified.
+
+    Parameters
+    ----------
+    root: string default is <thispackagelocation>/estimator-evaluation/results/
+    package: string, the results package i.e. "tsml"
+    type: string, either "Univariate" or "Multivariate"
+    cache_path: string, path of the .npz cache file. Defaults to None, where no
+        file is read or written.
+
+    Returns
+    ----------
+    A dictionary with the sorted "classifiers" and "datasets" name arrays and the
+    "results" array of shape (n_classifiers, n_datasets, n_resamples), NaN where a
+    classifier has no result.
+    """
+    results_dir = os.path.join(root, "results", package, "ByClassifier", type)
+
+    # sorted by classifier name so the store can be searched with searchsorted
+    files = sorted(
+        (f for f in os.listdir(results_dir) if f.endswith("_TESTFOLDS.csv")),
+        key=lambda f: f[: -len("_TESTFOLDS.csv")],
+    )
+    mtimes = np.array([os.path.getmtime(os.path.join(results_dir, f)) for f in files])
+    key = os.path.abspath(results_dir)
+
+    store = _results_stores.get(key, None)
+    if (
+        not _is_current_store(store, files, mtimes)
+        and cache_path is not None
+        and os.path.exists(cache_path)
+    ):
+        with np.load(cache_path, allow_pickle=False) as cache:
+            store = {name: cache[name] for name in cache.files}
+
+    rebuilt = not _is_current_store(store, files, mtimes)
+    if rebuilt:
+        store = _build_classifier_results_store(
+            results_dir, files, mtimes, package, type
+        )
+    if cache_path is not None and (rebuilt or not os.path.exists(cache_path)):
+        np.savez(cache_path, **store)
+
+    _results_stores[key] = store
+    return store
+
+
+def _is_current_store(store, files, mtimes):
+    """Check a store was built from the given csv files and modification times."""
+    return (
+        store is not None
+        and list(store["files"]) == files
+        and np.array_equal(store["mtimes"], mtimes)
+    )
+
+
+def _build_classifier_results_store(results_dir, files, mtimes, package, type):
+    """Parse the csv files of a results directory into an array store."""
+    classifiers = [f[: -len("_TESTFOLDS.csv")] for f in files]
+    root = os.path.join(results_dir, "..", "..", "..", "..")
+    all_results = [
+        get_single_classifier_results(cls, root=root, package=package, type=type)
+        for cls in classifiers
+    ]
+
+    datasets = sorted(set().union(*[res.keys() for res in all_results]))
+    data_index = {d: i for i, d in enumerate(datasets)}
+    n_resamples = max([len(r) for res in all_results for r in res.values()], default=0)
+
+    results = np.full((len(classifiers), len(datasets), n_resamples), np.nan)
+    for i, res in enumerate(all_results):
+        for d, r in res.items():
+            results[i, data_index[d], : len(r)] = r
+
+    return {
+        "classifiers": np.array(classifiers, dtype=str),
+        "datasets": np.array(datasets, dtype=str),
+        "results": results,
+        "files": np.array(files, dtype=str),
+        "mtimes": mtimes,
+    }
+
+
 def get_classifier_results(
-    classifiers, datasets, resample=0, root="../", package="tsml"
+    classifiers, datasets, resample=0, root="../", package="tsml", type="Univariate"
 ):
     """Collate results for classifiers over problems.
 
-    given lists of n datasets and m classifiers, form an n by m array of accuracies,
-    averaged over resamples. If not present, NaN is inserted
+    given lists of n datasets and m classifiers, form an n by m array of accuracies
+    for a resample. If not present, NaN is inserted. Results are read from the cached
+    array store, see load_classifier_results_store.
 
     Returns a len(problems) x len(classifiers) array. NaN returned if combination not found
     """
-    all_results = []
+    store = load_classifier_results_store(root=root, package=package, type=type)
     n_cls = len(classifiers)
     n_data = len(datasets)
-    results = np.zeros(shape=(n_data, n_cls))
     print(n_cls, " classifiers and ", n_data, " datasets")
-    for cls in classifiers:
-        all_results.append(get_single_classifier_results(cls))
-    prob_index = 0
-    for pr in datasets:
-        cls_index = 0
-        for res in all_results:
-            results[prob_index][cls_index] = np.NaN
-            if pr in res and len(res[pr]) > resample:  # resample present
-                results[prob_index][cls_index] = res[pr][resample]
-            cls_index = cls_index + 1
-        prob_index = prob_index + 1
+
+    cls_pos = _find_names(store["classifiers"], classifiers)
+    data_pos = _find_names(store["datasets"], datasets)
+    if cls_pos.min(initial=0) < 0:
+        missing = np.asarray(classifiers)[cls_pos < 0]
+        raise FileNotFoundError(f"No results found for classifiers {missing}")
+
+    results = np.full((n_data, n_cls), np.nan)
+    if resample < store["results"].shape[2]:
+        found = data_pos >= 0
+        results[found] = store["results"][cls_pos][:, data_pos[found], resample].T
     return results
 
 
+def _find_names(names, values):
+    """Find the position of each value in a sorted name array, -1 if not present."""
+    values = np.asarray(values, dtype=str)
+    if len(names) == 0:
+        return np.full(len(values), -1)
+    pos = np.searchsorted(names, values)
+    pos[pos == len(names)] = 0
+    return np.where(names[pos] == values, pos, -1)
+
+
 def get_single_classifier_results_from_web(
     classifier, type="Univariate", package="tsml"
 ):
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""Word count bags stored in compressed sparse row format."""
+
+__all__ = ["BagVocabulary", "CSRBags"]
+
+import numpy as np
+
+
+class BagVocabulary:
+    """Map from bag keys to word ids, shared by sets of CSR bags.
+
+    Keys are rows of a 2d integer array, compared by value. Word ids are given to
+    new keys in sorted key order when the vocabulary is extended.
+    """
+
+    def __init__(self):
+        self._keys = None
+        self._ids = np.zeros(0, dtype=np.int32)
+
+    def __len__(self):
+        """Return the number of words in the vocabulary."""
+        return len(self._ids)
+
+    def lookup(self, keys, extend=False):
+        """Find the word id of each key.
+
+        Parameters
+        ----------
+        keys : np.ndarray of shape (n_keys, key_width)
+            The keys to find. Must have the same shape and dtype for every call.
+        extend : bool, default=False
+            Whether to add unseen keys to the vocabulary.
+
+        Returns
+        -------
+        ids : np.ndarray of int32 of shape (n_keys)
+            The word id of each key, -1 for unseen keys if extend is False.
+        """
+        keys = np.ascontiguousarray(keys)
+        keys = keys.view(np.dtype((np.void, keys.dtype.itemsize * keys.shape[1])))
+        keys = keys.ravel()
+
+        if self._keys is None:
+            self._keys = keys[:0]
+        n_known = len(self._keys)
+
+        unique, inverse = np.unique(
+            np.concatenate((self._keys, keys)), return_inverse=True
+        )
+        ids = np.full(len(unique), -1, dtype=np.int32)
+        ids[inverse[:n_known]] = self._ids
+
+        if extend:
+            new = ids == -1
+            ids[new] = np.arange(len(self), len(self) + np.count_nonzero(new))
+            self._keys = unique
+            self._ids = ids
+
+        return ids[inverse[n_known:]]
+
+
+class CSRBags:
+    """Word count bags of a set of cases in compressed sparse row format.
+
+    Parameters
+    ----------
+    indptr : np.ndarray of int64 of shape (n_cases + 1)
+        Start of each case in indices and counts, with a final end position.
+    indices : np.ndarray of int32
+        The word id of each count, sorted within each case.
+    counts : np.ndarray of uint32
+        The count of each word.
+    n_words : int
+        The number of word ids, at least one greater than the highest index.
+    """
+
+    def __init__(self, indptr, indices, counts, n_words):
+        self.indptr = indptr
+        self.indices = indices
+        self.counts = counts
+        self.n_words = n_words
+
+    def __len__(self):
+        """Return the number of cases."""
+        return len(self.indptr) - 1
+
+    @property
+    def arrays(self):
+        """Tuple of the indptr, indices and counts arrays."""
+        return self.indptr, self.indices, self.counts
+
+    @classmethod
+    def from_keys(cls, indptr, keys, counts, vocabulary, extend_vocabulary=False):
+        """Create CSR bags from the keys and counts of each case.
+
+        Parameters
+        ----------
+        indptr : np.ndarray of int64 of shape (n_cases + 1)
+            Start of each case in keys and counts, with a final end position.
+        keys : np.ndarray of shape (n_keys, key_width)
+            The key of each count. Keys must be unique within a case.
+        counts : np.ndarray of shape (n_keys)
+            The count of each key.
+        vocabulary : BagVocabulary
+            Maps keys to word ids.
+        extend_vocabulary : bool, default=False
+            Whether to add unseen keys to the vocabulary. If False, unseen keys are
+            dropped.
+
+        Returns
+        -------
+        bags : CSRBags
+            The bags of each case.
+        """
+        ids = vocabulary.lookup(keys, extend=extend_vocabulary)
+        rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        return cls._from_rows(
+            rows[ids >= 0],
+            ids[ids >= 0],
+            counts[ids >= 0],
+            len(indptr) - 1,
+            len(vocabulary),
+        )
+
+    @classmethod
+    def hstack(cls, bags, n_cases):
+        """Join bags of the same cases, giving each a separate range of word ids.
+
+        Parameters
+        ----------
+        bags : list of CSRBags
+            Bags for the same cases, i.e. for different dimensions. Can be empty.
+        n_cases : int
+            The number of cases.
+
+        Returns
+        -------
+        bags : CSRBags
+            The joined bags, word ids of each input are offset by the total n_words
+            of the inputs before it.
+        """
+        offset = 0
+        rows = [np.zeros(0, dtype=np.int64)]
+        indices = [np.zeros(0, dtype=np.int32)]
+        counts = [np.zeros(0, dtype=np.uint32)]
+        for b in bags:
+            rows.append(np.repeat(np.arange(n_cases), np.diff(b.indptr)))
+            indices.append(b.indices + offset)
+            counts.append(b.counts)
+            offset += b.n_words
+
+        return cls._from_rows(
+            np.concatenate(rows),
+            np.concatenate(indices),
+            np.concatenate(counts),
+            n_cases,
+            offset,
+        )
+
+    @classmethod
+    def _from_rows(cls, rows, indices, counts, n_cases, n_words):
+        order = np.lexsort((indices, rows))
+        indptr = np.zeros(n_cases + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(rows, minlength=n_cases))
+        return cls(
+            indptr,
+            indices[order].astype(np.int32),
+            counts[order].astype(np.uint32),
+            n_words,
+        )
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Size bounded least recently used cache of arrays shared between estimators."""
+
+__all__ = ["LRUArrayCache"]
+
+import threading
+from collections import OrderedDict
+
+
+class LRUArrayCache:
+    """Least recently used cache of arrays, bounded by their size in memory.
+
+    Values are arrays or tuples of arrays. Safe to use from multiple threads, copies
+    sent to other processes start empty.
+
+    Parameters
+    ----------
+    max_mb : float, default=256
+        Maximum size of the cached arrays in megabytes. The least recently used
+        entries are removed when the cache grows larger than this.
+    """
+
+    def __init__(self, max_mb=256):
+        self.max_mb = max_mb
+
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        """Return state for pickling, cached values and the lock are not copied."""
+        return {"max_mb": self.max_mb}
+
+    def __setstate__(self, state):
+        """Set state from pickling as an empty cache."""
+        self.__init__(state["max_mb"])
+
+    def lookup(self, key):
+        """Return the cached value for key, or None if not cached."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def store(self, key, value):
+        """Cache the value for key, removing old entries if over the limit.
+
+        Values larger than the limit and keys already in the cache are ignored.
+        """
+        nbytes = (
+            sum(v.nbytes for v in value) if isinstance(value, tuple) else value.nbytes
+        )
+        max_bytes = self.max_mb * 1024 * 1024
+        if nbytes > max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (value, nbytes)
+            self._nbytes += nbytes
+
+            while self._nbytes > max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._nbytes -= evicted
+
+    def get(self, key, compute):
+        """Return the cached value for key, computing and storing it if missing.
+
+        Parameters
+        ----------
+        key : tuple
+            Hashable key of the value.
+        compute : callable
+            Function returning the value, an array or tuple of arrays.
+
+        Returns
+        -------
+        The cached or computed value
+        """
+        value = self.lookup(key)
+        if value is None:
+            value = compute()
+            self.store(key, value)
+        return value
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Batch scheduling for ensembles built under a train time contract."""
+
+__all__ = ["fit_contracted"]
+
+import math
+import time
+
+from joblib import Parallel, delayed
+
+
+def fit_contracted(
+    fit_estimator,
+    time_limit,
+    start_time,
+    max_n_estimators,
+    n_jobs,
+    backend=None,
+    prefer=None,
+    batch_time_fraction=0.5,
+):
+    """Fit ensemble members in batches until a train time limit is reached.
+
+    The first batch fits one estimator per job, and is always fit even if the time
+    limit has already passed. The time taken is used to estimate the time of a round
+    of n_jobs estimators, and each following batch is sized to take
+    batch_time_fraction of the remaining time. Batches shrink as the contract runs
+    out, and no further estimators are fit if a single round is estimated to go over
+    the limit. Workers are kept alive between batches.
+
+    Parameters
+    ----------
+    fit_estimator : callable
+        Called with the index of the estimator to fit, returns the fitted estimator
+        or any other result to keep. The index should be used to seed the estimator.
+    time_limit : float
+        The train time limit in seconds.
+    start_time : float
+        The time training started, as returned by time.time().
+    max_n_estimators : int
+        The maximum number of estimators to fit.
+    n_jobs : int
+        The number of jobs to run in parallel, must be positive.
+    backend : str, ParallelBackendBase instance or None, default=None
+        Joblib backend to use, passed to joblib.Parallel.
+    prefer : str or None, default=None
+        Joblib backend preference, passed to joblib.Parallel.
+    batch_time_fraction : float, default=0.5
+        Fraction of the remaining time each batch after the first is sized to take.
+
+    Returns
+    -------
+    results : list
+        The results of fit_estimator for indices 0 to len(results) - 1, in order.
+    """
+    results = []
+    build_time = 0
+    n_rounds = 0
+
+    with Parallel(n_jobs=n_jobs, backend=backend, prefer=prefer) as parallel:
+        while len(results) < max_n_estimators:
+            remaining_time = time_limit - (time.time() - start_time)
+
+            # the first batch is always fit so the ensemble is never empty
+            if n_rounds == 0:
+                batch_rounds = 1
+            elif remaining_time <= 0:
+                break
+            else:
+                round_time = max(build_time / n_rounds, 1e-6)
+                batch_rounds = int(batch_time_fraction * remaining_time / round_time)
+                if batch_rounds == 0:
+                    if round_time > remaining_time:
+                        break
+                    batch_rounds = 1
+
+            batch_size = min(batch_rounds * n_jobs, max_n_estimators - len(results))
+
+            batch_start = time.time()
+            results += parallel(
+                delayed(fit_estimator)(i)
+                for i in range(len(results), len(results) + batch_size)
+            )
+            build_time += time.time() - batch_start
+            n_rounds += math.ceil(batch_size / n_jobs)
+
+    return results
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""Sliding window Fourier transforms shared by the SFA transformers."""
+
+__author__ = ["MatthewMiddlehurst", "patrickzib"]
+__all__ = ["sliding_mft"]
+
+import math
+
+import numpy as np
+from aeon.utils.validation import check_n_jobs
+from numba import config, get_num_threads, njit, prange, set_num_threads
+
+
+def sliding_mft(
+    X,
+    window_size,
+    length,
+    inverse_sqrt_win_size=1.0,
+    lower_bounding=True,
+    first_dft=None,
+    coefficients=None,
+    phis=None,
+    dtype=np.float64,
+    n_jobs=1,
+):
+    """Find the Fourier coefficients of every sliding window of every series.
+
+    The first window of each series is transformed using the FFT, all further
+    windows are updated from the previous one using the momentary Fourier transform.
+    Each window is normalised by its standard deviation.
+
+    Parameters
+    ----------
+    X : np.ndarray of shape (n_instances, series_length)
+        The series to transform.
+    window_size : int
+        The size of the sliding window.
+    length : int
+        The number of Fourier values to find, the real and imaginary parts of the
+        first length / 2 coefficients.
+    inverse_sqrt_win_size : float, default=1.0
+        Factor to multiply all values by.
+    lower_bounding : bool, default=True
+        If True, the imaginary parts are negated.
+    first_dft : np.ndarray of shape (n_instances, length), default=None
+        Unnormalised Fourier values of the first window of each series. If None,
+        these are found using the FFT.
+    coefficients : np.ndarray of int, default=None
+        The positions of the real parts of the coefficients to compute, in
+        ascending order. If None, all length / 2 coefficients are computed.
+    phis : np.ndarray of shape (length), default=None
+        The real and imaginary parts of the rotation applied to each coefficient
+        when the window slides. If None, these are found from window_size.
+    dtype : np.float64 or np.float32, default=np.float64
+        The type of the output. Values are computed in float64 regardless.
+    n_jobs : int, default=1
+        The number of threads to use.
+
+    Returns
+    -------
+    dfts : np.ndarray of shape (n_instances, n_windows, n_values)
+        The Fourier values of each window, where n_windows is
+        series_length - window_size + 1 and n_values is length or twice the
+        number of coefficients.
+    """
+    n_instances = X.shape[0]
+    end = max(1, X.shape[1] - window_size + 1)
+
+    if first_dft is None:
+        X_fft = np.fft.rfft(X[:, :window_size], axis=1)
+        first_dft = np.empty((n_instances, length), dtype=np.float64)
+        first_dft[:, 0::2] = np.real(X_fft)[:, : length // 2]
+        first_dft[:, 1::2] = np.imag(X_fft)[:, : length // 2]
+
+    if coefficients is None:
+        coefficients = np.arange(0, length, 2)
+
+    if phis is None:
+        phis = _get_phis(window_size, length)
+
+    dfts = np.zeros((n_instances, end, len(coefficients) * 2), dtype=dtype)
+
+    args = (
+        np.asarray(X, dtype=np.float64),
+        first_dft,
+        phis,
+        window_size,
+        coefficients,
+        inverse_sqrt_win_size,
+        lower_bounding,
+        dfts,
+    )
+
+    # parallel regions are only launched when threads are requested, numba
+    # parallel kernels cannot always be safely called from other python threads
+    n_jobs = check_n_jobs(n_jobs)
+    if n_jobs == 1:
+        _sliding_mft_serial(*args)
+    else:
+        prev_threads = get_num_threads()
+        set_num_threads(min(n_jobs, config.NUMBA_NUM_THREADS))
+        try:
+            _sliding_mft(*args)
+        finally:
+            set_num_threads(prev_threads)
+
+    return dfts
+
+
+@njit(fastmath=True, cache=True, parallel=True)
+def _sliding_mft(
+    X,
+    first_dft,
+    phis,
+    window_size,
+    coefficients,
+    inverse_sqrt_win_size,
+    lower_bounding,
+    dfts,
+):
+    for a in prange(X.shape[0]):
+        _sliding_mft_instance(
+            X,
+            first_dft,
+            phis,
+            window_size,
+            coefficients,
+            inverse_sqrt_win_size,
+            lower_bounding,
+            dfts,
+            a,
+        )
+
+
+@njit(fastmath=True, cache=True)
+def _sliding_mft_serial(
+    X,
+    first_dft,
+    phis,
+    window_size,
+    coefficients,
+    inverse_sqrt_win_size,
+    lower_bounding,
+    dfts,
+):
+    for a in range(X.shape[0]):
+        _sliding_mft_instance(
+            X,
+            first_dft,
+            phis,
+            window_size,
+            coefficients,
+            inverse_sqrt_win_size,
+            lower_bounding,
+            dfts,
+            a,
+        )
+
+
+@njit(fastmath=True, cache=True)
+def _sliding_mft_instance(
+    X,
+    first_dft,
+    phis,
+    window_size,
+    coefficients,
+    inverse_sqrt_win_size,
+    lower_bounding,
+    dfts,
+    a,
+):
+    n_coefficients = len(coefficients)
+    sign = -1.0 if lower_bounding else 1.0
+
+    series = X[a]
+    stds = _calc_incremental_mean_std(series, dfts.shape[1], window_size)
+
+    mft_data = np.zeros(n_coefficients * 2)
+    for c in range(n_coefficients):
+        mft_data[c * 2] = first_dft[a, coefficients[c]]
+        mft_data[c * 2 + 1] = first_dft[a, coefficients[c] + 1]
+
+    for i in range(dfts.shape[1]):
+        if i > 0:
+            for c in range(n_coefficients):
+                n = coefficients[c]
+                real = mft_data[c * 2] + series[i + window_size - 1] - series[i - 1]
+                imag = mft_data[c * 2 + 1]
+                mft_data[c * 2] = real * phis[n] - imag * phis[n + 1]
+                mft_data[c * 2 + 1] = real * phis[n + 1] + phis[n] * imag
+
+        for c in range(n_coefficients):
+            dfts[a, i, c * 2] = mft_data[c * 2] * inverse_sqrt_win_size / stds[i]
+            dfts[a, i, c * 2 + 1] = (
+                sign * mft_data[c * 2 + 1] * inverse_sqrt_win_size / stds[i]
+            )
+
+
+@njit(fastmath=True, cache=True)
+def _get_phis(window_size, length):
+    phis = np.zeros(length)
+    for i in range(int(length / 2)):
+        phis[i * 2] += math.cos(2 * math.pi * (-i) / window_size)
+        phis[i * 2 + 1] += -math.sin(2 * math.pi * (-i) / window_size)
+    return phis
+
+
+@njit(fastmath=True, cache=True)
+def _calc_incremental_mean_std(series, end, window_size):
+    stds = np.zeros(end)
+    window = series[0:window_size]
+    series_sum = np.sum(window)
+    square_sum = np.sum(np.multiply(window, window))
+
+    r_window_length = 1.0 / window_size
+    mean = series_sum * r_window_length
+    buf = math.sqrt(max(square_sum * r_window_length - mean * mean, 0.0))
+    stds[0] = buf if buf > 1e-8 else 1
+
+    for w in range(1, end):
+        series_sum += series[w + window_size - 1] - series[w - 1]
+        mean = series_sum * r_window_length
+        square_sum += (
+            series[w + window_size - 1] * series[w + window_size - 1]
+            - series[w - 1] * series[w - 1]
+        )
+        buf = math.sqrt(max(square_sum * r_window_length - mean * mean, 0.0))
+        stds[w] = buf if buf > 1e-8 else 1
+
+    return stds
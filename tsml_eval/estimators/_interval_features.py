@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""Batched catch22 and summary statistic features of series intervals."""
+
+__all__ = ["IntervalFeatureCache", "interval_features"]
+
+import numpy as np
+from aeon.classification.sklearn._continuous_interval_tree import _summary_stat
+from aeon.transformations.panel.catch22 import (
+    _ac_first_zero,
+    _get_acf,
+    _multiply_complex_arr,
+    features,
+)
+
+from tsml_eval.estimators._cache import LRUArrayCache
+
+
+def interval_features(X, intervals, dims, atts, cache=None, cache_key=()):
+    """Find catch22 and summary statistic features for intervals of each series.
+
+    All attributes of an interval are found together, so values used by multiple
+    features such as the mean, Fourier transform and autocorrelation are only
+    computed once per interval. Catch22 features use the outlier normalised series
+    for the outlier include features, as with Catch22(outlier_norm=True).
+
+    Parameters
+    ----------
+    X : np.ndarray of shape (n_instances, n_dims, series_length)
+        The series to extract features from.
+    intervals : np.ndarray of shape (n_intervals, 2)
+        The start and end of each interval.
+    dims : np.ndarray of shape (n_intervals)
+        The dimension of each interval.
+    atts : np.ndarray of int
+        The features to extract from each interval, 0 to 21 are catch22 features and
+        22 to 28 are the summary statistics mean, std, slope, median, iqr, min and
+        max.
+    cache : IntervalFeatureCache, default=None
+        Cache of features shared between calls using the same X. If None, nothing
+        is cached.
+    cache_key : tuple, default=()
+        Key identifying X in the cache, i.e. the representation of the series.
+
+    Returns
+    -------
+    X_t : np.ndarray of float32 of shape (n_instances, n_intervals * len(atts))
+        The features of each interval, ordered by interval then attribute.
+    """
+    X_t = np.empty((X.shape[0], len(intervals) * len(atts)), dtype=np.float32)
+
+    for j in range(len(intervals)):
+        key = cache_key + (dims[j], intervals[j][0], intervals[j][1])
+        values = (
+            [None] * len(atts)
+            if cache is None
+            else [cache.lookup(key + (att,)) for att in atts]
+        )
+
+        missing = [att for att, v in zip(atts, values) if v is None]
+        if len(missing) > 0:
+            series = np.ascontiguousarray(
+                X[:, dims[j], intervals[j][0] : intervals[j][1]]
+            )
+            computed = _features(series, missing)
+            values = [computed.pop(0) if v is None else v for v in values]
+
+            if cache is not None:
+                for att, v in zip(atts, values):
+                    cache.store(key + (att,), v)
+
+        for a, v in enumerate(values):
+            X_t[:, j * len(atts) + a] = v
+
+    return X_t
+
+
+def _features(X, atts):
+    n_instances, series_length = X.shape
+
+    needed = set(int(att) for att in atts)
+    smin = X.min(axis=1) if needed & {0, 1, 11} else None
+    smax = X.max(axis=1) if needed & {0, 1, 11} else None
+    smean = X.mean(axis=1) if needed & {2, 3, 4, 5, 6, 7, 8, 12, 16, 17, 20} else None
+
+    outlier_norm = None
+    if needed & {3, 4}:
+        std = X.std(axis=1)
+        outlier_norm = X.copy()
+        norm = std > 0
+        outlier_norm[norm] = (X[norm] - smean[norm, None]) / std[norm, None]
+
+    fft = None
+    if needed & {5, 6, 7, 8, 12, 16, 17, 20}:
+        nfft = int(np.power(2, np.ceil(np.log(series_length) / np.log(2))))
+        fft = np.fft.fft(X - smean[:, None], n=nfft, axis=1)
+
+    ac = None
+    acfz = None
+    if needed & {5, 6, 12, 16, 17, 20}:
+        ca = np.fft.ifft(np.array([_multiply_complex_arr(f) for f in fft]), axis=1)
+        ac = [_get_acf(X[i], ca[i]) for i in range(n_instances)]
+        if needed & {16, 17, 20}:
+            acfz = [_ac_first_zero(ac[i]) for i in range(n_instances)]
+
+    values = []
+    for att in atts:
+        if att > 21:
+            values.append(_summary_stat(X, att).astype(np.float32))
+            continue
+
+        feature = features[att]
+        if att == 0 or att == 1 or att == 11:
+            f = [feature(X[i], smin[i], smax[i]) for i in range(n_instances)]
+        elif att == 2:
+            f = [feature(X[i], smean[i]) for i in range(n_instances)]
+        elif att == 3 or att == 4:
+            f = [feature(outlier_norm[i]) for i in range(n_instances)]
+        elif att == 7 or att == 8:
+            f = [feature(X[i], fft[i]) for i in range(n_instances)]
+        elif att == 5 or att == 6 or att == 12:
+            f = [feature(ac[i]) for i in range(n_instances)]
+        elif att == 16 or att == 17 or att == 20:
+            f = [feature(X[i], acfz[i]) for i in range(n_instances)]
+        else:
+            f = [feature(X[i]) for i in range(n_instances)]
+        values.append(np.array(f, dtype=np.float32))
+
+    return values
+
+
+class IntervalFeatureCache(LRUArrayCache):
+    """Least recently used cache of interval features.
+
+    Shared by the trees of an interval forest extracting features from the same
+    series, so intervals drawn by more than one tree are only transformed once. Safe
+    to use from multiple threads, copies sent to other processes start empty.
+
+    Parameters
+    ----------
+    max_mb : float, default=256
+        Maximum size of the cached features in megabytes. The least recently used
+        features are removed when the cache grows larger than this.
+    """
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Batched prediction for classifiers of transformed word bags."""
+
+__all__ = ["predict_in_batches"]
+
+import numpy as np
+
+
+def predict_in_batches(clf, transform, X, batch_size):
+    """Predict class values of X, transforming and scoring a batch at a time.
+
+    Parameters
+    ----------
+    clf : sklearn classifier
+        Fitted classifier with a decision_function, predicts from transformed data.
+    transform : callable
+        Function transforming a subset of X into the input of clf.
+    X : 3D np.array of shape = [n_instances, n_dimensions, series_length]
+        The data to make predictions for.
+    batch_size : int or None
+        Number of instances transformed at once. If None, all of X is transformed
+        and clf.predict is used.
+
+    Returns
+    -------
+    y : np.ndarray of shape = [n_instances]
+        Predicted class labels.
+    """
+    if batch_size is not None and (
+        not isinstance(batch_size, (int, np.integer)) or batch_size < 1
+    ):
+        raise ValueError(
+            f"predict_batch_size must be a positive int or None, got {batch_size}."
+        )
+
+    if batch_size is None:
+        return clf.predict(transform(X))
+
+    # score the instances in batches so that only one bag is kept in memory
+    scores = np.concatenate(
+        [
+            clf.decision_function(transform(X[i : i + batch_size]))
+            for i in range(0, X.shape[0], batch_size)
+        ]
+    )
+    if scores.ndim == 1:
+        indices = (scores > 0).astype(int)
+    else:
+        indices = scores.argmax(axis=1)
+    return clf.classes_[indices]
@@ -22,7 +22,10 @@ from sklearn.linear_model import LogisticRegression, RidgeClassifierCV
 from sklearn.pipeline import make_pipeline
 from sklearn.utils import check_random_state
 
-from tsml_eval.estimators.classification.transformations import SFADilation
+from tsml_eval.estimators.classification.dictionary_based._predict import (
+    predict_in_batches,
+)
+from tsml_eval.estimators.classification.transformations import DFTCache, SFADilation
 
 
 class MUSEDilation(BaseClassifier):
@@ -76,9 +79,28 @@ class MUSEDilation(BaseClassifier):
         of words significantly and is thus much faster (preferred). Random also reduces
         the number significantly. None applies not feature selectiona and yields large
         bag of words, e.g. much memory may be needed.
+    dft_cache_mb: float, default=1024
+        Memory limit in megabytes for the dilated series and Fourier transforms
+        shared between ensemble members in fit and predict, split evenly over the
+        dimensions. 0 disables the cache.
+    predict_batch_size: int or None, default=None
+        The number of instances transformed and scored at a time in predict, only
+        the features of one batch are kept in memory. If None, all instances are
+        transformed at once. Must be a positive int if set.
     n_jobs : int, default=1
         The number of jobs to run in parallel for both `fit` and `predict`.
-        ``-1`` means using all processors.
+        ``-1`` means using all processors. Each job transforms one dimension for
+        one ensemble member.
+    parallel_backend : str, ParallelBackendBase instance or None, default=None
+        Specify the parallelisation backend implementation in joblib, if None a 'prefer'
+        value of "threads" is used by default. Threads are the default so that jobs
+        share the Fourier transform cache and fitted transformers are not copied
+        between processes. The SFA numba kernels do not release the GIL, so threaded
+        jobs only run concurrently in the NumPy and SciPy operations that do. For
+        process level parallelism use "loky", which shares X through memory mapping
+        but cannot share the Fourier transform cache between jobs.
+        Valid options are "loky", "multiprocessing", "threading" or a custom backend.
+        See the joblib Parallel documentation for more details.
     random_state: int or None, default=None
         Seed for random, integer
     Attributes
@@ -125,7 +147,10 @@ class MUSEDilation(BaseClassifier):
         use_first_differences=True,
         feature_selection="chi2",
         support_probabilities=False,
+        dft_cache_mb=1024,
+        predict_batch_size=None,
         n_jobs=1,
+        parallel_backend=None,
         random_state=None,
     ):
         self.alphabet_sizes = alphabet_sizes
@@ -152,9 +177,12 @@ class MUSEDilation(BaseClassifier):
         self.clf = None
 
         self.n_jobs = n_jobs
+        self.parallel_backend = parallel_backend
         self.support_probabilities = support_probabilities
         self.total_features_count = 0
         self.feature_selection = feature_selection
+        self.dft_cache_mb = dft_cache_mb
+        self.predict_batch_size = predict_batch_size
 
         super(MUSEDilation, self).__init__()
 
@@ -205,17 +233,34 @@ class MUSEDilation(BaseClassifier):
         # window_inc = max((self.max_window - self.min_window) // 50, 1)
         self.window_sizes = np.arange(self.min_window, self.max_window + 1, 1)
 
-        parallel_res = Parallel(n_jobs=self.n_jobs, backend="threading")(
-            delayed(_parallel_fit)(
+        # members with the same dilation and window size share transforms
+        dft_caches = self._dft_caches()
+
+        # each member draws one set of parameters, used for all of its dimensions
+        member_params = [
+            _member_parameters(
                 ind,
-                X,
-                y.copy(),  # no clue why, but this copy is required.
+                X.shape[-1],
                 self.window_sizes,
                 self.alphabet_sizes,
                 self.word_lengths,
                 self.norm_options,
-                self.use_first_differences,
                 self.binning_strategies,
+                self.random_state,
+            )
+            for ind in range(self.ensemble_size)
+        ]
+
+        # schedule every (member, dimension) pair as a separate job
+        parallel_res = Parallel(
+            n_jobs=self.n_jobs, backend=self.parallel_backend, prefer="threads"
+        )(
+            delayed(_parallel_fit)(
+                ind,
+                dim,
+                X,
+                y.copy(),  # no clue why, but this copy is required.
+                member_params[ind],
                 self.variance,
                 self.anova,
                 self.bigrams,
@@ -223,25 +268,23 @@ class MUSEDilation(BaseClassifier):
                 self.max_feature_count,
                 self.ensemble_size,
                 self.feature_selection,
-                self.random_state,
+                dft_caches[dim],
             )
-            # for ind in range(self.n_dims)
             for ind in range(self.ensemble_size)
+            for dim in range(self.n_dims)
         )
 
-        self.SFA_transformers = []
+        self.SFA_transformers = [[] for _ in range(self.ensemble_size)]
         all_words = []
-        for (
-            sfa_words,
-            transformer,
-        ) in parallel_res:
-            self.SFA_transformers.append(transformer)  # Append! Not Extent! 2d Array
-            all_words.extend(sfa_words)
+        for i, (sfa_words, transformer) in enumerate(parallel_res):
+            # 2d list of transformers, one list of dimensions per member
+            self.SFA_transformers[i // self.n_dims].append(transformer)
+            all_words.append(sfa_words)
 
         if type(all_words[0]) is np.ndarray:
             all_words = np.concatenate(all_words, axis=1)
         else:
-            all_words = hstack((all_words))
+            all_words = hstack(all_words, format="csr")
 
         # Ridge Classifier does not give probabilities
         if not self.support_probabilities:
@@ -276,8 +319,9 @@ class MUSEDilation(BaseClassifier):
         y : array-like, shape = [n_instances]
             Predicted class labels.
         """
-        bag = self._transform_words(X)
-        return self.clf.predict(bag)
+        return predict_in_batches(
+            self.clf, self._transform_words, X, self.predict_batch_size
+        )
 
     # def _predict_proba(self, X) -> np.ndarray:
     #     """Predict class probabilities for n instances in X.
@@ -305,21 +349,31 @@ class MUSEDilation(BaseClassifier):
         if self.use_first_differences:
             X = self._add_first_order_differences(X)
 
-        parallel_res = Parallel(n_jobs=self._threads_to_use, backend="threading")(
-            delayed(_parallel_transform_words)(X, self.SFA_transformers[ind])
+        dft_caches = self._dft_caches()
+        all_words = Parallel(
+            n_jobs=self._threads_to_use,
+            backend=self.parallel_backend,
+            prefer="threads",
+        )(
+            delayed(_parallel_transform_words)(
+                X, self.SFA_transformers[ind][dim], dim, dft_caches[dim]
+            )
             for ind in range(self.ensemble_size)
+            for dim in range(self.n_dims)
         )
 
-        all_words = []
-        for sfa_words in parallel_res:
-            all_words.extend(sfa_words)
         if type(all_words[0]) is np.ndarray:
             all_words = np.concatenate(all_words, axis=1)
         else:
-            all_words = hstack((all_words))
+            all_words = hstack(all_words, format="csr")
 
         return all_words
 
+    def _dft_caches(self):
+        if self.dft_cache_mb <= 0:
+            return [None] * self.n_dims
+        return [DFTCache(self.dft_cache_mb / self.n_dims) for _ in range(self.n_dims)]
+
     def _add_first_order_differences(self, X):
         X_new = np.zeros((X.shape[0], X.shape[1] * 2, X.shape[2]))
         X_new[:, 0 : X.shape[1], :] = X
@@ -354,34 +408,18 @@ class MUSEDilation(BaseClassifier):
         }
 
 
-def _parallel_transform_words(X, SFA_transformers):
-    # On each dimension, perform SFA
+def _parallel_transform_words(X, transformer, dim, dft_cache):
+    return transformer.transform(X[:, dim], dft_cache=dft_cache)
 
-    all_words = []
-    for dim in range(X.shape[1]):
-        words = SFA_transformers[dim].transform(X[:, dim])
-        all_words.append(words)
 
-    return all_words
-
-
-def _parallel_fit(
+def _member_parameters(
     ind,
-    X,
-    y,
+    series_length,
     window_sizes,
     alphabet_sizes,
     word_lengths,
     norm_options,
-    use_first_differences,
     binning_strategies,
-    variance,
-    anova,
-    bigrams,
-    n_jobs,
-    max_feature_count,
-    ensemble_size,
-    feature_selection,
     random_state,
 ):
     if random_state is not None:
@@ -396,39 +434,51 @@ def _parallel_fit(
     first_difference = rng.choice([False])
     binning_strategy = rng.choice(binning_strategies)
 
-    series_length = X.shape[-1]
     dilation = max(
         1,
         np.int32(2 ** rng.uniform(0, np.log2((series_length - 1) / (window_size - 1)))),
     )
 
-    all_words = []
-    SFA_transformers = []
-
-    # On each dimension, perform SFA
-    for dim in range(X.shape[1]):
-        X_dim = X[:, dim]
-
-        transformer = SFADilation(
-            variance=variance,
-            word_length=word_length,
-            alphabet_size=alphabet_size,
-            window_size=window_size,
-            norm=norm,
-            anova=anova,
-            binning_method=binning_strategy,
-            # remove_repeat_words=remove_repeat_words,
-            bigrams=bigrams,
-            dilation=dilation,
-            # lower_bounding=lower_bounding,
-            first_difference=first_difference,
-            feature_selection=feature_selection,
-            max_feature_count=int(max_feature_count / (ensemble_size * X.shape[1])),
-            random_state=ind,
-            return_sparse=False,
-            n_jobs=n_jobs,
-        )
-        all_words.append(transformer.fit_transform(X_dim, y))
-        SFA_transformers.append(transformer)
+    return {
+        "window_size": window_size,
+        "alphabet_size": alphabet_size,
+        "word_length": word_length,
+        "norm": norm,
+        "first_difference": first_difference,
+        "binning_method": binning_strategy,
+        "dilation": dilation,
+    }
+
+
+def _parallel_fit(
+    ind,
+    dim,
+    X,
+    y,
+    params,
+    variance,
+    anova,
+    bigrams,
+    n_jobs,
+    max_feature_count,
+    ensemble_size,
+    feature_selection,
+    dft_cache,
+):
+    # perform SFA on one dimension
+    transformer = SFADilation(
+        variance=variance,
+        anova=anova,
+        # remove_repeat_words=remove_repeat_words,
+        bigrams=bigrams,
+        # lower_bounding=lower_bounding,
+        feature_selection=feature_selection,
+        max_feature_count=int(max_feature_count / (ensemble_size * X.shape[1])),
+        random_state=ind,
+        return_sparse=True,
+        n_jobs=n_jobs,
+        **params,
+    )
+    words = transformer.fit_transform(X[:, dim], y, dft_cache=dft_cache)
 
-    return all_words, SFA_transformers
+    return words, transformer
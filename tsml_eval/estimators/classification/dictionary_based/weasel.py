@@ -25,7 +25,10 @@ from sklearn.linear_model import RidgeClassifierCV
 # from sklearn.pipeline import make_pipeline
 from sklearn.utils import check_random_state
 
-from tsml_eval.estimators.classification.transformations import SFADilation
+from tsml_eval.estimators.classification.dictionary_based._predict import (
+    predict_in_batches,
+)
+from tsml_eval.estimators.classification.transformations import DFTCache, SFADilation
 
 # from aeon.transformations.panel.rocket import MiniRocket
 
@@ -68,6 +71,13 @@ class WEASELDilation(BaseClassifier):
         The binning method used to derive the breakpoints.
     random_state: int or None, default=None
         Seed for random, integer
+    dft_cache_mb: float, default=1024
+        Memory limit in megabytes for the dilated series and Fourier transforms
+        shared between ensemble members in fit and predict. 0 disables the cache.
+    predict_batch_size: int or None, default=None
+        The number of instances transformed and scored at a time in predict, only
+        the features of one batch are kept in memory. If None, all instances are
+        transformed at once. Must be a positive int if set.
     Attributes
     ----------
     n_classes_ : int
@@ -113,6 +123,8 @@ class WEASELDilation(BaseClassifier):
         remove_repeat_words=False,
         random_state=None,
         sections=1,
+        dft_cache_mb=1024,
+        predict_batch_size=None,
         n_jobs=4,
     ):
         self.alphabet_sizes = alphabet_sizes
@@ -140,6 +152,8 @@ class WEASELDilation(BaseClassifier):
         self.series_length = 0
         self.n_instances = 0
         self.sections = sections
+        self.dft_cache_mb = dft_cache_mb
+        self.predict_batch_size = predict_batch_size
 
         self.SFA_transformers = []
 
@@ -193,6 +207,9 @@ class WEASELDilation(BaseClassifier):
         # Randomly choose window sizes
         self.window_sizes = np.arange(self.min_window, self.max_window + 1, 1)
 
+        # members with the same dilation and window size share transforms
+        dft_cache = DFTCache(self.dft_cache_mb) if self.dft_cache_mb > 0 else None
+
         parallel_res = Parallel(n_jobs=self.n_jobs, timeout=99999, backend="threading")(
             delayed(_parallel_fit)(
                 i,
@@ -216,6 +233,7 @@ class WEASELDilation(BaseClassifier):
                 self.remove_repeat_words,
                 self.sections,
                 self.random_state,
+                dft_cache,
             )
             for i in range(self.ensemble_size)
         )
@@ -229,7 +247,7 @@ class WEASELDilation(BaseClassifier):
         if type(sfa_words[0]) is np.ndarray:
             all_words = np.concatenate(sfa_words, axis=1)
         else:
-            all_words = hstack(sfa_words)
+            all_words = hstack(sfa_words, format="csr")
 
         self.clf = RidgeClassifierCV(alphas=np.logspace(-1, 5, 10))
 
@@ -251,8 +269,9 @@ class WEASELDilation(BaseClassifier):
         y : array-like, shape = [n_instances]
             Predicted class labels.
         """
-        bag = self._transform_words(X)
-        return self.clf.predict(bag)
+        return predict_in_batches(
+            self.clf, self._transform_words, X, self.predict_batch_size
+        )
 
     # def _predict_proba(self, X) -> np.ndarray:
     #     """Predict class probabilities for n instances in X.
@@ -278,9 +297,11 @@ class WEASELDilation(BaseClassifier):
 
     def _transform_words(self, X):
         XX = X.squeeze(1)
+        dft_cache = DFTCache(self.dft_cache_mb) if self.dft_cache_mb > 0 else None
 
         parallel_res = Parallel(n_jobs=self.n_jobs, timeout=99999, backend="threading")(
-            delayed(transformer.transform)(XX) for transformer in self.SFA_transformers
+            delayed(transformer.transform)(XX, dft_cache=dft_cache)
+            for transformer in self.SFA_transformers
         )
 
         all_words = []
@@ -295,7 +316,7 @@ class WEASELDilation(BaseClassifier):
             all_words = np.concatenate(all_words, axis=1)
         else:
             # all_words.append(csr_matrix(X_features.values))
-            all_words = hstack(all_words)
+            all_words = hstack(all_words, format="csr")
 
         return all_words
 
@@ -344,6 +365,7 @@ def _parallel_fit(
     remove_repeat_words,
     sections,
     random_state,
+    dft_cache=None,
 ):
     if random_state is None:
         rng = check_random_state(None)
@@ -389,7 +411,7 @@ def _parallel_fit(
         )
 
         # generate SFA words on sample
-        words = transformer.fit_transform(X, y)
+        words = transformer.fit_transform(X, y, dft_cache=dft_cache)
         all_words.append(words)
         all_transformers.append(transformer)
     return all_words, all_transformers
@@ -433,7 +455,7 @@ def getSFADilated(
         sections=sections,
         max_feature_count=max_feature_count // ensemble_size,  # TODO * 2
         random_state=i,
-        return_sparse=False,
+        return_sparse=True,
         n_jobs=n_jobs,
     )
     return transformer
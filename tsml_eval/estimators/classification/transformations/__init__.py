@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 """"""
-__all__ = ["SFADilation"]
+__all__ = ["SFADilation", "DFTCache"]
 
-from tsml_eval.estimators.classification.transformations.sfa_dilation import SFADilation
+from tsml_eval.estimators.classification.transformations.sfa_dilation import (
+    DFTCache,
+    SFADilation,
+)
@@ -4,7 +4,7 @@ Configurable SFA transform for discretising time series into words.
 """
 
 __author__ = ["patrickzib"]
-__all__ = ["SFADilation"]
+__all__ = ["SFADilation", "DFTCache"]
 
 import math
 import sys
@@ -21,14 +21,16 @@ from numba import (  # set_num_threads,
     objmode,
     prange,
 )
-from numba.core import types
-from numba.typed import Dict
 from scipy.sparse import csr_matrix, hstack
-from sklearn.feature_selection import chi2, f_classif
+from scipy.special import chdtrc
+from sklearn.feature_selection import f_classif
 from sklearn.preprocessing import KBinsDiscretizer
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.utils import check_random_state
 
+from tsml_eval.estimators._cache import LRUArrayCache
+from tsml_eval.estimators._fourier import sliding_mft
+
 # The binning methods to use: equi-depth, equi-width, information gain or kmeans
 binning_methods = {"equi-depth", "equi-width", "information-gain", "kmeans", "quantile"}
 
@@ -78,14 +80,15 @@ class SFADilation(BaseTransformer):
             of words significantly and is thus much faster (preferred). Random also
             reduces the number significantly. None applies not feature selectiona and
             yields large bag of words, e.g. much memory may be needed.
-        p_threshold:  int, default=0.05 (disabled by default)
+        p_threshold:  float, default=1.0 (disabled by default)
             If feature_selection=chi2 is chosen, feature selection is applied based on
             the chi-squared test. This is the p-value threshold to use for chi-squared
             test on bag-of-words (lower means more strict). 1 indicates that the test
             should not be performed.
         max_feature_count:  int, default=256
             If feature_selection=random is chosen, this parameter defines the number of
-            randomly chosen unique words used.
+            randomly chosen unique words used. If feature_selection=chi2 is chosen,
+            this is the number of words with the lowest p-values used.
         skip_grams:     boolean, default = False
             whether to create skip-grams of SFA words
         remove_repeat_words: boolean, default = False
@@ -106,6 +109,12 @@ class SFADilation(BaseTransformer):
     breakpoints: = []
     num_insts = 0
     num_atts = 0
+    Notes
+    -----
+    The sliding window Fourier transform always runs in a serial numba kernel.
+    WEASELDilation and MUSEDilation fit their SFADilation members in joblib threads,
+    and launching numba parallel regions from those threads can leave the TBB
+    threading layer hanging at interpreter exit.
     References
     ----------
     .. [1] Schäfer, Patrick, and Mikael Högqvist. "SFA: a symbolic fourier approximation
@@ -144,7 +153,7 @@ class SFADilation(BaseTransformer):
         feature_selection="none",
         sections=1,
         max_feature_count=256,
-        p_threshold=0.05,
+        p_threshold=1.0,
         random_state=None,
         return_sparse=True,
         return_pandas_data_series=False,
@@ -189,7 +198,8 @@ class SFADilation(BaseTransformer):
         self.feature_selection = feature_selection
         self.max_feature_count = max_feature_count
         self.feature_count = 0
-        self.relevant_features = None
+        self.relevant_words = None
+        self.relevant_word_ids = None
 
         # feature selection is applied based on the chi-squared test.
         self.p_threshold = p_threshold
@@ -210,8 +220,21 @@ class SFADilation(BaseTransformer):
         if not return_pandas_data_series:
             self._output_convert = "off"
 
-    def fit_transform(self, X, y=None):
-        """Fit to data, then transform it."""
+    def fit_transform(self, X, y=None, dft_cache=None):
+        """Fit to data, then transform it.
+
+        Parameters
+        ----------
+        X : pandas DataFrame or 3d numpy array, input time series.
+        y : array_like, target values (optional, ignored).
+        dft_cache : DFTCache, default=None
+            Cache of dilated series and Fourier transforms shared with other
+            transformers applied to the same X. If None, nothing is cached.
+
+        Returns
+        -------
+        Bag-of-patterns of each series
+        """
         if self.alphabet_size < 2:
             raise ValueError("Alphabet size must be an integer greater than 2")
 
@@ -246,9 +269,11 @@ class SFADilation(BaseTransformer):
         X = check_X(X, enforce_univariate=True, coerce_to_numpy=True)
         X = X.squeeze(1)
 
-        X2, self.X_index = _dilation(X, self.dilation, self.first_difference)
+        X2, self.X_index = _cached_dilation(
+            X, self.dilation, self.first_difference, dft_cache
+        )
         self.n_instances, self.series_length = X2.shape
-        self.breakpoints = self._binning(X2, y)
+        self.breakpoints = self._binning(X2, y, dft_cache)
         self._is_fitted = True
 
         words, dfts = _transform_case(
@@ -267,6 +292,8 @@ class SFADilation(BaseTransformer):
             self.skip_grams,
             self.inverse_sqrt_win_size,
             self.lower_bounding,
+            dft_cache,
+            (self.dilation, self.first_difference),
         )
 
         if self.remove_repeat_words:
@@ -285,35 +312,16 @@ class SFADilation(BaseTransformer):
 
     def add_level(self, bag, words):
         """Add one pyramid level."""
-        empty_dict = Dict.empty(
-            key_type=types.uint32,
-            value_type=types.uint32,
-        )
-
         idx = self.X_index[: words.shape[1]] < len(self.X_index) // 2
 
-        bag_lvl2_l = create_bag_transform(
-            self.X_index,
-            self.feature_count,
-            self.feature_selection,
-            self.relevant_features if self.relevant_features else empty_dict,
-            words[:, idx],
-            self.remove_repeat_words,
-            self.sections,
-        )[0]
-        bag_lvl2_r = create_bag_transform(
-            self.X_index,
-            self.feature_count,
-            self.feature_selection,
-            self.relevant_features if self.relevant_features else empty_dict,
-            words[:, ~idx],
-            self.remove_repeat_words,
-            self.sections,
-        )[0]
+        bag_lvl2_l = self._transform_bag(words[:, idx])
+        bag_lvl2_r = self._transform_bag(words[:, ~idx])
         if type(bag) is np.ndarray:
-            return np.concatenate([bag, bag_lvl2_l, bag_lvl2_r], axis=1)
+            return np.concatenate(
+                [bag, bag_lvl2_l.toarray(), bag_lvl2_r.toarray()], axis=1
+            )
         else:
-            return hstack([bag, bag_lvl2_l, bag_lvl2_r])
+            return hstack([bag, bag_lvl2_l, bag_lvl2_r], format="csr")
 
     def fit(self, X, y=None):
         """Calculate word breakpoints using MCB or IGB.
@@ -329,12 +337,15 @@ class SFADilation(BaseTransformer):
         self.fit_transform(X, y)
         return self
 
-    def transform(self, X, y=None):
+    def transform(self, X, y=None, dft_cache=None):
         """Transform data into SFA words.
         Parameters
         ----------
         X : pandas DataFrame or 3d numpy array, input time series.
         y : array_like, target values (optional, ignored).
+        dft_cache : DFTCache, default=None
+            Cache of dilated series and Fourier transforms shared with other
+            transformers applied to the same X. If None, nothing is cached.
         Returns
         -------
         List of dictionaries containing SFA words
@@ -343,7 +354,9 @@ class SFADilation(BaseTransformer):
         X = check_X(X, enforce_univariate=True, coerce_to_numpy=True)
         X = X.squeeze(1)
 
-        X2, self.X_index = _dilation(X, self.dilation, self.first_difference)
+        X2, self.X_index = _cached_dilation(
+            X, self.dilation, self.first_difference, dft_cache
+        )
         words, dfts = _transform_case(
             X2,
             self.window_size,
@@ -360,6 +373,8 @@ class SFADilation(BaseTransformer):
             self.skip_grams,
             self.inverse_sqrt_win_size,
             self.lower_bounding,
+            dft_cache,
+            (self.dilation, self.first_difference),
         )
 
         # only save at fit
@@ -367,33 +382,11 @@ class SFADilation(BaseTransformer):
         #    self.words = words
 
         # transform: applies the feature selection strategy
-        empty_dict = Dict.empty(
-            key_type=types.uint32,
-            value_type=types.uint32,
-        )
-
-        # transform
-        bags = create_bag_transform(
-            self.X_index,
-            self.feature_count,
-            self.feature_selection,
-            self.relevant_features if self.relevant_features else empty_dict,
-            words,
-            self.remove_repeat_words,
-            self.sections,
-        )[0]
+        bags = self._transform_bag(words)
 
         # bags = self.add_level(bags, words)
 
-        if self.return_pandas_data_series:
-            bb = pd.DataFrame()
-            bb[0] = [pd.Series(bag) for bag in bags]
-            return bb
-        elif self.return_sparse:
-            bags = csr_matrix(bags, dtype=np.uint32)
-
-        # bags[bags==0] = -10
-        return bags
+        return self._format_bag(bags)
 
     def transform_to_bag(self, words, word_len, y=None):
         """Transform words to bag-of-pattern and apply feature selection."""
@@ -405,30 +398,16 @@ class SFADilation(BaseTransformer):
             and not self.bigrams
             and self.word_length <= 8
         ):
-            bag_of_words = create_bag_none(
-                self.X_index,
-                self.breakpoints,
-                words.shape[0],
-                words,
-                word_len,  # self.word_length_actual,
-                self.remove_repeat_words,
-                sections=self.sections,
-            )
+            feature_count = self.breakpoints.shape[1] ** word_len
+            if self.sections > 1:
+                feature_count *= 2
+            self.relevant_words = None
+            bag_of_words = self._create_bag(words, feature_count, False)
         else:
-            feature_names = create_feature_names(words)
+            feature_names = np.unique(words)
 
             if self.feature_selection == "none":
-                feature_count = len(list(feature_names))
-                relevant_features_idx = np.arange(feature_count, dtype=np.uint32)
-                bag_of_words, self.relevant_features = create_bag_feature_selection(
-                    self.X_index,
-                    words.shape[0],
-                    relevant_features_idx,
-                    np.array(list(feature_names)),
-                    words,
-                    self.remove_repeat_words,
-                    self.sections,
-                )
+                relevant_features_idx = np.arange(len(feature_names))
 
             # Random feature selection
             elif self.feature_selection == "random":
@@ -436,63 +415,77 @@ class SFADilation(BaseTransformer):
                 relevant_features_idx = rng.choice(
                     len(feature_names), replace=False, size=feature_count
                 )
-                bag_of_words, self.relevant_features = create_bag_feature_selection(
-                    self.X_index,
-                    words.shape[0],
-                    relevant_features_idx,
-                    np.array(list(feature_names)),
-                    words,
-                    self.remove_repeat_words,
-                    self.sections,
-                )
 
-            # Chi-squared feature selection
+            # Chi-squared feature selection, over the bag of all words
             elif self.feature_selection == "chi2":
-                feature_names_array = np.array(list(feature_names))
-                feature_count = len(feature_names_array)
-                relevant_features_idx = np.arange(feature_count, dtype=np.uint32)
-                bag_of_words, _ = create_bag_feature_selection(
-                    self.X_index,
-                    words.shape[0],
-                    relevant_features_idx,
-                    feature_names_array,
-                    words,
-                    self.remove_repeat_words,
-                    self.sections,
-                )
+                relevant_features_idx = np.arange(len(feature_names))
+
+            self._set_relevant_words(feature_names[relevant_features_idx])
+            bag_of_words = self._create_bag(words, len(relevant_features_idx), True)
 
-                chi2_statistics, p = chi2(bag_of_words, y)
+            if self.feature_selection == "chi2":
+                p = _chi2_p_values(bag_of_words, y)
                 relevant_features_idx = np.argsort(p)[: self.max_feature_count]
-                # relevant_features_idx = np.where(p <= self.p_threshold)[0]
+                if self.p_threshold < 1:
+                    relevant_features_idx = relevant_features_idx[
+                        p[relevant_features_idx] <= self.p_threshold
+                    ]
 
                 # select subset of features
                 bag_of_words = bag_of_words[:, relevant_features_idx]
-
-                relevant_features_idx = relevant_features_idx[
-                    relevant_features_idx < len(feature_names_array)
-                ]
-                self.relevant_features = Dict.empty(
-                    key_type=types.uint32, value_type=types.uint32
-                )
-                for k, v in zip(
-                    feature_names_array[relevant_features_idx],
-                    np.arange(len(relevant_features_idx)),
-                ):
-                    self.relevant_features[k] = v
+                self._set_relevant_words(feature_names[relevant_features_idx])
 
         self.feature_count = bag_of_words.shape[1]
 
+        return self._format_bag(bag_of_words)
+
+    def _set_relevant_words(self, words):
+        # sorted for lookup, with the feature index of each word
+        order = np.argsort(words, kind="stable")
+        self.relevant_words = words[order]
+        self.relevant_word_ids = order.astype(np.int64)
+
+    def _create_bag(self, words, feature_count, use_relevant_words):
+        """Count words into a sparse bag, mapped by the relevant words if used."""
+        if use_relevant_words:
+            relevant_words = self.relevant_words
+            relevant_word_ids = self.relevant_word_ids
+        else:
+            relevant_words = np.zeros(0, dtype=words.dtype)
+            relevant_word_ids = np.zeros(0, dtype=np.int64)
+
+        indptr, indices, data = create_bag_csr(
+            self.X_index,
+            feature_count,
+            relevant_words,
+            relevant_word_ids,
+            use_relevant_words,
+            words,
+            self.remove_repeat_words,
+            self.sections,
+        )
+        return csr_matrix(
+            (data, indices, indptr), shape=(words.shape[0], feature_count)
+        )
+
+    def _transform_bag(self, words):
+        """Count words into a sparse bag using the fitted feature selection."""
+        return self._create_bag(
+            words, self.feature_count, self.relevant_words is not None
+        )
+
+    def _format_bag(self, bag):
         if self.return_pandas_data_series:
             bb = pd.DataFrame()
-            bb[0] = [pd.Series(bag) for bag in bag_of_words]
+            bb[0] = [pd.Series(b) for b in bag.toarray()]
             return bb
         elif self.return_sparse:
-            bag_of_words = csr_matrix(bag_of_words, dtype=np.uint32)
-        return bag_of_words
+            return bag
+        else:
+            return bag.toarray()
 
-    def _binning(self, X, y=None):
-        dft = _binning_dft(
-            X,
+    def _binning(self, X, y=None, dft_cache=None):
+        args = (
             self.window_size,
             self.series_length,
             self.dft_length,
@@ -500,6 +493,13 @@ class SFADilation(BaseTransformer):
             self.inverse_sqrt_win_size,
             self.lower_bounding,
         )
+        if dft_cache is None:
+            dft = _binning_dft(X, *args)
+        else:
+            dft = dft_cache.get(
+                ("binning", self.dilation, self.first_difference) + args,
+                lambda: _binning_dft(X, *args),
+            )
 
         if y is not None:
             y = np.repeat(y, dft.shape[0] / len(y))
@@ -664,22 +664,86 @@ class SFADilation(BaseTransformer):
         """Whether `fit` has been called."""
         self._is_fitted = True
 
-    def __getstate__(self):
-        """Return state as dictionary for pickling, required for typed Dict objects."""
-        state = self.__dict__.copy()
 
-        if type(state["relevant_features"]) == Dict:
-            state["relevant_features"] = dict(state["relevant_features"])
-        return state
+class DFTCache(LRUArrayCache):
+    """Least recently used cache of dilated series and sliding window DFTs.
+
+    Shared by SFADilation transformers applied to the same series, i.e. the members
+    of a WEASELDilation ensemble, so members with the same dilation and window size
+    do not repeat the transform. Fourier coefficients are cached separately, so
+    transformers using different coefficients can share the ones they have in
+    common. Safe to use from multiple threads, copies sent to other processes start
+    empty.
+
+    Parameters
+    ----------
+    max_mb : float, default=1024
+        Maximum size of the cached arrays in megabytes. The least recently used
+        entries are removed when the cache grows larger than this.
+    """
+
+    def __init__(self, max_mb=1024):
+        super(DFTCache, self).__init__(max_mb=max_mb)
+
+    def sliding_mft(
+        self,
+        X,
+        key,
+        window_size,
+        coefficients,
+        inverse_sqrt_win_size,
+        lower_bounding,
+    ):
+        """Find the sliding window Fourier values of the given coefficients.
+
+        Parameters
+        ----------
+        X : np.ndarray of shape (n_instances, series_length)
+            The dilated series, the same for every call with the same key.
+        key : tuple
+            Key of the dilation applied to X.
+        window_size : int
+            The size of the sliding window.
+        coefficients : np.ndarray of int
+            The positions of the real parts of the coefficients, in ascending
+            order.
+        inverse_sqrt_win_size : float
+            Factor to multiply all values by.
+        lower_bounding : bool
+            If True, the imaginary parts are negated.
+
+        Returns
+        -------
+        dfts : np.ndarray of shape (n_instances, n_windows, 2 * len(coefficients))
+            The real and imaginary values of each coefficient.
+        """
+        key = ("mft", window_size, inverse_sqrt_win_size, lower_bounding) + key
+        values = [self.lookup(key + (c,)) for c in coefficients]
 
-    def __setstate__(self, state):
-        """Set current state using input pickling, required for typed Dict objects."""
-        self.__dict__.update(state)
-        if type(self.relevant_features) == dict:
-            typed_dict = Dict.empty(key_type=types.uint32, value_type=types.uint32)
-            for key, value in self.relevant_features.items():
-                typed_dict[key] = value
-            self.relevant_features = typed_dict
+        missing = np.array(
+            [c for c, v in zip(coefficients, values) if v is None], dtype=np.int64
+        )
+        if len(missing) > 0:
+            length = missing[-1] + 2
+            dfts = sliding_mft(
+                X,
+                window_size,
+                length,
+                inverse_sqrt_win_size=inverse_sqrt_win_size,
+                lower_bounding=lower_bounding,
+                coefficients=missing,
+                phis=_get_phis(window_size, length),
+            )
+
+            computed = {}
+            for i, c in enumerate(missing):
+                computed[c] = np.ascontiguousarray(dfts[:, :, i * 2 : i * 2 + 2])
+                self.store(key + (c,), computed[c])
+            values = [
+                computed[c] if v is None else v for c, v in zip(coefficients, values)
+            ]
+
+        return np.concatenate(values, axis=2)
 
 
 @njit(fastmath=True, cache=True)
@@ -753,7 +817,6 @@ def _fast_fourier_transform(X, norm, dft_length, inverse_sqrt_win_size):
     return dft[:, start:]
 
 
-@njit(fastmath=True, cache=True)
 def _transform_case(
     X,
     window_size,
@@ -770,6 +833,8 @@ def _transform_case(
     skip_grams,
     inverse_sqrt_win_size,
     lower_bounding,
+    dft_cache=None,
+    cache_key=(),
 ):
     dfts = _mft(
         X,
@@ -781,6 +846,8 @@ def _transform_case(
         variance,
         inverse_sqrt_win_size,
         lower_bounding,
+        dft_cache,
+        cache_key,
     )
 
     words = generate_words(
@@ -813,31 +880,6 @@ def remove_repeating_words(words):
     return words
 
 
-@njit(fastmath=True, cache=True)
-def _calc_incremental_mean_std(series, end, window_size):
-    stds = np.zeros(end)
-    window = series[0:window_size]
-    series_sum = np.sum(window)
-    square_sum = np.sum(np.multiply(window, window))
-
-    r_window_length = 1.0 / window_size
-    mean = series_sum * r_window_length
-    buf = math.sqrt(max(square_sum * r_window_length - mean * mean, 0.0))
-    stds[0] = buf if buf > 1e-8 else 1
-
-    for w in range(1, end):
-        series_sum += series[w + window_size - 1] - series[w - 1]
-        mean = series_sum * r_window_length
-        square_sum += (
-            series[w + window_size - 1] * series[w + window_size - 1]
-            - series[w - 1] * series[w - 1]
-        )
-        buf = math.sqrt(max(square_sum * r_window_length - mean * mean, 0.0))
-        stds[w] = buf if buf > 1e-8 else 1
-
-    return stds
-
-
 @njit(fastmath=True, cache=True)
 def _get_phis(window_size, length):
     phis = np.zeros(length)
@@ -901,7 +943,6 @@ def generate_words(
     return words
 
 
-@njit(fastmath=True, cache=True)
 def _mft(
     X,
     window_size,
@@ -912,10 +953,13 @@ def _mft(
     variance,
     inverse_sqrt_win_size,
     lower_bounding,
+    dft_cache=None,
+    cache_key=(),
 ):
+    # transformers are run in threads by the dilation ensembles, so the serial
+    # kernel is used rather than launching numba parallel regions from them
     start_offset = 2 if norm else 0
     length = dft_length + start_offset + dft_length % 2
-    end = max(1, len(X[0]) - window_size + 1)
 
     #  compute mask for only those indices needed and not all indices
     if anova or variance:
@@ -930,55 +974,42 @@ def _mft(
             else:  # uneven
                 indices[s - 1] = True
         mask = mask[indices]
+        coefficients = np.flatnonzero(indices[0::2]) * 2
     else:
-        indices = np.full(length, True)
-
-    phis = _get_phis(window_size, length)
-    transformed = np.zeros((X.shape[0], end, length))
+        mask = None
+        coefficients = np.arange(start_offset, length, 2)
 
-    # 1. First run using DFT
-    with objmode(X_ffts="complex128[:,:]"):
-        X_ffts = np.fft.rfft(X[:, :window_size], axis=1)  # complex128
-    reals = np.real(X_ffts)  # float64[]
-    imags = np.imag(X_ffts)  # float64[]
-    transformed[:, 0, 0::2] = reals[:, 0 : length // 2]
-    transformed[:, 0, 1::2] = imags[:, 0 : length // 2]
-
-    # 2. Other runs using MFT
-    # X2 = X.reshape(X.shape[0], X.shape[1], 1)
-    # Bugfix to allow for slices on original X like in TEASER
-    X2 = X.copy().reshape(X.shape[0], X.shape[1], 1)
-
-    # compute only those indices needed and not all
-    phis2 = phis[indices]
-    transformed2 = transformed[:, :, indices]
-    for i in range(1, end):
-        reals = transformed2[:, i - 1, 0::2] + X2[:, i + window_size - 1] - X2[:, i - 1]
-        imags = transformed2[:, i - 1, 1::2]
-        transformed2[:, i, 0::2] = (
-            reals * phis2[:length:2] - imags * phis2[1 : (length + 1) : 2]
+    # compute only those coefficients needed and not all
+    if dft_cache is None:
+        dfts = sliding_mft(
+            X,
+            window_size,
+            length,
+            inverse_sqrt_win_size=inverse_sqrt_win_size,
+            lower_bounding=lower_bounding,
+            coefficients=coefficients,
+            phis=_get_phis(window_size, length),
         )
-        transformed2[:, i, 1::2] = (
-            reals * phis2[1 : (length + 1) : 2] + phis2[:length:2] * imags
+    else:
+        dfts = dft_cache.sliding_mft(
+            X,
+            cache_key,
+            window_size,
+            coefficients,
+            inverse_sqrt_win_size,
+            lower_bounding,
         )
 
-    transformed2 = transformed2 * inverse_sqrt_win_size
+    return dfts if mask is None else dfts[:, :, mask]
 
-    if lower_bounding:
-        transformed2[:, :, 1::2] = transformed2[:, :, 1::2] * -1
-
-    # compute STDs
-    stds = np.zeros((X.shape[0], end))
-    for a in range(X.shape[0]):
-        stds[a] = _calc_incremental_mean_std(X[a], end, window_size)
 
-    # divide all by stds and use only the best indices
-    if anova or variance:
-        return transformed2[:, :, mask] / stds.reshape(stds.shape[0], stds.shape[1], 1)
-    else:
-        return (transformed2 / stds.reshape(stds.shape[0], stds.shape[1], 1))[
-            :, :, start_offset:
-        ]
+def _cached_dilation(X, d, first_difference, dft_cache=None):
+    if dft_cache is None:
+        return _dilation(X, d, first_difference)
+    return dft_cache.get(
+        ("dilation", d, first_difference),
+        lambda: _dilation(X, d, first_difference),
+    )
 
 
 def _dilation(X, d, first_difference):
@@ -1015,183 +1046,121 @@ def _dilation2(X, d):
         return X.astype(np.float_)
 
 
-@njit(cache=True, fastmath=True)
-def create_feature_names(sfa_words):
-    feature_names = set()
-    for t_words in sfa_words:
-        for t_word in t_words:
-            feature_names.add(t_word)
-    return feature_names
+def _chi2_p_values(bag, y):
+    """Find the chi-squared test p-value of each word against the class labels.
+
+    Observed counts are the class-wise sums of the bag, found using a sparse one-hot
+    class matrix, and expected counts follow from the class frequencies.
+    """
+    classes, y_idx = np.unique(y, return_inverse=True)
+    one_hot = csr_matrix(
+        (np.ones(len(y_idx)), (y_idx, np.arange(len(y_idx)))),
+        shape=(len(classes), len(y_idx)),
+    )
+
+    observed = (one_hot @ bag).toarray()
+    class_prob = np.bincount(y_idx) / len(y_idx)
+    expected = np.outer(class_prob, observed.sum(axis=0))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        chi2_statistics = ((observed - expected) ** 2 / expected).sum(axis=0)
+    return chdtrc(len(classes) - 1, chi2_statistics)
 
 
 @njit(cache=True, fastmath=True)
-def create_bag_none(
+def create_bag_csr(
     X_index,
-    breakpoints,
-    n_instances,
+    feature_count,
+    relevant_words,
+    relevant_word_ids,
+    use_relevant_words,
     sfa_words,
-    word_length,
     remove_repeat_words,
     sections,
 ):
-    feature_count = np.uint32(breakpoints.shape[1] ** word_length)
-    needed_size = feature_count
-    if sections > 1:
-        needed_size = 2 * feature_count
-    all_win_words = np.zeros((n_instances, needed_size), dtype=np.int32)
-
-    for j in prange(sfa_words.shape[0]):
-        # this mask is used to encode the repeated words
-        if remove_repeat_words:
-            masked = np.nonzero(sfa_words[j])
-            all_win_words[j, :feature_count] = np.bincount(
-                sfa_words[j][masked], minlength=feature_count
-            )
-        else:
-            all_win_words[j, :feature_count] = np.bincount(
-                sfa_words[j], minlength=feature_count
-            )
+    """Count the words of each instance into CSR indptr, indices and data arrays.
 
-    # count number of sections the word is present
-    if sections > 1:
-        section_count = np.zeros(
-            (n_instances, feature_count, sections), dtype=np.uint32
-        )
-        max_index = max(X_index) + 1
-        for j in range(sfa_words.shape[0]):
-            for i in range(sfa_words.shape[1]):
-                section_count[
-                    j, sfa_words[j, i], int(X_index[i] / max_index * sections)
-                ] = 1
-                # all_win_words[j, feature_count + sfa_words[j, i]] = max(
-                #     X_index[i], all_win_words[j, feature_count + sfa_words[j, i]]
-                # )
-        all_win_words[:, feature_count:] = section_count.sum(axis=-1)
+    If use_relevant_words is False, words are used as their own feature index.
+    Otherwise words are mapped to the id of the matching sorted relevant word, and
+    others are dropped.
+    """
+    n_instances, n_words = sfa_words.shape
+
+    # with sections, the second half of the features counts the number of sections
+    # each word is present in
+    use_sections = sections > 1 and not use_relevant_words
+    section_offset = feature_count // 2 if use_sections else feature_count
+    max_index = np.max(X_index) + 1 if use_sections else 1
+    row_size = 2 * n_words if use_sections else n_words
+
+    row_nnz = np.zeros(n_instances, dtype=np.int64)
+    all_indices = np.empty((n_instances, row_size), dtype=np.int32)
+    all_data = np.empty((n_instances, row_size), dtype=np.uint32)
+    for j in range(n_instances):
+        ids = np.empty(n_words, dtype=np.int64)
+        n = 0
+        for i in range(n_words):
+            key = sfa_words[j, i]
+            # repeated words are encoded as 0 and removed
+            if remove_repeat_words and key == 0:
+                continue
+
+            if not use_relevant_words:
+                ids[n] = key
+                n += 1
+            else:
+                pos = np.searchsorted(relevant_words, key)
+                if pos < len(relevant_words) and relevant_words[pos] == key:
+                    ids[n] = relevant_word_ids[pos]
+                    n += 1
 
-    return all_win_words
+        nnz = _add_counts(np.sort(ids[:n]), all_indices[j], all_data[j], 0, 0, 1)
 
+        if use_sections:
+            for i in range(n_words):
+                ids[i] = np.int64(sfa_words[j, i]) * sections + int(
+                    X_index[i] / max_index * sections
+                )
+            nnz = _add_counts(
+                np.sort(ids),
+                all_indices[j],
+                all_data[j],
+                nnz,
+                section_offset,
+                sections,
+            )
 
-@njit(cache=True, fastmath=True)
-def create_bag_feature_selection(
-    X_index,
-    n_instances,
-    relevant_features_idx,
-    feature_names,
-    sfa_words,
-    remove_repeat_words,
-    sections,
-):
-    relevant_features = Dict.empty(key_type=types.uint32, value_type=types.uint32)
-    for k, v in zip(
-        feature_names[relevant_features_idx],
-        np.arange(len(relevant_features_idx), dtype=np.uint32),
-    ):
-        relevant_features[k] = v
+        row_nnz[j] = nnz
 
-    if remove_repeat_words:
-        if 0 in relevant_features:
-            del relevant_features[0]
-
-    needed_size = len(relevant_features_idx)
-    # if sections > 1:
-    #    needed_size = 2 * needed_size
-
-    all_win_words = np.zeros((n_instances, needed_size), dtype=np.int32)
-    for j in range(sfa_words.shape[0]):
-        for key in sfa_words[j]:
-            if key in relevant_features:
-                all_win_words[j, relevant_features[key]] += 1
-
-    # count number of sections the word is present
-    # if sections > 1:
-    #     section_count = np.zeros(
-    #         (sfa_words.shape[0], len(relevant_features_idx), sections),
-    #         dtype=np.uint32
-    #     )
-    #     max_index = max(X_index) + 1
-    #     for j in range(sfa_words.shape[0]):
-    #         for i, key in enumerate(sfa_words[j]):
-    #             if key in relevant_features:
-    #                 section_count[
-    #                     j,
-    #                     relevant_features[key],
-    #                     int(X_index[i] / max_index * sections),
-    #                 ] = 1
-    #
-    #     all_win_words[:, len(relevant_features_idx) :] = section_count.sum(axis=-1)
-
-    return all_win_words, relevant_features
+    indptr = np.zeros(n_instances + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(row_nnz)
+    indices = np.empty(indptr[-1], dtype=np.int32)
+    data = np.empty(indptr[-1], dtype=np.uint32)
+    for j in range(n_instances):
+        indices[indptr[j] : indptr[j + 1]] = all_indices[j, : row_nnz[j]]
+        data[indptr[j] : indptr[j + 1]] = all_data[j, : row_nnz[j]]
+
+    return indptr, indices, data
 
 
 @njit(cache=True, fastmath=True)
-def create_bag_transform(
-    X_index,
-    feature_count,
-    feature_selection,
-    relevant_features,
-    sfa_words,
-    remove_repeat_words,
-    sections,
-):
-    all_win_words = np.zeros((len(sfa_words), feature_count), np.int32)
-    for j in prange(sfa_words.shape[0]):
-        if len(relevant_features) == 0 and feature_selection == "none":
-            # this mask is used to encode the repeated words
-            if remove_repeat_words:
-                masked = np.nonzero(sfa_words[j])
-                all_win_words[j, :feature_count] = np.bincount(
-                    sfa_words[j][masked], minlength=feature_count
-                )
-            else:
-                all_win_words[j, :feature_count] = np.bincount(
-                    sfa_words[j], minlength=feature_count
-                )
+def _add_counts(ids, indices, data, nnz, offset, sections):
+    # ids are sorted. with sections > 1, ids are word * sections + section and each
+    # word is counted once per distinct section, otherwise every id is counted
+    last_id = -1
+    for i in range(len(ids)):
+        if sections > 1 and ids[i] == last_id:
+            continue
+        last_id = ids[i]
+
+        feature = offset + ids[i] // sections
+        if nnz > 0 and indices[nnz - 1] == feature:
+            data[nnz - 1] += 1
         else:
-            if remove_repeat_words:
-                if 0 in relevant_features:
-                    del relevant_features[0]
-
-            for _, key in enumerate(sfa_words[j]):
-                if key in relevant_features:
-                    o = relevant_features[key]
-                    all_win_words[j, o] += 1
-
-    # count number of sections the word is present
-    if sections > 1:
-        if len(relevant_features) == 0 and feature_selection == "none":
-            section_count = np.zeros(
-                (sfa_words.shape[0], feature_count // 2, sections), dtype=np.uint32
-            )
-            max_index = max(X_index) + 1
-            for j in range(sfa_words.shape[0]):
-                for i in range(sfa_words.shape[1]):
-                    section_count[
-                        j, sfa_words[j, i], int(X_index[i] / max_index * sections)
-                    ] = 1
-
-                    # all_win_words[j, feature_count // 2 + sfa_words[j, i]] = max(
-                    #    X_index[i],
-                    #    all_win_words[j, feature_count // 2 + sfa_words[j, i]],
-                    # )
-
-            all_win_words[:, feature_count // 2 :] = section_count.sum(axis=-1)
-        # else:
-        #     section_count = np.zeros(
-        #         (sfa_words.shape[0], feature_count // 2, sections), dtype=np.uint32
-        #     )
-        #     max_index = max(X_index) + 1
-        #     for j in range(sfa_words.shape[0]):
-        #         for i, key in enumerate(sfa_words[j]):
-        #             if key in relevant_features:
-        #                 section_count[
-        #                     j,
-        #                     relevant_features[key],
-        #                     int(X_index[i] / max_index * sections),
-        #                 ] = 1
-        #
-        #     all_win_words[:, feature_count // 2 :] = section_count.sum(axis=-1)
-
-    return all_win_words, all_win_words.shape[1]
+            indices[nnz] = feature
+            data[nnz] = 1
+            nnz += 1
+    return nnz
 
 
 @njit(fastmath=True, cache=True)
@@ -8,6 +8,7 @@ __author__ = ["MatthewMiddlehurst"]
 __all__ = ["Arsenal"]
 
 import time
+from functools import partial
 
 import numpy as np
 from aeon.base._base import _clone_estimator
@@ -26,6 +27,8 @@ from sklearn.pipeline import make_pipeline
 from sklearn.preprocessing import StandardScaler
 from sklearn.utils import check_random_state
 
+from tsml_eval.estimators._contract import fit_contracted
+
 
 class Arsenal(BaseRegressor):
     """Arsenal ensemble.
@@ -168,7 +171,6 @@ class Arsenal(BaseRegressor):
         self.n_instances_, self.n_dims_, self.series_length_ = X.shape
         time_limit = self.time_limit_in_minutes * 60
         start_time = time.time()
-        train_time = 0
 
         self._label_average = np.mean(y)
 
@@ -202,51 +204,20 @@ class Arsenal(BaseRegressor):
             raise ValueError(f"Invalid Rocket transformer: {self.rocket_transform}")
 
         if time_limit > 0:
-            self.n_estimators = 0
-            self.estimators_ = []
-            self.transformed_data_ = []
-
-            while (
-                train_time < time_limit
-                and self.n_estimators < self.contract_max_n_estimators
-            ):
-                fit = Parallel(n_jobs=self._threads_to_use)(
-                    delayed(self._fit_estimator)(
-                        _clone_estimator(
-                            base_rocket,
-                            None
-                            if self.random_state is None
-                            else (255 if self.random_state == 0 else self.random_state)
-                            * 37
-                            * (i + 1),
-                        ),
-                        X,
-                        y,
-                    )
-                    for i in range(self._threads_to_use)
-                )
-
-                estimators, transformed_data = zip(*fit)
-
-                self.estimators_ += estimators
-                self.transformed_data_ += transformed_data
+            fit = fit_contracted(
+                partial(self._fit_seeded_estimator, base_rocket, X, y),
+                time_limit,
+                start_time,
+                self.contract_max_n_estimators,
+                self._threads_to_use,
+            )
 
-                self.n_estimators += self._threads_to_use
-                train_time = time.time() - start_time
+            self.estimators_ = [f[0] for f in fit]
+            self.transformed_data_ = [f[1] for f in fit]
+            self.n_estimators = len(self.estimators_)
         else:
             fit = Parallel(n_jobs=self._threads_to_use)(
-                delayed(self._fit_estimator)(
-                    _clone_estimator(
-                        base_rocket,
-                        None
-                        if self.random_state is None
-                        else (255 if self.random_state == 0 else self.random_state)
-                        * 37
-                        * (i + 1),
-                    ),
-                    X,
-                    y,
-                )
+                delayed(self._fit_seeded_estimator)(base_rocket, X, y, i)
                 for i in range(self.n_estimators)
             )
 
@@ -327,6 +298,17 @@ class Arsenal(BaseRegressor):
 
         return results
 
+    def _fit_seeded_estimator(self, base_rocket, X, y, idx):
+        rocket = _clone_estimator(
+            base_rocket,
+            None
+            if self.random_state is None
+            else (255 if self.random_state == 0 else self.random_state)
+            * 37
+            * (idx + 1),
+        )
+        return self._fit_estimator(rocket, X, y)
+
     def _fit_estimator(self, rocket, X, y):
         transformed_x = rocket.fit_transform(X)
         scaler = StandardScaler(with_mean=False)
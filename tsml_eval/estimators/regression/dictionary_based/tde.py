@@ -11,18 +11,18 @@ __all__ = ["TemporalDictionaryEnsemble", "IndividualTDE", "histogram_intersectio
 import math
 import time
 import warnings
-from collections import defaultdict
 
 import numpy as np
 from aeon.regression.base import BaseRegressor
 from aeon.utils.validation.panel import check_X_y
 from joblib import Parallel, delayed
-from numba import njit, types
+from numba import config, get_num_threads, njit, prange, set_num_threads, types
 from numba.typed import Dict
 from sklearn import preprocessing
 from sklearn.kernel_ridge import KernelRidge
 from sklearn.utils import check_random_state
 
+from tsml_eval.estimators._bags import BagVocabulary, CSRBags
 from tsml_eval.estimators.regression.transformations.sfa import SFA
 
 
@@ -83,13 +83,17 @@ class TemporalDictionaryEnsemble(BaseRegressor):
         Max number of parameter combinations to consider when time_limit_in_minutes is
         set.
     typed_dict : bool, default=True
-        Use a numba typed Dict to store word counts. May increase memory usage, but will
-        be faster for larger datasets. As the Dict cannot be pickled currently, there
-        will be some overhead converting it to a python dict with multiple threads and
-        pickling.
+        Kept for compatibility, word counts are stored in CSR arrays which can be
+        pickled. If True, SFA words are still limited to 64 bits.
     save_train_predictions : bool, default=False
         Save the ensemble member train predictions in fit for use in _get_train_probs
         leave-one-out cross-validation.
+    batch_size : int or None, default=None
+        Number of ensemble members built in parallel between each refit of the
+        Gaussian process and each contract check. If None, the number of jobs is used.
+        The fitted ensemble depends on the batch size, so with the default the results
+        for a fixed random_state are only reproducible for a fixed n_jobs. Set a value
+        to make results independent of n_jobs, 1 matches a sequential build.
     n_jobs : int, default=1
         The number of jobs to run in parallel for both `fit` and `predict`.
         ``-1`` means using all processors.
@@ -170,6 +174,7 @@ class TemporalDictionaryEnsemble(BaseRegressor):
         contract_max_n_parameter_samples=np.inf,
         typed_dict=True,
         save_train_predictions=False,
+        batch_size=None,
         n_jobs=1,
         random_state=None,
     ):
@@ -188,6 +193,7 @@ class TemporalDictionaryEnsemble(BaseRegressor):
         self.contract_max_n_parameter_samples = contract_max_n_parameter_samples
         self.typed_dict = typed_dict
         self.save_train_predictions = save_train_predictions
+        self.batch_size = batch_size
         self.random_state = random_state
         self.n_jobs = n_jobs
 
@@ -283,6 +289,15 @@ class TemporalDictionaryEnsemble(BaseRegressor):
             n_parameter_samples = self.n_parameter_samples
             contract_max_n_parameter_samples = np.inf
 
+        if self.batch_size is None:
+            max_batch_size = self._threads_to_use
+        elif isinstance(self.batch_size, int) and self.batch_size > 0:
+            max_batch_size = self.batch_size
+        else:
+            raise ValueError(
+                f"batch_size must be a positive int or None, got {self.batch_size}."
+            )
+
         rng = check_random_state(self.random_state)
 
         if self.bigrams is None:
@@ -301,10 +316,18 @@ class TemporalDictionaryEnsemble(BaseRegressor):
             )
             or num_classifiers < n_parameter_samples
         ) and len(possible_parameters) > 0:
+            remaining = n_parameter_samples - num_classifiers
+            if train_time < time_limit:
+                remaining = max(
+                    remaining, contract_max_n_parameter_samples - num_classifiers
+                )
+            batch_size = min(max_batch_size, len(possible_parameters), remaining)
+
             if num_classifiers < self.randomly_selected_params:
-                parameters = possible_parameters.pop(
-                    rng.randint(0, len(possible_parameters))
+                batch_size = min(
+                    batch_size, self.randomly_selected_params - num_classifiers
                 )
+                preds = None
             else:
                 scaler = preprocessing.StandardScaler()
                 scaler.fit(self._prev_parameters_x)
@@ -313,55 +336,69 @@ class TemporalDictionaryEnsemble(BaseRegressor):
                     scaler.transform(self._prev_parameters_x), self._prev_parameters_y
                 )
                 preds = gp.predict(scaler.transform(possible_parameters))
-                parameters = possible_parameters.pop(
-                    rng.choice(np.flatnonzero(preds == preds.max()))
-                )
 
-            subsample = rng.choice(
-                self.n_instances_, size=subsample_size, replace=False
-            )
-            X_subsample = X[subsample]
-            y_subsample = y[subsample]
-
-            tde = IndividualTDE(
-                *parameters,
-                alphabet_size=self._alphabet_size,
-                bigrams=use_bigrams,
-                dim_threshold=self.dim_threshold,
-                max_dims=self.max_dims,
-                typed_dict=self.typed_dict,
-                n_jobs=self._threads_to_use,
-                random_state=self.random_state,
+            batch = []
+            for _ in range(batch_size):
+                if preds is None:
+                    parameters = possible_parameters.pop(
+                        rng.randint(0, len(possible_parameters))
+                    )
+                else:
+                    # take the next best predicted parameters from the same fit
+                    idx = rng.choice(np.flatnonzero(preds == preds.max()))
+                    parameters = possible_parameters.pop(idx)
+                    preds = np.delete(preds, idx)
+
+                subsample = rng.choice(
+                    self.n_instances_, size=subsample_size, replace=False
+                )
+                batch.append((parameters, subsample))
+
+            # members are independent once their parameters and subsample are
+            # drawn, so each batch is built over n_jobs processes. Batches of a
+            # single member match a sequential build.
+            tdes = Parallel(n_jobs=self._threads_to_use)(
+                delayed(_fit_ensemble_member)(
+                    IndividualTDE(
+                        *parameters,
+                        alphabet_size=self._alphabet_size,
+                        bigrams=use_bigrams,
+                        dim_threshold=self.dim_threshold,
+                        max_dims=self.max_dims,
+                        typed_dict=self.typed_dict,
+                        n_jobs=self._threads_to_use if batch_size == 1 else 1,
+                        random_state=self.random_state,
+                    ),
+                    X,
+                    y,
+                    subsample,
+                    self.save_train_predictions,
+                )
+                for parameters, subsample in batch
             )
-            tde.fit(X_subsample, y_subsample)
-            tde._subsample = subsample
 
-            tde._accuracy = self._individual_train_acc(
-                tde,
-                y_subsample,
-                subsample_size,
-            )
+            for (parameters, _), tde in zip(batch, tdes):
+                if tde._accuracy > 0:
+                    weight = math.pow(tde._accuracy, 4)
+                else:
+                    weight = 0.000000001
+
+                if num_classifiers < self.max_ensemble_size:
+                    if tde._accuracy < lowest_acc:
+                        lowest_acc = tde._accuracy
+                        lowest_acc_idx = num_classifiers
+                    self.weights_.append(weight)
+                    self.estimators_.append(tde)
+                elif tde._accuracy > lowest_acc:
+                    self.weights_[lowest_acc_idx] = weight
+                    self.estimators_[lowest_acc_idx] = tde
+                    lowest_acc, lowest_acc_idx = self._worst_ensemble_acc()
+
+                self._prev_parameters_x.append(parameters)
+                self._prev_parameters_y.append(tde._accuracy)
+
+                num_classifiers += 1
 
-            if tde._accuracy > 0:
-                weight = math.pow(tde._accuracy, 4)
-            else:
-                weight = 0.000000001
-
-            if num_classifiers < self.max_ensemble_size:
-                if tde._accuracy < lowest_acc:
-                    lowest_acc = tde._accuracy
-                    lowest_acc_idx = num_classifiers
-                self.weights_.append(weight)
-                self.estimators_.append(tde)
-            elif tde._accuracy > lowest_acc:
-                self.weights_[lowest_acc_idx] = weight
-                self.estimators_[lowest_acc_idx] = tde
-                lowest_acc, lowest_acc_idx = self._worst_ensemble_acc()
-
-            self._prev_parameters_x.append(parameters)
-            self._prev_parameters_y.append(tde._accuracy)
-
-            num_classifiers += 1
             train_time = time.time() - start_time
 
         self.n_estimators_ = len(self.estimators_)
@@ -447,12 +484,7 @@ class TemporalDictionaryEnsemble(BaseRegressor):
                 preds = (
                     clf._train_predictions
                     if self.save_train_predictions
-                    else Parallel(n_jobs=self._threads_to_use, prefer="threads")(
-                        delayed(clf._train_predict)(
-                            i,
-                        )
-                        for i in range(len(subsample))
-                    )
+                    else clf._train_predict_all()
                 )
 
                 for n, pred in enumerate(preds):
@@ -483,34 +515,6 @@ class TemporalDictionaryEnsemble(BaseRegressor):
 
         return results
 
-    def _individual_train_acc(self, tde, y, train_size):
-        sum_errors = 0
-
-        if self._threads_to_use > 1:
-            c = Parallel(n_jobs=self._threads_to_use, prefer="threads")(
-                delayed(tde._train_predict)(
-                    i,
-                )
-                for i in range(train_size)
-            )
-
-            for i in range(train_size):
-                sum_errors += np.abs(np.power(y[i] - c[i], 2))
-
-                if self.save_train_predictions:
-                    tde._train_predictions.append(c[i])
-
-        else:
-            for i in range(train_size):
-                c = tde._train_predict(i)
-
-                sum_errors += np.abs(np.power(y[i] - c, 2))
-
-                if self.save_train_predictions:
-                    tde._train_predictions.append(c)
-
-        return -(sum_errors / train_size)
-
     @classmethod
     def get_test_params(cls, parameter_set="default"):
         """Return testing parameter settings for the estimator.
@@ -587,8 +591,8 @@ class IndividualTDE(BaseRegressor):
         Maximum number of dimensions words are extracted from. Only applicable for
         multivariate data.
     typed_dict : bool, default=True
-        Use a numba TypedDict to store word counts. May increase memory usage, but will
-        be faster for larger datasets.
+        Kept for compatibility, word counts are stored in CSR arrays which can be
+        pickled. If True, SFA words are still limited to 64 bits.
     n_jobs : int, default=1
         The number of jobs to run in parallel for both `fit` and `predict`.
         ``-1`` means using all processors.
@@ -678,48 +682,16 @@ class IndividualTDE(BaseRegressor):
         self.series_length_ = 0
 
         self._transformers = []
-        self._transformed_data = []
+        self._vocabularies = []
+        self._train_bags = None
         self._class_vals = []
         self._dims = []
-        self._highest_dim_bit = 0
         self._accuracy = 0
         self._subsample = []
         self._train_predictions = []
 
         super(IndividualTDE, self).__init__()
 
-    # todo remove along with BOSS and SFA workarounds when Dict becomes serialisable.
-    def __getstate__(self):
-        """Return state as dictionary for pickling, required for typed Dict objects."""
-        state = self.__dict__.copy()
-        if self.typed_dict:
-            nl = [None] * len(self._transformed_data)
-            for i, ndict in enumerate(state["_transformed_data"]):
-                pdict = dict()
-                for key, val in ndict.items():
-                    pdict[key] = val
-                nl[i] = pdict
-            state["_transformed_data"] = nl
-        return state
-
-    def __setstate__(self, state):
-        """Set current state using input pickling, required for typed Dict objects."""
-        self.__dict__.update(state)
-        if self.typed_dict:
-            nl = [None] * len(self._transformed_data)
-            for i, pdict in enumerate(self._transformed_data):
-                ndict = (
-                    Dict.empty(
-                        key_type=types.UniTuple(types.int64, 2), value_type=types.uint32
-                    )
-                    if self.levels > 1 or self.n_dims_ > 1
-                    else Dict.empty(key_type=types.int64, value_type=types.uint32)
-                )
-                for key, val in pdict.items():
-                    ndict[key] = val
-                nl[i] = ndict
-            self._transformed_data = nl
-
     def _fit(self, X, y):
         """Fit a single base TDE classifier on n_instances cases (X,y).
 
@@ -746,38 +718,8 @@ class IndividualTDE(BaseRegressor):
         # select dimensions using accuracy estimate if multivariate
         if self.n_dims_ > 1:
             self._dims, self._transformers = self._select_dims(X, y)
-
-            words = (
-                [
-                    Dict.empty(
-                        key_type=types.UniTuple(types.int64, 2), value_type=types.uint32
-                    )
-                    for _ in range(self.n_instances_)
-                ]
-                if self.typed_dict
-                else [defaultdict(int) for _ in range(self.n_instances_)]
-            )
-
-            for i, dim in enumerate(self._dims):
-                X_dim = X[:, dim, :].reshape(self.n_instances_, 1, self.series_length_)
-                dim_words = self._transformers[i].transform(X_dim, y)
-                dim_words = dim_words[0]
-
-                for n in range(self.n_instances_):
-                    if self.typed_dict:
-                        for word, count in dim_words[n].items():
-                            if self.levels > 1:
-                                words[n][
-                                    (word[0], word[1] << self._highest_dim_bit | dim)
-                                ] = count
-                            else:
-                                words[n][(word, dim)] = count
-                    else:
-                        for word, count in dim_words[n].items():
-                            words[n][word << self._highest_dim_bit | dim] = count
-
-            self._transformed_data = words
         else:
+            self._dims = [0]
             self._transformers.append(
                 SFA(
                     word_length=self.word_length,
@@ -795,8 +737,11 @@ class IndividualTDE(BaseRegressor):
                     n_jobs=self._threads_to_use,
                 )
             )
-            sfa = self._transformers[0].fit_transform(X, y)
-            self._transformed_data = sfa[0]
+            self._transformers[0].fit(X, y)
+
+        # each dimension has its own vocabulary and range of word ids in the bags
+        self._vocabularies = [BagVocabulary() for _ in self._dims]
+        self._train_bags = self._transform_bags(X, extend_vocabulary=True)
 
     def _predict(self, X):
         """Predict class values of all instances in X.
@@ -811,69 +756,30 @@ class IndividualTDE(BaseRegressor):
         y : array-like, shape = [n_instances]
             Predicted class labels.
         """
-        num_cases = X.shape[0]
-
-        if self.n_dims_ > 1:
-            words = (
-                [
-                    Dict.empty(
-                        key_type=types.UniTuple(types.int64, 2), value_type=types.uint32
-                    )
-                    for _ in range(num_cases)
-                ]
-                if self.typed_dict
-                else [defaultdict(int) for _ in range(num_cases)]
-            )
-
-            for i, dim in enumerate(self._dims):
-                X_dim = X[:, dim, :].reshape(num_cases, 1, self.series_length_)
-                dim_words = self._transformers[i].transform(X_dim)
-                dim_words = dim_words[0]
-
-                for n in range(num_cases):
-                    if self.typed_dict:
-                        for word, count in dim_words[n].items():
-                            if self.levels > 1:
-                                words[n][
-                                    (word[0], word[1] << self._highest_dim_bit | dim)
-                                ] = count
-                            else:
-                                words[n][(word, dim)] = count
-                    else:
-                        for word, count in dim_words[n].items():
-                            words[n][word << self._highest_dim_bit | dim] = count
-
-            test_bags = words
-        else:
-            test_bags = self._transformers[0].transform(X)
-            test_bags = test_bags[0]
+        # words not in the train vocabulary cannot add to the intersection
+        test_bags = self._transform_bags(X)
 
-        classes = Parallel(n_jobs=self._threads_to_use, prefer="threads")(
-            delayed(self._test_nn)(
-                test_bag,
-            )
-            for test_bag in test_bags
-        )
-
-        return np.array(classes)
-
-    def _test_nn(self, test_bag):
+        # ties between neighbours are broken with the same random draws for every
+        # test case, in the order the ties are found
         rng = check_random_state(self.random_state)
+        tie_draws = rng.random_sample(self.n_instances_)
+
+        prev_threads = get_num_threads()
+        set_num_threads(min(self._threads_to_use, config.NUMBA_NUM_THREADS))
+        try:
+            nn = _histogram_intersection_nn(
+                *test_bags.arrays,
+                *self._train_bags.arrays,
+                self._train_bags.n_words,
+                tie_draws,
+                self._threads_to_use,
+            )
+        finally:
+            set_num_threads(prev_threads)
 
-        best_sim = -1
-        nn = None
-
-        for n, bag in enumerate(self._transformed_data):
-            sim = histogram_intersection(test_bag, bag)
-
-            if sim > best_sim or (sim == best_sim and rng.random() < 0.5):
-                best_sim = sim
-                nn = self._class_vals[n]
-
-        return nn
+        return np.asarray(self._class_vals)[nn]
 
     def _select_dims(self, X, y):
-        self._highest_dim_bit = (math.ceil(math.log2(self.n_dims_))) + 1
         accs = []
         transformers = []
 
@@ -902,18 +808,12 @@ class IndividualTDE(BaseRegressor):
             X_dim = X[:, i, :].reshape(self.n_instances_, 1, self.series_length_)
 
             transformers[i].fit(X_dim, y)
-            sfa = transformers[i].transform(
-                X_dim,
-                y,
-            )
+            bags = transformers[i].transform_csr(X_dim)
             transformers[i].keep_binning_dft = False
             transformers[i].binning_dft = None
 
-            sum_errors = 0
-            for i in range(self.n_instances_):
-                sum_errors += np.abs(np.power(y[i] - self._train_predict(i, sfa[0]), 2))
-
-            accs.append(-(sum_errors / self.n_instances_))
+            preds = self._train_predict_all(bags=bags)
+            accs.append(-np.mean(np.power(y - preds, 2)))
 
         max_acc = max(accs)
 
@@ -932,25 +832,56 @@ class IndividualTDE(BaseRegressor):
 
         return dims, fin_transformers
 
-    def _train_predict(self, train_num, bags=None):
-        if bags is None:
-            bags = self._transformed_data
+    def _transform_bags(self, X, extend_vocabulary=False):
+        bags = [
+            self._transformers[i].transform_csr(
+                X[:, dim, :].reshape(X.shape[0], 1, self.series_length_),
+                self._vocabularies[i],
+                extend_vocabulary=extend_vocabulary,
+            )
+            for i, dim in enumerate(self._dims)
+        ]
+        return bags[0] if len(bags) == 1 else CSRBags.hstack(bags, X.shape[0])
+
+    def _train_predict_all(self, bags=None):
+        """Find the leave-one-out nearest neighbour prediction for each train case.
+
+        Parameters
+        ----------
+        bags : CSRBags, default=None
+            Word count bags to use in place of the fitted train bags.
 
-        test_bag = bags[train_num]
-        best_sim = -1
-        nn = None
+        Returns
+        -------
+        preds : np.ndarray of shape (n_instances)
+            The target value of the nearest neighbour of each train case.
+        """
+        # the similarity matrix is not kept, it is n_instances squared in size and
+        # only needed once in fit and for train estimates
+        sim = self._similarity_matrix(self._train_bags if bags is None else bags)
+        np.fill_diagonal(sim, -1)
+        return np.asarray(self._class_vals)[np.argmax(sim, axis=1)]
+
+    def _similarity_matrix(self, bags):
+        prev_threads = get_num_threads()
+        set_num_threads(min(self._threads_to_use, config.NUMBA_NUM_THREADS))
+        try:
+            sim = _histogram_intersection_matrix(*bags.arrays, self._threads_to_use)
+        finally:
+            set_num_threads(prev_threads)
+        return sim
 
-        for n, bag in enumerate(bags):
-            if n == train_num:
-                continue
 
-            sim = histogram_intersection(test_bag, bag)
+def _fit_ensemble_member(tde, X, y, subsample, save_train_predictions):
+    tde.fit(X[subsample], y[subsample])
+    tde._subsample = subsample
 
-            if sim > best_sim:
-                best_sim = sim
-                nn = self._class_vals[n]
+    c = tde._train_predict_all()
+    if save_train_predictions:
+        tde._train_predictions = list(c)
 
-        return nn
+    tde._accuracy = -np.mean(np.power(y[subsample] - c, 2))
+    return tde
 
 
 def histogram_intersection(first, second):
@@ -995,3 +926,77 @@ def _histogram_intersection_dict(first, second):
         val_b = second.get(word, types.uint32(0))
         sim += min(val_a, val_b)
     return sim
+
+
+@njit(fastmath=True, cache=True, parallel=True)
+def _histogram_intersection_nn(
+    test_indptr,
+    test_indices,
+    test_data,
+    train_indptr,
+    train_indices,
+    train_data,
+    n_words,
+    tie_draws,
+    n_threads,
+):
+    n_test = len(test_indptr) - 1
+    n_train = len(train_indptr) - 1
+    nn = np.zeros(n_test, dtype=np.int64)
+
+    n_chunks = min(n_test, 4 * n_threads)
+    for c in prange(n_chunks):
+        # dense buffer of the current test case, reset after each case
+        dense = np.zeros(n_words, dtype=np.uint32)
+
+        for i in range(c * n_test // n_chunks, (c + 1) * n_test // n_chunks):
+            for k in range(test_indptr[i], test_indptr[i + 1]):
+                dense[test_indices[k]] = test_data[k]
+
+            best_sim = -1
+            n_ties = 0
+            for j in range(n_train):
+                sim = 0
+                for k in range(train_indptr[j], train_indptr[j + 1]):
+                    sim += min(dense[train_indices[k]], train_data[k])
+
+                if sim > best_sim:
+                    best_sim = sim
+                    nn[i] = j
+                elif sim == best_sim:
+                    if tie_draws[n_ties] < 0.5:
+                        nn[i] = j
+                    n_ties += 1
+
+            for k in range(test_indptr[i], test_indptr[i + 1]):
+                dense[test_indices[k]] = 0
+
+    return nn
+
+
+@njit(fastmath=True, cache=True, parallel=True)
+def _histogram_intersection_matrix(indptr, indices, data, n_threads):
+    n_cases = len(indptr) - 1
+    n_words = 0 if len(indices) == 0 else indices.max() + 1
+    sim = np.zeros((n_cases, n_cases), dtype=np.int32)
+
+    # rows are interleaved over chunks to balance the upper triangle workload
+    n_chunks = min(n_cases, 4 * n_threads)
+    for c in prange(n_chunks):
+        dense = np.zeros(n_words, dtype=np.uint32)
+
+        for i in range(c, n_cases, n_chunks):
+            for k in range(indptr[i], indptr[i + 1]):
+                dense[indices[k]] = data[k]
+
+            for j in range(i, n_cases):
+                total = 0
+                for k in range(indptr[j], indptr[j + 1]):
+                    total += min(dense[indices[k]], data[k])
+                sim[i, j] = total
+                sim[j, i] = total
+
+            for k in range(indptr[i], indptr[i + 1]):
+                dense[indices[k]] = 0
+
+    return sim
@@ -10,18 +10,23 @@ __all__ = ["DrCIF"]
 
 import math
 import time
+from functools import partial
 
 import numpy as np
 from aeon.base._base import _clone_estimator
-from aeon.classification.sklearn._continuous_interval_tree import _drcif_feature
 from aeon.regression.base import BaseRegressor
-from aeon.transformations.panel.catch22 import Catch22
 from aeon.utils.validation.panel import check_X_y
 from joblib import Parallel, delayed
 from sklearn.base import BaseEstimator
 from sklearn.tree import DecisionTreeRegressor
 from sklearn.utils import check_random_state
 
+from tsml_eval.estimators._contract import fit_contracted
+from tsml_eval.estimators._interval_features import (
+    IntervalFeatureCache,
+    interval_features,
+)
+
 
 class DrCIF(BaseRegressor):
     """Diverse Representation Canonical Interval Forest Classifier (DrCIF).
@@ -71,10 +76,25 @@ class DrCIF(BaseRegressor):
     contract_max_n_estimators : int, default=500
         Max number of estimators when time_limit_in_minutes is set.
     save_transformed_data : bool, default=False
-        Save the data transformed in fit for use in _get_train_probs.
+        Save the data transformed in fit for use in _get_train_preds. If False,
+        _get_train_preds recomputes the transformed data of each tree from its
+        intervals instead, using less memory but more time.
+    use_float32 : bool, default=False
+        Store the periodogram and differences representations as float32, halving
+        their memory. Features extracted from them may differ slightly from float64.
+    feature_cache_mb : float, default=256
+        Memory limit in megabytes for interval features shared between trees in fit
+        and predict, intervals drawn by multiple trees are only transformed once. 0
+        disables the cache.
     n_jobs : int, default=1
         The number of jobs to run in parallel for both `fit` and `predict`.
         ``-1`` means using all processors.
+    parallel_backend : str, ParallelBackendBase instance or None, default=None
+        Specify the parallelisation backend implementation in joblib, if None a 'prefer'
+        value of "threads" is used by default. The feature cache is only shared
+        between trees built in the same process.
+        Valid options are "loky", "multiprocessing", "threading" or a custom backend.
+        See the joblib Parallel documentation for more details.
     random_state : int or None, default=None
         Seed for random number generation.
 
@@ -152,7 +172,10 @@ class DrCIF(BaseRegressor):
         time_limit_in_minutes=0.0,
         contract_max_n_estimators=500,
         save_transformed_data=False,
+        use_float32=False,
+        feature_cache_mb=256,
         n_jobs=1,
+        parallel_backend=None,
         random_state=None,
     ):
         self.n_estimators = n_estimators
@@ -165,9 +188,12 @@ class DrCIF(BaseRegressor):
         self.time_limit_in_minutes = time_limit_in_minutes
         self.contract_max_n_estimators = contract_max_n_estimators
         self.save_transformed_data = save_transformed_data
+        self.use_float32 = use_float32
+        self.feature_cache_mb = feature_cache_mb
 
         self.random_state = random_state
         self.n_jobs = n_jobs
+        self.parallel_backend = parallel_backend
 
         # The following set in method fit
         self.n_instances_ = 0
@@ -197,7 +223,6 @@ class DrCIF(BaseRegressor):
 
         time_limit = self.time_limit_in_minutes * 60
         start_time = time.time()
-        train_time = 0
 
         if isinstance(self.base_estimator, str):
             if self.base_estimator.lower() == "dtr":
@@ -207,20 +232,7 @@ class DrCIF(BaseRegressor):
         else:
             raise ValueError("DrCIF invalid base estimator given.")
 
-        X_p = np.zeros(
-            (
-                self.n_instances_,
-                self.n_dims_,
-                int(
-                    math.pow(2, math.ceil(math.log(self.series_length_, 2)))
-                    - self.series_length_
-                ),
-            )
-        )
-        X_p = np.concatenate((X, X_p), axis=2)
-        X_p = np.abs(np.fft.fft(X_p)[:, :, : int(X_p.shape[2] / 2)])
-
-        X_d = np.diff(X, 1)
+        X_p, X_d = self._representations(X)
 
         if self.n_intervals is None:
             self._n_intervals = [None, None, None]
@@ -285,53 +297,41 @@ class DrCIF(BaseRegressor):
 
         self.total_intervals_ = sum(self._n_intervals)
 
-        if time_limit > 0:
-            self._n_estimators = 0
-            self.estimators_ = []
-            self.intervals_ = []
-            self.atts_ = []
-            self.dims_ = []
-            self.transformed_data_ = []
-
-            while (
-                train_time < time_limit
-                and self._n_estimators < self.contract_max_n_estimators
-            ):
-                fit = Parallel(n_jobs=self._threads_to_use)(
-                    delayed(self._fit_estimator)(
-                        X,
-                        X_p,
-                        X_d,
-                        y,
-                        i,
-                    )
-                    for i in range(self._threads_to_use)
-                )
-
-                (
-                    estimators,
-                    intervals,
-                    dims,
-                    atts,
-                    transformed_data,
-                ) = zip(*fit)
+        # trees drawing the same intervals share their features
+        feature_cache = self._feature_cache()
 
-                self.estimators_ += estimators
-                self.intervals_ += intervals
-                self.atts_ += atts
-                self.dims_ += dims
-                self.transformed_data_ += transformed_data
+        if time_limit > 0:
+            fit = fit_contracted(
+                partial(
+                    self._fit_estimator, X, X_p, X_d, y, feature_cache=feature_cache
+                ),
+                time_limit,
+                start_time,
+                self.contract_max_n_estimators,
+                self._threads_to_use,
+                backend=self.parallel_backend,
+                prefer="threads",
+            )
 
-                self._n_estimators += self._threads_to_use
-                train_time = time.time() - start_time
+            self._n_estimators = len(fit)
+            self.estimators_ = [f[0] for f in fit]
+            self.intervals_ = [f[1] for f in fit]
+            self.dims_ = [f[2] for f in fit]
+            self.atts_ = [f[3] for f in fit]
+            self.transformed_data_ = [f[4] for f in fit]
         else:
-            fit = Parallel(n_jobs=self._threads_to_use)(
+            fit = Parallel(
+                n_jobs=self._threads_to_use,
+                backend=self.parallel_backend,
+                prefer="threads",
+            )(
                 delayed(self._fit_estimator)(
                     X,
                     X_p,
                     X_d,
                     y,
                     i,
+                    feature_cache,
                 )
                 for i in range(self._n_estimators)
             )
@@ -347,29 +347,22 @@ class DrCIF(BaseRegressor):
         return self
 
     def _predict(self, X) -> np.ndarray:
-        n_test_instances, _, series_length = X.shape
+        _, _, series_length = X.shape
         if series_length != self.series_length_:
             raise ValueError(
                 "ERROR number of attributes in the train does not match "
                 "that in the test data"
             )
 
-        X_p = np.zeros(
-            (
-                n_test_instances,
-                self.n_dims_,
-                int(
-                    math.pow(2, math.ceil(math.log(self.series_length_, 2)))
-                    - self.series_length_
-                ),
-            )
-        )
-        X_p = np.concatenate((X, X_p), axis=2)
-        X_p = np.abs(np.fft.fft(X_p)[:, :, : int(X_p.shape[2] / 2)])
+        X_p, X_d = self._representations(X)
 
-        X_d = np.diff(X, 1)
+        feature_cache = self._feature_cache()
 
-        y_preds = Parallel(n_jobs=self._threads_to_use)(
+        y_preds = Parallel(
+            n_jobs=self._threads_to_use,
+            backend=self.parallel_backend,
+            prefer="threads",
+        )(
             delayed(self._predict_for_estimator)(
                 X,
                 X_p,
@@ -378,6 +371,7 @@ class DrCIF(BaseRegressor):
                 self.intervals_[i],
                 self.dims_[i],
                 self.atts_[i],
+                feature_cache,
             )
             for i in range(self._n_estimators)
         )
@@ -403,13 +397,25 @@ class DrCIF(BaseRegressor):
                 "probabilities."
             )
 
-        if not self.save_transformed_data:
-            raise ValueError("Currently only works with saved transform data from fit.")
-
-        p = Parallel(n_jobs=self._threads_to_use)(
+        if self.save_transformed_data:
+            X_p = X_d = feature_cache = None
+        else:
+            # recompute the transformed data of each tree from its intervals
+            X_p, X_d = self._representations(X)
+            feature_cache = self._feature_cache()
+
+        p = Parallel(
+            n_jobs=self._threads_to_use,
+            backend=self.parallel_backend,
+            prefer="threads",
+        )(
             delayed(self._train_preds_for_estimator)(
+                X,
+                X_p,
+                X_d,
                 y,
                 i,
+                feature_cache,
             )
             for i in range(self._n_estimators)
         )
@@ -428,8 +434,7 @@ class DrCIF(BaseRegressor):
 
         return results
 
-    def _fit_estimator(self, X, X_p, X_d, y, idx):
-        c22 = Catch22(outlier_norm=True)
+    def _fit_estimator(self, X, X_p, X_d, y, idx, feature_cache=None):
         T = [X, X_p, X_d]
         rs = 255 if self.random_state == 0 else self.random_state
         rs = (
@@ -439,22 +444,15 @@ class DrCIF(BaseRegressor):
         )
         rng = check_random_state(rs)
 
-        transformed_x = np.empty(
-            shape=(self._att_subsample_size * self.total_intervals_, self.n_instances_),
-            dtype=np.float32,
-        )
-
         atts = rng.choice(29, self._att_subsample_size, replace=False)
         dims = rng.choice(self.n_dims_, self.total_intervals_, replace=True)
         intervals = np.zeros((self.total_intervals_, 2), dtype=int)
 
-        p = 0
         j = 0
         for r in range(0, len(T)):
             transform_length = T[r].shape[2]
 
             # Find the random intervals for classifier i, transformation r
-            # and concatenate features
             for _ in range(0, self._n_intervals[r]):
                 if rng.random() < 0.5:
                     intervals[j][0] = rng.randint(
@@ -485,24 +483,13 @@ class DrCIF(BaseRegressor):
                     )
                     intervals[j][0] = intervals[j][1] - length
 
-                for a in range(0, self._att_subsample_size):
-                    transformed_x[p] = _drcif_feature(
-                        T[r],
-                        intervals[j],
-                        dims[j],
-                        atts[a],
-                        c22,
-                        case_id=j
-                        # T[r].copy(), intervals[j], dims[j], atts[a], c22, case_id=j
-                    )
-                    p += 1
-
                 j += 1
 
+        # concatenate the features of all intervals
+        transformed_x = self._interval_features(T, intervals, dims, atts, feature_cache)
+
         tree = _clone_estimator(self._base_estimator, random_state=rs)
-        transformed_x = transformed_x.T
-        transformed_x = transformed_x.round(8)
-        transformed_x = np.nan_to_num(transformed_x, False, 0, 0, 0)
+        transformed_x = _clean_transformed_data(transformed_x)
 
         tree.fit(transformed_x, y)
 
@@ -514,33 +501,60 @@ class DrCIF(BaseRegressor):
             transformed_x if self.save_transformed_data else None,
         ]
 
-    def _predict_for_estimator(self, X, X_p, X_d, classifier, intervals, dims, atts):
-        c22 = Catch22(outlier_norm=True)
+    def _predict_for_estimator(
+        self, X, X_p, X_d, classifier, intervals, dims, atts, feature_cache=None
+    ):
         T = [X, X_p, X_d]
 
-        transformed_x = np.empty(
-            shape=(self._att_subsample_size * self.total_intervals_, X.shape[0]),
-            dtype=np.float32,
-        )
+        transformed_x = self._interval_features(T, intervals, dims, atts, feature_cache)
+        transformed_x = _clean_transformed_data(transformed_x)
 
-        p = 0
+        return classifier.predict(transformed_x)
+
+    def _interval_features(self, T, intervals, dims, atts, feature_cache):
+        transformed_x = []
         j = 0
         for r in range(0, len(T)):
-            for _ in range(0, self._n_intervals[r]):
-                for a in range(0, self._att_subsample_size):
-                    transformed_x[p] = _drcif_feature(
-                        T[r], intervals[j], dims[j], atts[a], c22, case_id=j
-                    )
-                    p += 1
-                j += 1
+            n = self._n_intervals[r]
+            transformed_x.append(
+                interval_features(
+                    T[r],
+                    intervals[j : j + n],
+                    dims[j : j + n],
+                    atts,
+                    cache=feature_cache,
+                    cache_key=(r,),
+                )
+            )
+            j += n
 
-        transformed_x = transformed_x.T
-        transformed_x.round(8)
-        np.nan_to_num(transformed_x, False, 0, 0, 0)
+        return np.hstack(transformed_x)
 
-        return classifier.predict(transformed_x)
+    def _representations(self, X):
+        dtype = np.float32 if self.use_float32 else np.float64
+        n_instances, n_dims, series_length = X.shape
+
+        # periodogram of the series zero padded to a power of 2 length, found in
+        # chunks of instances to limit the size of the complex fft output
+        fft_length = int(math.pow(2, math.ceil(math.log(series_length, 2))))
+        X_p = np.empty((n_instances, n_dims, int(fft_length / 2)), dtype=dtype)
+        chunk_size = max(1, int(2**24 / (16 * n_dims * fft_length)))
+        for i in range(0, n_instances, chunk_size):
+            X_p[i : i + chunk_size] = np.abs(
+                np.fft.fft(X[i : i + chunk_size], n=fft_length)[:, :, : X_p.shape[2]]
+            )
+
+        X_d = np.empty((n_instances, n_dims, series_length - 1), dtype=dtype)
+        np.subtract(X[:, :, 1:], X[:, :, :-1], out=X_d)
+
+        return X_p, X_d
+
+    def _feature_cache(self):
+        if self.feature_cache_mb <= 0:
+            return None
+        return IntervalFeatureCache(self.feature_cache_mb)
 
-    def _train_preds_for_estimator(self, y, idx):
+    def _train_preds_for_estimator(self, X, X_p, X_d, y, idx, feature_cache=None):
         rs = 255 if self.random_state == 0 else self.random_state
         rs = (
             None
@@ -557,9 +571,22 @@ class DrCIF(BaseRegressor):
         if len(oob) == 0:
             return [results, oob]
 
+        if self.save_transformed_data:
+            transformed_x = self.transformed_data_[idx]
+        else:
+            transformed_x = _clean_transformed_data(
+                self._interval_features(
+                    [X, X_p, X_d],
+                    self.intervals_[idx],
+                    self.dims_[idx],
+                    self.atts_[idx],
+                    feature_cache,
+                )
+            )
+
         clf = _clone_estimator(self._base_estimator, rs)
-        clf.fit(self.transformed_data_[idx][subsample], y[subsample])
-        preds = clf.predict(self.transformed_data_[idx][oob])
+        clf.fit(transformed_x[subsample], y[subsample])
+        preds = clf.predict(transformed_x[oob])
 
         for n, pred in enumerate(preds):
             results[oob[n]] = pred
@@ -597,3 +624,8 @@ class DrCIF(BaseRegressor):
                 "att_subsample_size": 2,
                 "save_transformed_data": True,
             }
+
+
+def _clean_transformed_data(transformed_x):
+    transformed_x = transformed_x.round(8)
+    return np.nan_to_num(transformed_x, False, 0, 0, 0)
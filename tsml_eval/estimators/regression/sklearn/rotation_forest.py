@@ -9,6 +9,7 @@ __author__ = ["MatthewMiddlehurst"]
 __all__ = ["RotationForest"]
 
 import time
+from functools import partial
 
 import numpy as np
 import pandas as pd
@@ -21,6 +22,8 @@ from sklearn.decomposition import PCA
 from sklearn.tree import DecisionTreeRegressor
 from sklearn.utils import check_random_state
 
+from tsml_eval.estimators._contract import fit_contracted
+
 
 class RotationForest(RegressorMixin, BaseEstimator):
     """A rotation forest (RotF) vector classifier.
@@ -166,7 +169,6 @@ class RotationForest(RegressorMixin, BaseEstimator):
 
         time_limit = self.time_limit_in_minutes * 60
         start_time = time.time()
-        train_time = 0
 
         if self.base_estimator is None:
             self._base_estimator = DecisionTreeRegressor(criterion="squared_error")
@@ -183,34 +185,19 @@ class RotationForest(RegressorMixin, BaseEstimator):
         X = (X - self._min) / self._ptp
 
         if time_limit > 0:
-            self._n_estimators = 0
-            self.estimators_ = []
-            self._pcas = []
-            self._groups = []
-            self.transformed_data_ = []
-
-            while (
-                train_time < time_limit
-                and self._n_estimators < self.contract_max_n_estimators
-            ):
-                fit = Parallel(n_jobs=self._n_jobs)(
-                    delayed(self._fit_estimator)(
-                        X,
-                        y,
-                        i,
-                    )
-                    for i in range(self._n_jobs)
-                )
-
-                estimators, pcas, groups, transformed_data = zip(*fit)
-
-                self.estimators_ += estimators
-                self._pcas += pcas
-                self._groups += groups
-                self.transformed_data_ += transformed_data
+            fit = fit_contracted(
+                partial(self._fit_estimator, X, y),
+                time_limit,
+                start_time,
+                self.contract_max_n_estimators,
+                self._n_jobs,
+            )
 
-                self._n_estimators += self._n_jobs
-                train_time = time.time() - start_time
+            self._n_estimators = len(fit)
+            self.estimators_ = [f[0] for f in fit]
+            self._pcas = [f[1] for f in fit]
+            self._groups = [f[2] for f in fit]
+            self.transformed_data_ = [f[3] for f in fit]
         else:
             self._n_estimators = self.n_estimators
 
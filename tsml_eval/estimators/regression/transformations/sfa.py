@@ -14,14 +14,25 @@ import warnings
 import numpy as np
 import pandas as pd
 from aeon.transformations.base import BaseTransformer
+from aeon.utils.validation import check_n_jobs
 from aeon.utils.validation.panel import check_X
-from joblib import Parallel, delayed
-from numba import NumbaTypeSafetyWarning, njit, types
+from numba import (
+    NumbaTypeSafetyWarning,
+    config,
+    get_num_threads,
+    njit,
+    prange,
+    set_num_threads,
+    types,
+)
 from numba.typed import Dict
 from sklearn.feature_selection import f_classif
 from sklearn.preprocessing import KBinsDiscretizer
 from sklearn.tree import DecisionTreeRegressor
 
+from tsml_eval.estimators._bags import BagVocabulary, CSRBags
+from tsml_eval.estimators._fourier import sliding_mft
+
 warnings.simplefilter("ignore", category=NumbaTypeSafetyWarning)
 
 # The binning methods to use: equi-depth, equi-width, information gain or kmeans
@@ -79,7 +90,8 @@ class SFA(BaseTransformer):
         Number of spatial pyramid levels
 
     save_words:          boolean, default = False
-        whether to save the words generated for each series (default False)
+        whether to save the words generated for each series (default False).
+        Words or bag keys longer than 64 bits are saved as arrays of uint64 limbs.
 
     return_pandas_data_series:          boolean, default = False
         set to true to return Pandas Series as a result of transform.
@@ -270,135 +282,158 @@ class SFA(BaseTransformer):
         """
         X = X.squeeze(1)
 
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", category=NumbaTypeSafetyWarning)
-            transform = Parallel(n_jobs=self.n_jobs, prefer="threads")(
-                delayed(self._transform_case)(
-                    X[i, :],
-                    supplied_dft=self.binning_dft[i] if self.keep_binning_dft else None,
-                )
-                for i in range(X.shape[0])
-            )
-
-        dim, words = zip(*transform)
-        if self.save_words:
-            self.words = list(words)
-
-        # cant pickle typed dict
-        if self.typed_dict and self.n_jobs != 1:
-            nl = [None] * len(dim)
-            for i, pdict in enumerate(dim):
-                ndict = (
-                    Dict.empty(
-                        key_type=types.UniTuple(types.int64, 2), value_type=types.uint32
-                    )
-                    if self.levels > 1
-                    else Dict.empty(key_type=types.int64, value_type=types.uint32)
-                )
-                for key, val in pdict.items():
-                    ndict[key] = val
-                nl[i] = pdict
-            dim = nl
+        words = self._transform_words(X)
+        dim = self._bags_from_csr(*self._count_words(words))
 
         bags = pd.DataFrame() if self.return_pandas_data_series else [None]
         bags[0] = list(dim)
 
         return bags
 
-    def _transform_case(self, X, supplied_dft=None):
-        if supplied_dft is None:
-            dfts = self._mft(X)
-        else:
-            dfts = supplied_dft
+    def transform_csr(self, X, vocabulary=None, extend_vocabulary=False):
+        """Transform data into bags of SFA words stored in CSR format.
 
-        if self.typed_dict:
-            bag = (
-                Dict.empty(
-                    key_type=types.UniTuple(types.int64, 2), value_type=types.uint32
-                )
-                if self.levels > 1
-                else Dict.empty(key_type=types.int64, value_type=types.uint32)
-            )
-        else:
-            bag = {}
+        Parameters
+        ----------
+        X : 3d numpy array, input time series.
+        vocabulary : BagVocabulary, default=None
+            Maps bag keys to word ids. Must only be shared between bags from the
+            same fitted transformer. If None, a new vocabulary is used.
+        extend_vocabulary : bool, default=False
+            Whether to add unseen words to the vocabulary. If False, unseen words
+            are dropped. Always True if vocabulary is None.
 
-        last_word = -1
-        repeat_words = 0
-        words = (
-            np.zeros(dfts.shape[0], dtype=np.int64)
-            if self.word_bits <= 64
-            else [0 for _ in range(dfts.shape[0])]
-        )
+        Returns
+        -------
+        CSRBags containing the word counts of each series
+        """
+        self.check_is_fitted()
+        X = check_X(X, enforce_univariate=True, coerce_to_numpy=True)
+        X = X.squeeze(1)
 
-        for window in range(dfts.shape[0]):
-            word_raw = (
-                SFA._create_word(
-                    dfts[window],
+        if vocabulary is None:
+            vocabulary = BagVocabulary()
+            extend_vocabulary = True
+
+        indptr, words, quadrants, counts = self._count_words(self._transform_words(X))
+        if words.ndim == 1:
+            # quadrants are only kept separate from the word for typed dict keys
+            tuple_keys = self.typed_dict and self.levels > 1
+            keys = np.column_stack((words, quadrants)) if tuple_keys else words[:, None]
+        else:
+            keys = words
+
+        return CSRBags.from_keys(indptr, keys, counts, vocabulary, extend_vocabulary)
+
+    def _transform_words(self, X):
+        n_jobs = check_n_jobs(self.n_jobs)
+        prev_threads = get_num_threads()
+        set_num_threads(min(n_jobs, config.NUMBA_NUM_THREADS))
+        try:
+            dfts = self.binning_dft if self.keep_binning_dft else self._mft(X)
+
+            # words are int64 unless a word or bag key does not fit in 64 bits, then
+            # they are stored as fixed width arrays of uint64 limbs
+            n_limbs = self._n_word_limbs()
+            if n_limbs == 0:
+                words = _create_words(
+                    dfts,
                     self.word_length,
                     self.alphabet_size,
                     self.breakpoints,
                     self.letter_bits,
                 )
-                if self.word_bits <= 64
-                else self._create_word_large(
-                    dfts[window],
+            else:
+                words = _create_large_words(
+                    dfts,
+                    self.word_length,
+                    self.alphabet_size,
+                    self.breakpoints,
+                    self.letter_bits,
+                    n_limbs,
                 )
-            )
-            words[window] = word_raw
+        finally:
+            set_num_threads(prev_threads)
 
-            repeat_word = (
-                self._add_to_pyramid(
-                    bag, word_raw, last_word, window - int(repeat_words / 2)
-                )
-                if self.levels > 1
-                else self._add_to_bag(bag, word_raw, last_word)
-            )
+        if self.save_words:
+            self.words = list(words)
 
-            if repeat_word:
-                repeat_words += 1
+        return words
+
+    def _n_word_limbs(self):
+        # 0 if words and bag keys fit in an int64, otherwise the number of uint64
+        # limbs needed for the largest bag key
+        if self.max_bits <= 64 and (
+            self.levels == 1 or self.typed_dict or self.max_bits + self.level_bits < 64
+        ):
+            return 0
+        key_bits = self.max_bits + (self.level_bits if self.levels > 1 else 0)
+        return math.ceil(key_bits / 64)
+
+    def _count_words(self, words):
+        prev_threads = get_num_threads()
+        set_num_threads(min(check_n_jobs(self.n_jobs), config.NUMBA_NUM_THREADS))
+        try:
+            if words.ndim == 2:
+                bags = _create_bags_in_chunks(
+                    _create_bags,
+                    words,
+                    self.window_size,
+                    self.series_length,
+                    self.word_bits,
+                    self.level_bits,
+                    self.levels,
+                    self.remove_repeat_words,
+                    self.bigrams,
+                    self.skip_grams,
+                    self.typed_dict,
+                )
             else:
-                last_word = word_raw
-                repeat_words = 0
-
-            if self.bigrams:
-                if window - self.window_size >= 0:
-                    bigram = self._create_bigram_words(
-                        word_raw, words[window - self.window_size]
-                    )
-
-                    if self.levels > 1:
-                        if self.typed_dict:
-                            bigram = (bigram, -1)
-                        else:
-                            bigram = (bigram << self.level_bits) | 0
-                    bag[bigram] = bag.get(bigram, 0) + 1
+                bags = _create_bags_in_chunks(
+                    _create_large_bags,
+                    words,
+                    self.window_size,
+                    self.series_length,
+                    self.word_bits,
+                    self.level_bits,
+                    self.levels,
+                    self.remove_repeat_words,
+                    self.bigrams,
+                    self.skip_grams,
+                )
+        finally:
+            set_num_threads(prev_threads)
 
-            if self.skip_grams:
-                # creates skip-grams, skipping every (s-1)-th word in-between
-                for s in range(2, 4):
-                    if window - s * self.window_size >= 0:
-                        skip_gram = self._create_bigram_words(
-                            word_raw, words[window - s * self.window_size]
-                        )
+        return bags
 
-                        if self.levels > 1:
-                            if self.typed_dict:
-                                skip_gram = (skip_gram, -1)
-                            else:
-                                skip_gram = (skip_gram << self.level_bits) | 0
-                        bag[skip_gram] = bag.get(skip_gram, 0) + 1
+    def _bags_from_csr(self, indptr, words, quadrants, counts):
+        tuple_keys = self.typed_dict and self.levels > 1
+        bags = [None] * (len(indptr) - 1)
+
+        for i in range(len(bags)):
+            start, end = indptr[i], indptr[i + 1]
+            # cant pickle typed dict
+            if self.typed_dict and self.n_jobs == 1:
+                bags[i] = (
+                    _typed_pyramid_bag(
+                        words[start:end], quadrants[start:end], counts[start:end]
+                    )
+                    if tuple_keys
+                    else _typed_bag(words[start:end], counts[start:end])
+                )
+            else:
+                if words.ndim == 2:
+                    keys = _limbs_to_ints(words[start:end])
+                elif tuple_keys:
+                    keys = zip(words[start:end].tolist(), quadrants[start:end].tolist())
+                else:
+                    keys = words[start:end].tolist()
+                bags[i] = dict(zip(keys, counts[start:end].tolist()))
 
-        # cant pickle typed dict
-        if self.typed_dict and self.n_jobs != 1:
-            pdict = dict()
-            for key, val in bag.items():
-                pdict[key] = val
-            bag = pdict
+            if self.return_pandas_data_series:
+                bags[i] = pd.Series(bags[i])
 
-        return [
-            pd.Series(bag) if self.return_pandas_data_series else bag,
-            words if self.save_words else [],
-        ]
+        return bags
 
     def _binning(self, X, y=None):
         num_windows_per_inst = math.ceil(self.series_length / self.window_size)
@@ -626,82 +661,47 @@ class SFA(BaseTransformer):
 
         return dft
 
-    def _mft(self, series):
+    def _mft(self, X):
         start_offset = 2 if self.norm else 0
         length = self.dft_length + start_offset + self.dft_length % 2
-        end = max(1, len(series) - self.window_size + 1)
-
-        phis = SFA._get_phis(self.window_size, length)
-        stds = SFA._calc_incremental_mean_std(series, end, self.window_size)
-        transformed = np.zeros((end, length))
 
         # first run with dft
-        if self._use_fallback_dft:
-            mft_data = self._discrete_fourier_transform(
-                series[0 : self.window_size],
-                self.dft_length,
-                self.norm,
-                self.inverse_sqrt_win_size,
-                self.lower_bounding,
-                apply_normalising_factor=False,
-                cut_start_if_norm=False,
+        first_dft = (
+            np.array(
+                [
+                    self._discrete_fourier_transform(
+                        X[i, 0 : self.window_size],
+                        self.dft_length,
+                        self.norm,
+                        self.inverse_sqrt_win_size,
+                        self.lower_bounding,
+                        apply_normalising_factor=False,
+                        cut_start_if_norm=False,
+                    )
+                    for i in range(X.shape[0])
+                ]
             )
-        else:
-            X_fft = np.fft.rfft(series[: self.window_size])
-            reals = np.real(X_fft)
-            imags = np.imag(X_fft)
-            mft_data = np.empty((length,), dtype=reals.dtype)
-            mft_data[0::2] = reals[: np.uint32(length / 2)]
-            mft_data[1::2] = imags[: np.uint32(length / 2)]
-
-        transformed[0] = mft_data * self.inverse_sqrt_win_size / stds[0]
+            if self._use_fallback_dft
+            else None
+        )
 
         # other runs using mft
-        # moved to external method to use njit
-        SFA._iterate_mft(
-            series,
-            mft_data,
-            phis,
+        transformed = sliding_mft(
+            X,
             self.window_size,
-            stds,
-            transformed,
-            self.inverse_sqrt_win_size,
+            length,
+            inverse_sqrt_win_size=self.inverse_sqrt_win_size,
+            lower_bounding=self.lower_bounding,
+            first_dft=first_dft,
+            n_jobs=self.n_jobs,
         )
 
-        if self.lower_bounding:
-            transformed[:, 1::2] = transformed[:, 1::2] * -1  # lower bounding
-
         return (
-            transformed[:, start_offset:][:, self.support]
+            transformed[:, :, start_offset:][:, :, self.support]
             if self.anova
-            else transformed[:, start_offset:]
+            else transformed[:, :, start_offset:]
         )
 
-    @staticmethod
-    @njit(fastmath=True, cache=True)
-    def _get_phis(window_size, length):
-        phis = np.zeros(length)
-        for i in range(int(length / 2)):
-            phis[i * 2] += math.cos(2 * math.pi * (-i) / window_size)
-            phis[i * 2 + 1] += -math.sin(2 * math.pi * (-i) / window_size)
-        return phis
-
-    @staticmethod
-    @njit(fastmath=True, cache=True)
-    def _iterate_mft(
-        series, mft_data, phis, window_size, stds, transformed, inverse_sqrt_win_size
-    ):
-        for i in range(1, len(transformed)):
-            for n in range(0, len(mft_data), 2):
-                # only compute needed indices
-                real = mft_data[n] + series[i + window_size - 1] - series[i - 1]
-                imag = mft_data[n + 1]
-                mft_data[n] = real * phis[n] - imag * phis[n + 1]
-                mft_data[n + 1] = real * phis[n + 1] + phis[n] * imag
-
-            normalising_factor = inverse_sqrt_win_size / stds[i]
-            transformed[i] = mft_data * normalising_factor
-
     def _shorten_bags(self, word_len):
         if self.save_words is False:
             raise ValueError(
@@ -711,268 +711,20 @@ class SFA(BaseTransformer):
         if word_len > self.word_length:
             word_len = self.word_length
 
-        if self.typed_dict:
-            warnings.simplefilter("ignore", category=NumbaTypeSafetyWarning)
-
-        dim = Parallel(n_jobs=self.n_jobs, prefer="threads")(
-            delayed(self._shorten_case)(word_len, i) for i in range(len(self.words))
-        )
+        words = np.asarray(self.words)
+        amount = (self.word_length - word_len) * self.letter_bits
+        if words.ndim == 2:
+            words = words >> amount
+        else:
+            words = _shift_large_words_right(words, amount)
 
-        # cant pickle typed dict
-        if self.typed_dict and self.n_jobs != 1:
-            nl = [None] * len(dim)
-            for i, pdict in enumerate(dim):
-                ndict = (
-                    Dict.empty(
-                        key_type=types.UniTuple(types.int64, 2), value_type=types.uint32
-                    )
-                    if self.levels > 1
-                    else Dict.empty(key_type=types.int64, value_type=types.uint32)
-                )
-                for key, val in pdict.items():
-                    ndict[key] = val
-                nl[i] = pdict
-            dim = nl
+        dim = self._bags_from_csr(*self._count_words(words))
 
         new_bags = pd.DataFrame() if self.return_pandas_data_series else [None]
         new_bags[0] = list(dim)
 
         return new_bags
 
-    def _shorten_case(self, word_len, i):
-        if self.typed_dict:
-            new_bag = (
-                Dict.empty(
-                    key_type=types.Tuple((types.int64, types.int16)),
-                    value_type=types.uint32,
-                )
-                if self.levels > 1
-                else Dict.empty(key_type=types.int64, value_type=types.uint32)
-            )
-        else:
-            new_bag = {}
-
-        last_word = -1
-        repeat_words = 0
-
-        for window, word in enumerate(self.words[i]):
-            new_word = self._shorten_words(word, word_len)
-
-            repeat_word = (
-                self._add_to_pyramid(
-                    new_bag, new_word, last_word, window - int(repeat_words / 2)
-                )
-                if self.levels > 1
-                else self._add_to_bag(new_bag, new_word, last_word)
-            )
-
-            if repeat_word:
-                repeat_words += 1
-            else:
-                last_word = new_word
-                repeat_words = 0
-
-            if self.bigrams:
-                if window - self.window_size >= 0:
-                    bigram = self._create_bigram_words(
-                        new_word,
-                        self._shorten_words(
-                            self.words[i][window - self.window_size], word_len
-                        ),
-                    )
-
-                    if self.levels > 1:
-                        if self.typed_dict:
-                            bigram = (bigram, -1)
-                        else:
-                            bigram = (bigram << self.level_bits) | 0
-                    new_bag[bigram] = new_bag.get(bigram, 0) + 1
-
-            if self.skip_grams:
-                # creates skip-grams, skipping every (s-1)-th word in-between
-                for s in range(2, 4):
-                    if window - s * self.window_size >= 0:
-                        skip_gram = self._create_bigram_words(
-                            new_word,
-                            self._shorten_words(
-                                self.words[i][window - s * self.window_size],
-                                word_len,
-                            ),
-                        )
-
-                        if self.levels > 1:
-                            if self.typed_dict:
-                                skip_gram = (skip_gram, -1)
-                            else:
-                                skip_gram = (skip_gram << self.level_bits) | 0
-                        new_bag[skip_gram] = new_bag.get(skip_gram, 0) + 1
-
-        # cant pickle typed dict
-        if self.typed_dict and self.n_jobs != 1:
-            pdict = dict()
-            for key, val in new_bag.items():
-                pdict[key] = val
-            new_bag = pdict
-
-        return pd.Series(new_bag) if self.return_pandas_data_series else new_bag
-
-    def _add_to_bag(self, bag, word, last_word):
-        if self.remove_repeat_words and word == last_word:
-            return True
-
-        # store the histogram of word counts
-        bag[word] = bag.get(word, 0) + 1
-
-        return False
-
-    def _add_to_pyramid(self, bag, word, last_word, window_ind):
-        if self.remove_repeat_words and word == last_word:
-            return True
-
-        start = 0
-        for i in range(self.levels):
-            if self.typed_dict:
-                new_word, num_quadrants = SFA._add_level_typed(
-                    word, start, i, window_ind, self.window_size, self.series_length
-                )
-            else:
-                new_word, num_quadrants = (
-                    SFA._add_level(
-                        word,
-                        start,
-                        i,
-                        window_ind,
-                        self.window_size,
-                        self.series_length,
-                        self.level_bits,
-                    )
-                    if self.word_bits + self.level_bits <= 64
-                    else self._add_level_large(
-                        word,
-                        start,
-                        i,
-                        window_ind,
-                    )
-                )
-            bag[new_word] = bag.get(new_word, 0) + num_quadrants
-            start += num_quadrants
-
-        return False
-
-    @staticmethod
-    @njit(fastmath=True, cache=True)
-    def _add_level(
-        word, start, level, window_ind, window_size, series_length, level_bits
-    ):
-        num_quadrants = pow(2, level)
-        quadrant = start + int(
-            (window_ind + int(window_size / 2)) / int(series_length / num_quadrants)
-        )
-        return (word << level_bits) | quadrant, num_quadrants
-
-    def _add_level_large(self, word, start, level, window_ind):
-        num_quadrants = pow(2, level)
-        quadrant = start + int(
-            (window_ind + int(self.window_size / 2))
-            / int(self.series_length / num_quadrants)
-        )
-        return (word << self.level_bits) | quadrant, num_quadrants
-
-    @staticmethod
-    @njit(fastmath=True, cache=True)
-    def _add_level_typed(word, start, level, window_ind, window_size, series_length):
-        num_quadrants = pow(2, level)
-        quadrant = start + int(
-            (window_ind + int(window_size / 2)) / int(series_length / num_quadrants)
-        )
-        return (word, quadrant), num_quadrants
-
-    @staticmethod
-    @njit(fastmath=True, cache=True)
-    def _create_word(dft, word_length, alphabet_size, breakpoints, letter_bits):
-        word = np.int64(0)
-        for i in range(word_length):
-            for bp in range(alphabet_size):
-                if dft[i] <= breakpoints[i][bp]:
-                    word = (word << letter_bits) | bp
-                    break
-
-        return word
-
-    def _create_word_large(self, dft):
-        word = 0
-        for i in range(self.word_length):
-            for bp in range(self.alphabet_size):
-                if dft[i] <= self.breakpoints[i][bp]:
-                    word = (word << self.letter_bits) | bp
-                    break
-
-        return word
-
-    @staticmethod
-    @njit(fastmath=True, cache=True)
-    def _calc_incremental_mean_std(series, end, window_size):
-        stds = np.zeros(end)
-        window = series[0:window_size]
-        series_sum = np.sum(window)
-        square_sum = np.sum(np.multiply(window, window))
-
-        r_window_length = 1 / window_size
-        mean = series_sum * r_window_length
-        buf = math.sqrt(square_sum * r_window_length - mean * mean)
-        stds[0] = buf if buf > 1e-8 else 1
-
-        for w in range(1, end):
-            series_sum += series[w + window_size - 1] - series[w - 1]
-            mean = series_sum * r_window_length
-            square_sum += (
-                series[w + window_size - 1] * series[w + window_size - 1]
-                - series[w - 1] * series[w - 1]
-            )
-            buf = math.sqrt(square_sum * r_window_length - mean * mean)
-            stds[w] = buf if buf > 1e-8 else 1
-
-        return stds
-
-    def _create_bigram_words(self, word_raw, word):
-        return (
-            SFA._create_bigram_word(
-                word,
-                word_raw,
-                self.word_bits,
-            )
-            if self.max_bits <= 64
-            else self._create_bigram_word_large(
-                word,
-                word_raw,
-            )
-        )
-
-    @staticmethod
-    @njit(fastmath=True, cache=True)
-    def _create_bigram_word(word, other_word, word_bits):
-        return (word << word_bits) | other_word
-
-    def _create_bigram_word_large(self, word, other_word):
-        return (word << self.word_bits) | other_word
-
-    def _shorten_words(self, word, word_len):
-        return (
-            SFA._shorten_word(word, self.word_length - word_len, self.letter_bits)
-            if self.word_bits <= 64
-            else self._shorten_word_large(word, self.word_length - word_len)
-        )
-
-    @staticmethod
-    @njit(fastmath=True, cache=True)
-    def _shorten_word(word, amount, letter_bits):
-        # shorten a word by set amount of letters
-        return word >> amount * letter_bits
-
-    def _shorten_word_large(self, word, amount):
-        # shorten a word by set amount of letters
-        return word >> amount * self.letter_bits
-
     def bag_to_string(self, bag):
         """Convert a bag of SFA words into a string."""
         s = "{"
@@ -1058,3 +810,449 @@ class SFA(BaseTransformer):
         # small window size for testing
         params = {"window_size": 4, "return_pandas_data_series": True}
         return params
+
+
+@njit(fastmath=True, cache=True, parallel=True)
+def _create_words(dfts, word_length, alphabet_size, breakpoints, letter_bits):
+    n_instances, n_windows, _ = dfts.shape
+    words = np.zeros((n_instances, n_windows), dtype=np.int64)
+
+    for a in prange(n_instances):
+        for window in range(n_windows):
+            word = np.int64(0)
+            for i in range(word_length):
+                for bp in range(alphabet_size):
+                    if dfts[a, window, i] <= breakpoints[i][bp]:
+                        word = (word << letter_bits) | bp
+                        break
+            words[a, window] = word
+
+    return words
+
+
+# bag kernels buffer every key of a case before counting, cases are passed to them
+# in chunks so the buffers stay under this size
+_BAG_BUFFER_MB = 64
+
+
+def _create_bags_in_chunks(
+    create_bags,
+    words,
+    window_size,
+    series_length,
+    word_bits,
+    level_bits,
+    levels,
+    remove_repeat_words,
+    bigrams,
+    skip_grams,
+    *args,
+):
+    """Run a bag kernel over chunks of cases and join the CSR arrays it returns."""
+    per_window = levels + (1 if bigrams else 0) + (2 if skip_grams else 0)
+    key_bytes = 20 if words.ndim == 2 else 12 + 8 * words.shape[2]
+    chunk_size = max(
+        1,
+        int(_BAG_BUFFER_MB * 1024 * 1024 / (words.shape[1] * per_window * key_bytes)),
+    )
+
+    chunks = [
+        create_bags(
+            words[i : i + chunk_size],
+            window_size,
+            series_length,
+            word_bits,
+            level_bits,
+            levels,
+            remove_repeat_words,
+            bigrams,
+            skip_grams,
+            *args,
+        )
+        for i in range(0, max(len(words), 1), chunk_size)
+    ]
+    if len(chunks) == 1:
+        return chunks[0]
+
+    indptr = [chunks[0][0]]
+    for c in chunks[1:]:
+        indptr.append(c[0][1:] + indptr[-1][-1])
+
+    return (
+        np.concatenate(indptr),
+        np.concatenate([c[1] for c in chunks]),
+        np.concatenate([c[2] for c in chunks]),
+        np.concatenate([c[3] for c in chunks]),
+    )
+
+
+@njit(fastmath=True, cache=True, parallel=True)
+def _create_bags(
+    words,
+    window_size,
+    series_length,
+    word_bits,
+    level_bits,
+    levels,
+    remove_repeat_words,
+    bigrams,
+    skip_grams,
+    tuple_keys,
+):
+    """Count the words, pyramid words and n-grams of each case into CSR arrays.
+
+    Bag keys are a word and a quadrant. The quadrant is only set for pyramid words
+    when tuple_keys is True, otherwise it is packed into the word and the quadrant
+    is 0. Bigrams and skip-grams have quadrant -1 when tuple_keys is True. Keys
+    are ordered by first occurrence, the same as inserting into a dict.
+
+    Returns
+    -------
+    indptr : np.ndarray of int64
+        Start of each case in the key and count arrays, with a final end position.
+    keys : np.ndarray of int64
+        The word of each bag key.
+    quadrants : np.ndarray of int64
+        The quadrant of each bag key.
+    counts : np.ndarray of uint32
+        The count of each bag key.
+    """
+    n_instances, n_windows = words.shape
+    per_window = levels + (1 if bigrams else 0) + (2 if skip_grams else 0)
+    max_keys = n_windows * per_window
+
+    keys = np.zeros((n_instances, max_keys), dtype=np.int64)
+    quadrants = np.zeros((n_instances, max_keys), dtype=np.int64)
+    counts = np.zeros((n_instances, max_keys), dtype=np.uint32)
+    n_keys = np.zeros(n_instances, dtype=np.int64)
+
+    for a in prange(n_instances):
+        n = 0
+        last_word = -1
+        repeat_words = 0
+
+        for window in range(n_windows):
+            word = words[a, window]
+
+            if remove_repeat_words and word == last_word:
+                repeat_words += 1
+            else:
+                if levels > 1:
+                    window_ind = window - repeat_words // 2
+                    start = 0
+                    for level in range(levels):
+                        num_quadrants = 2**level
+                        quadrant = start + (window_ind + window_size // 2) // (
+                            series_length // num_quadrants
+                        )
+                        if tuple_keys:
+                            keys[a, n] = word
+                            quadrants[a, n] = quadrant
+                        else:
+                            keys[a, n] = (word << level_bits) | quadrant
+                        counts[a, n] = num_quadrants
+                        n += 1
+                        start += num_quadrants
+                else:
+                    keys[a, n] = word
+                    counts[a, n] = 1
+                    n += 1
+
+                last_word = word
+                repeat_words = 0
+
+            if bigrams and window - window_size >= 0:
+                keys[a, n] = (words[a, window - window_size] << word_bits) | word
+                if levels > 1:
+                    if tuple_keys:
+                        quadrants[a, n] = -1
+                    else:
+                        keys[a, n] = keys[a, n] << level_bits
+                counts[a, n] = 1
+                n += 1
+
+            if skip_grams:
+                # creates skip-grams, skipping every (s-1)-th word in-between
+                for s in range(2, 4):
+                    if window - s * window_size >= 0:
+                        keys[a, n] = (
+                            words[a, window - s * window_size] << word_bits
+                        ) | word
+                        if levels > 1:
+                            if tuple_keys:
+                                quadrants[a, n] = -1
+                            else:
+                                keys[a, n] = keys[a, n] << level_bits
+                        counts[a, n] = 1
+                        n += 1
+
+        # stable sorts by quadrant then word keep equal keys in occurrence order
+        order = np.argsort(quadrants[a, :n], kind="mergesort")
+        order = order[np.argsort(keys[a, order], kind="mergesort")]
+
+        n_unique = 0
+        unique_keys = np.zeros(n, dtype=np.int64)
+        unique_quadrants = np.zeros(n, dtype=np.int64)
+        unique_counts = np.zeros(n, dtype=np.uint32)
+        first_seen = np.zeros(n, dtype=np.int64)
+        for i in range(n):
+            idx = order[i]
+            if (
+                n_unique == 0
+                or keys[a, idx] != unique_keys[n_unique - 1]
+                or quadrants[a, idx] != unique_quadrants[n_unique - 1]
+            ):
+                unique_keys[n_unique] = keys[a, idx]
+                unique_quadrants[n_unique] = quadrants[a, idx]
+                first_seen[n_unique] = idx
+                n_unique += 1
+            unique_counts[n_unique - 1] += counts[a, idx]
+
+        order = np.argsort(first_seen[:n_unique])
+        keys[a, :n_unique] = unique_keys[order]
+        quadrants[a, :n_unique] = unique_quadrants[order]
+        counts[a, :n_unique] = unique_counts[order]
+        n_keys[a] = n_unique
+
+    indptr = np.zeros(n_instances + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(n_keys)
+
+    out_keys = np.zeros(indptr[-1], dtype=np.int64)
+    out_quadrants = np.zeros(indptr[-1], dtype=np.int64)
+    out_counts = np.zeros(indptr[-1], dtype=np.uint32)
+    for a in prange(n_instances):
+        out_keys[indptr[a] : indptr[a + 1]] = keys[a, : n_keys[a]]
+        out_quadrants[indptr[a] : indptr[a + 1]] = quadrants[a, : n_keys[a]]
+        out_counts[indptr[a] : indptr[a + 1]] = counts[a, : n_keys[a]]
+
+    return indptr, out_keys, out_quadrants, out_counts
+
+
+@njit(cache=True)
+def _typed_bag(words, counts):
+    bag = Dict.empty(key_type=types.int64, value_type=types.uint32)
+    for i in range(len(words)):
+        bag[words[i]] = counts[i]
+    return bag
+
+
+_pyramid_key_type = types.UniTuple(types.int64, 2)
+
+
+@njit(cache=True)
+def _typed_pyramid_bag(words, quadrants, counts):
+    bag = Dict.empty(key_type=_pyramid_key_type, value_type=types.uint32)
+    for i in range(len(words)):
+        bag[(words[i], quadrants[i])] = counts[i]
+    return bag
+
+
+@njit(fastmath=True, cache=True, parallel=True)
+def _create_large_words(
+    dfts, word_length, alphabet_size, breakpoints, letter_bits, n_limbs
+):
+    """Create words as arrays of little-endian uint64 limbs.
+
+    Used when words or bag keys do not fit in 64 bits.
+    """
+    n_instances, n_windows, _ = dfts.shape
+    words = np.zeros((n_instances, n_windows, n_limbs), dtype=np.uint64)
+
+    for a in prange(n_instances):
+        for window in range(n_windows):
+            word = words[a, window]
+            for i in range(word_length):
+                for bp in range(alphabet_size):
+                    if dfts[a, window, i] <= breakpoints[i][bp]:
+                        _shift_left(word, letter_bits, word)
+                        word[0] |= np.uint64(bp)
+                        break
+
+    return words
+
+
+@njit(fastmath=True, cache=True, parallel=True)
+def _create_large_bags(
+    words,
+    window_size,
+    series_length,
+    word_bits,
+    level_bits,
+    levels,
+    remove_repeat_words,
+    bigrams,
+    skip_grams,
+):
+    """Count the words, pyramid words and n-grams of each case into CSR arrays.
+
+    The same as _create_bags, but for words stored as arrays of uint64 limbs.
+    Pyramid levels are always packed into the word.
+
+    Returns
+    -------
+    indptr : np.ndarray of int64
+        Start of each case in the key and count arrays, with a final end position.
+    keys : np.ndarray of uint64 of shape (n_keys, n_limbs)
+        The limbs of each bag key.
+    quadrants : np.ndarray of int64
+        Always 0, kept for a common output with _create_bags.
+    counts : np.ndarray of uint32
+        The count of each bag key.
+    """
+    n_instances, n_windows, n_limbs = words.shape
+    per_window = levels + (1 if bigrams else 0) + (2 if skip_grams else 0)
+    max_keys = n_windows * per_window
+
+    keys = np.zeros((n_instances, max_keys, n_limbs), dtype=np.uint64)
+    counts = np.zeros((n_instances, max_keys), dtype=np.uint32)
+    n_keys = np.zeros(n_instances, dtype=np.int64)
+
+    for a in prange(n_instances):
+        n = 0
+        last_window = -1
+        repeat_words = 0
+
+        for window in range(n_windows):
+            word = words[a, window]
+
+            if (
+                remove_repeat_words
+                and last_window >= 0
+                and _limbs_equal(word, words[a, last_window])
+            ):
+                repeat_words += 1
+            else:
+                if levels > 1:
+                    window_ind = window - repeat_words // 2
+                    start = 0
+                    for level in range(levels):
+                        num_quadrants = 2**level
+                        quadrant = start + (window_ind + window_size // 2) // (
+                            series_length // num_quadrants
+                        )
+                        _shift_left(word, level_bits, keys[a, n])
+                        keys[a, n, 0] |= np.uint64(quadrant)
+                        counts[a, n] = num_quadrants
+                        n += 1
+                        start += num_quadrants
+                else:
+                    keys[a, n] = word
+                    counts[a, n] = 1
+                    n += 1
+
+                last_window = window
+                repeat_words = 0
+
+            for s in range(1, 4):
+                if (s == 1 and not bigrams) or (s > 1 and not skip_grams):
+                    continue
+
+                # bigrams and skip-grams, skipping every (s-1)-th word in-between
+                if window - s * window_size >= 0:
+                    key = keys[a, n]
+                    _shift_left(words[a, window - s * window_size], word_bits, key)
+                    for j in range(n_limbs):
+                        key[j] |= word[j]
+                    if levels > 1:
+                        _shift_left(key, level_bits, key)
+                    counts[a, n] = 1
+                    n += 1
+
+        # stable sorts from the lowest to the highest limb order the keys while
+        # keeping equal keys in occurrence order
+        order = np.arange(n)
+        for j in range(n_limbs):
+            limb = keys[a, :n, j].copy()
+            order = order[np.argsort(limb[order], kind="mergesort")]
+
+        n_unique = 0
+        unique_keys = np.zeros((n, n_limbs), dtype=np.uint64)
+        unique_counts = np.zeros(n, dtype=np.uint32)
+        first_seen = np.zeros(n, dtype=np.int64)
+        for i in range(n):
+            idx = order[i]
+            if n_unique == 0 or not _limbs_equal(
+                keys[a, idx], unique_keys[n_unique - 1]
+            ):
+                unique_keys[n_unique] = keys[a, idx]
+                first_seen[n_unique] = idx
+                n_unique += 1
+            unique_counts[n_unique - 1] += counts[a, idx]
+
+        order = np.argsort(first_seen[:n_unique])
+        for i in range(n_unique):
+            keys[a, i] = unique_keys[order[i]]
+            counts[a, i] = unique_counts[order[i]]
+        n_keys[a] = n_unique
+
+    indptr = np.zeros(n_instances + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(n_keys)
+
+    out_keys = np.zeros((indptr[-1], n_limbs), dtype=np.uint64)
+    out_counts = np.zeros(indptr[-1], dtype=np.uint32)
+    for a in prange(n_instances):
+        out_keys[indptr[a] : indptr[a + 1]] = keys[a, : n_keys[a]]
+        out_counts[indptr[a] : indptr[a + 1]] = counts[a, : n_keys[a]]
+
+    return indptr, out_keys, np.zeros(indptr[-1], dtype=np.int64), out_counts
+
+
+@njit(fastmath=True, cache=True, parallel=True)
+def _shift_large_words_right(words, amount):
+    n_instances, n_windows, n_limbs = words.shape
+    shortened = np.zeros_like(words)
+    for a in prange(n_instances):
+        for window in range(n_windows):
+            _shift_right(words[a, window], amount, shortened[a, window])
+    return shortened
+
+
+@njit(fastmath=True, cache=True)
+def _shift_left(word, amount, out):
+    # out = word << amount over little-endian uint64 limbs, bits shifted past the
+    # last limb are lost. out can be the same array as word.
+    n_limbs = len(out)
+    limb_shift = amount // 64
+    bit_shift = np.uint64(amount % 64)
+    for j in range(n_limbs - 1, -1, -1):
+        k = j - limb_shift
+        value = np.uint64(0)
+        if k >= 0:
+            value = word[k] << bit_shift
+            if bit_shift > 0 and k > 0:
+                value |= word[k - 1] >> (np.uint64(64) - bit_shift)
+        out[j] = value
+
+
+@njit(fastmath=True, cache=True)
+def _shift_right(word, amount, out):
+    # out = word >> amount over little-endian uint64 limbs. out can be the same
+    # array as word.
+    n_limbs = len(out)
+    limb_shift = amount // 64
+    bit_shift = np.uint64(amount % 64)
+    for j in range(n_limbs):
+        k = j + limb_shift
+        value = np.uint64(0)
+        if k < n_limbs:
+            value = word[k] >> bit_shift
+            if bit_shift > 0 and k + 1 < n_limbs:
+                value |= word[k + 1] << (np.uint64(64) - bit_shift)
+        out[j] = value
+
+
+@njit(fastmath=True, cache=True)
+def _limbs_equal(word, other_word):
+    for j in range(len(word)):
+        if word[j] != other_word[j]:
+            return False
+    return True
+
+
+def _limbs_to_ints(limbs):
+    # convert rows of little-endian uint64 limbs to python ints
+    size = limbs.shape[1] * 8
+    data = np.ascontiguousarray(limbs, dtype="<u8").tobytes()
+    return [
+        int.from_bytes(data[i : i + size], "little") for i in range(0, len(data), size)
+    ]
@@ -15,14 +15,11 @@ from itertools import zip_longest
 from operator import itemgetter
 
 import numpy as np
-import pandas as pd
 from aeon.transformations.base import BaseTransformer
 from aeon.utils.numba.general import z_normalise_series
 from aeon.utils.validation import check_n_jobs
-from joblib import Parallel, delayed
-from numba import njit
+from numba import config, get_num_threads, njit, prange, set_num_threads
 from numba.typed.typedlist import List
-from scipy.stats import linregress
 from sklearn import preprocessing
 from sklearn.tree import DecisionTreeRegressor
 from sklearn.utils import check_random_state
@@ -75,11 +72,10 @@ class RandomShapeletTransform(BaseTransformer):
     n_jobs : int, default=1
         The number of jobs to run in parallel for both `fit` and `transform`.
         ``-1`` means using all processors.
-    parallel_backend : str, ParallelBackendBase instance or None, default=None
-        Specify the parallelisation backend implementation in joblib, if None a 'prefer'
-        value of "threads" is used by default.
-        Valid options are "loky", "multiprocessing", "threading" or a custom backend.
-        See the joblib Parallel documentation for more details.
+    parallel_backend : None, default=None
+        Deprecated and has no effect, a FutureWarning is raised in `fit` if it is set.
+        Shapelet distances in both `fit` and `transform` are found using numba
+        threads, the number of which is set by n_jobs.
     batch_size : int or None, default=100
         Number of shapelet candidates processed before being merged into the set of best
         shapelets.
@@ -194,7 +190,11 @@ class RandomShapeletTransform(BaseTransformer):
         self._batch_size = batch_size
         self._class_counts = []
         self._class_dictionary = {}
-        self._sorted_indicies = []
+        self._shapelet_array = None
+        self._sorted_indicies = None
+        self._shapelet_positions = None
+        self._shapelet_lengths = None
+        self._shapelet_dims = None
 
         super(RandomShapeletTransform, self).__init__()
 
@@ -213,6 +213,14 @@ class RandomShapeletTransform(BaseTransformer):
         self : RandomShapeletTransform
             This estimator.
         """
+        if self.parallel_backend is not None:
+            warnings.warn(
+                "parallel_backend is deprecated and has no effect, shapelet distances "
+                "are found using numba threads. It will be removed in a future "
+                "version.",
+                FutureWarning,
+            )
+
         self._n_jobs = check_n_jobs(self.n_jobs)
 
         self.n_instances, self.n_dims, self.series_length = X.shape
@@ -230,25 +238,21 @@ class RandomShapeletTransform(BaseTransformer):
         shapelets = List([(-1.0, -1, -1, -1, -1, -1.0)])
         n_shapelets_extracted = 0
 
+        # window statistics of the train series, shared by all candidate batches
+        series_stats = _SeriesStatistics(X)
+
         if time_limit > 0:
             while (
                 fit_time < time_limit
                 and n_shapelets_extracted < self.contract_max_n_shapelet_samples
             ):
-                candidate_shapelets = Parallel(
-                    n_jobs=self._n_jobs, backend=self.parallel_backend, prefer="threads"
-                )(
-                    delayed(self._extract_random_shapelet)(
-                        X,
-                        y,
-                        n_shapelets_extracted + i,
-                    )
-                    for i in range(self._batch_size)
+                candidate_shapelets = self._extract_random_shapelets(
+                    X, y, series_stats, n_shapelets_extracted, self._batch_size
                 )
 
                 self._merge_shapelets(
                     shapelets,
-                    List(candidate_shapelets),
+                    candidate_shapelets,
                     self._max_shapelets,
                 )
 
@@ -267,20 +271,13 @@ class RandomShapeletTransform(BaseTransformer):
                     else self._n_shapelet_samples - n_shapelets_extracted
                 )
 
-                candidate_shapelets = Parallel(
-                    n_jobs=self._n_jobs, backend=self.parallel_backend, prefer="threads"
-                )(
-                    delayed(self._extract_random_shapelet)(
-                        X,
-                        y,
-                        n_shapelets_extracted + i,
-                    )
-                    for i in range(n_shapelets_to_extract)
+                candidate_shapelets = self._extract_random_shapelets(
+                    X, y, series_stats, n_shapelets_extracted, n_shapelets_to_extract
                 )
 
                 self._merge_shapelets(
                     shapelets,
-                    List(candidate_shapelets),
+                    candidate_shapelets,
                     self._max_shapelets,
                 )
 
@@ -308,14 +305,26 @@ class RandomShapeletTransform(BaseTransformer):
         to_keep = self._remove_identical_shapelets(List(self.shapelets))
         self.shapelets = [n for (n, b) in zip(self.shapelets, to_keep) if b]
 
-        self._sorted_indicies = []
-        for s in self.shapelets:
+        # pack the shapelets so all distances are found in a single compiled call
+        self._shapelet_array = np.zeros(
+            (len(self.shapelets), max([s[1] for s in self.shapelets], default=0))
+        )
+        self._sorted_indicies = np.zeros(self._shapelet_array.shape, dtype=np.int64)
+        for i, s in enumerate(self.shapelets):
             sabs = np.abs(s[6])
-            self._sorted_indicies.append(
-                np.array(
-                    sorted(range(s[1]), reverse=True, key=lambda j, sabs=sabs: sabs[j])
-                )
+            self._shapelet_array[i, : s[1]] = s[6]
+            self._sorted_indicies[i, : s[1]] = sorted(
+                range(s[1]), reverse=True, key=lambda j, sabs=sabs: sabs[j]
             )
+
+        self._shapelet_positions = np.array(
+            [s[2] for s in self.shapelets], dtype=np.int64
+        )
+        self._shapelet_lengths = np.array(
+            [s[1] for s in self.shapelets], dtype=np.int64
+        )
+        self._shapelet_dims = np.array([s[3] for s in self.shapelets], dtype=np.int64)
+
         return self
 
     def _transform(self, X, y=None):
@@ -328,28 +337,21 @@ class RandomShapeletTransform(BaseTransformer):
 
         Returns
         -------
-        output : pandas DataFrame
-            The transformed dataframe in tabular format.
+        output : np.ndarray of shape (n_instances, n_shapelets)
+            The distance from each series to each shapelet.
         """
-        output = np.zeros((len(X), len(self.shapelets)))
-
-        for i, series in enumerate(X):
-            dists = Parallel(
-                n_jobs=self._n_jobs, backend=self.parallel_backend, prefer="threads"
-            )(
-                delayed(_online_shapelet_distance)(
-                    series[shapelet[3]],
-                    shapelet[6],
-                    self._sorted_indicies[n],
-                    shapelet[2],
-                    shapelet[1],
-                )
-                for n, shapelet in enumerate(self.shapelets)
-            )
-
-            output[i] = dists
+        distances = _shapelet_distances(
+            _SeriesStatistics(X),
+            self._shapelet_array,
+            self._sorted_indicies,
+            self._shapelet_positions,
+            self._shapelet_lengths,
+            self._shapelet_dims,
+            np.full(len(self.shapelets), -1, dtype=np.int64),
+            n_jobs=self._n_jobs,
+        )
 
-        return pd.DataFrame(output)
+        return distances.T
 
     @classmethod
     def get_test_params(cls, parameter_set="default"):
@@ -371,7 +373,40 @@ class RandomShapeletTransform(BaseTransformer):
         """
         return {"max_shapelets": 5, "n_shapelet_samples": 50, "batch_size": 20}
 
-    def _extract_random_shapelet(self, X, y, i):
+    def _extract_random_shapelets(self, X, y, series_stats, first_idx, n_shapelets):
+        candidates = [
+            self._extract_random_shapelet(X, first_idx + i) for i in range(n_shapelets)
+        ]
+
+        # pack the candidates so all are evaluated in a single compiled call
+        shapelets = np.zeros((n_shapelets, self._max_shapelet_length))
+        sorted_indicies = np.zeros(
+            (n_shapelets, self._max_shapelet_length), dtype=np.int64
+        )
+        for i, c in enumerate(candidates):
+            shapelets[i, : c[2]] = c[0]
+            sorted_indicies[i, : c[2]] = c[1]
+
+        qualities = _shapelet_qualities(
+            series_stats,
+            y,
+            shapelets,
+            sorted_indicies,
+            np.array([c[3] for c in candidates], dtype=np.int64),
+            np.array([c[2] for c in candidates], dtype=np.int64),
+            np.array([c[4] for c in candidates], dtype=np.int64),
+            np.array([c[5] for c in candidates], dtype=np.int64),
+            n_jobs=self._n_jobs,
+        )
+
+        return List(
+            [
+                (round(qualities[i], 12), c[2], c[3], c[4], c[5], y[c[5]])
+                for i, c in enumerate(candidates)
+            ]
+        )
+
+    def _extract_random_shapelet(self, X, i):
         rs = 255 if self.random_state == 0 else self.random_state
         rs = (
             None
@@ -395,47 +430,7 @@ class RandomShapeletTransform(BaseTransformer):
             sorted(range(length), reverse=True, key=lambda j: sabs[j])
         )
 
-        quality = self._find_shapelet_quality(
-            X,
-            y,
-            shapelet,
-            sorted_indicies,
-            position,
-            length,
-            dim,
-            inst_idx,
-        )
-
-        return quality, length, position, dim, inst_idx, y[inst_idx]
-
-    @staticmethod
-    def _find_shapelet_quality(
-        X,
-        y,
-        shapelet,
-        sorted_indicies,
-        position,
-        length,
-        dim,
-        inst_idx,
-    ):
-        # todo optimise this more, we spend 99% of time here
-        orderline = []
-
-        for i, series in enumerate(X):
-            if i != inst_idx:
-                distance = _online_shapelet_distance(
-                    series[dim], shapelet, sorted_indicies, position, length
-                )
-            else:
-                distance = 0
-
-            orderline.append((distance, y[i]))
-
-        quality = calc_correlation(orderline)
-        # quality = decision_tree_regressor_metric(orderline)
-
-        return round(quality, 12)
+        return shapelet, sorted_indicies, length, position, dim, inst_idx
 
     @staticmethod
     @njit(fastmath=True, cache=True)
@@ -491,50 +486,216 @@ class RandomShapeletTransform(BaseTransformer):
         return to_keep
 
 
-@njit(fastmath=True, cache=True)
-def _online_shapelet_distance(series, shapelet, sorted_indicies, position, length):
-    subseq = series[position : position + length]
-
-    sum = 0.0
-    sum2 = 0.0
-    for i in subseq:
-        sum += i
-        sum2 += i * i
-
-    mean = sum / length
-    std = (sum2 - mean * mean * length) / length
-    if std > 0:
-        subseq = (subseq - mean) / std
+class _SeriesStatistics:
+    """Cumulative sums of a set of series, used to find window means and deviations.
+
+    Computed once for each fit and transform and shared by every shapelet distance,
+    so the mean and standard deviation of any window are found in constant time.
+
+    Parameters
+    ----------
+    X : np.ndarray of shape (n_instances, n_dims, series_length)
+        The series.
+    """
+
+    def __init__(self, X):
+        self.X = np.ascontiguousarray(X, dtype=np.float64)
+
+        n_instances, n_dims, series_length = self.X.shape
+        self.sums = np.zeros((n_instances, n_dims, series_length + 1))
+        self.sums2 = np.zeros((n_instances, n_dims, series_length + 1))
+        np.cumsum(self.X, axis=2, out=self.sums[:, :, 1:])
+        np.cumsum(self.X * self.X, axis=2, out=self.sums2[:, :, 1:])
+
+
+def _shapelet_qualities(
+    series_stats,
+    y,
+    shapelets,
+    sorted_indicies,
+    positions,
+    lengths,
+    dims,
+    inst_indices,
+    n_jobs=1,
+):
+    distances = _shapelet_distances(
+        series_stats,
+        shapelets,
+        sorted_indicies,
+        positions,
+        lengths,
+        dims,
+        inst_indices,
+        n_jobs=n_jobs,
+    )
+    return _calc_qualities(distances, np.asarray(y, dtype=np.float64))
+
+
+def _shapelet_distances(
+    series_stats,
+    shapelets,
+    sorted_indicies,
+    positions,
+    lengths,
+    dims,
+    inst_indices,
+    n_jobs=1,
+):
+    distances = np.zeros((len(lengths), series_stats.X.shape[0]))
+
+    args = (
+        series_stats.X,
+        series_stats.sums,
+        series_stats.sums2,
+        shapelets,
+        sorted_indicies,
+        positions,
+        lengths,
+        dims,
+        inst_indices,
+        distances,
+    )
+
+    # parallel regions are only launched when threads are requested, numba
+    # parallel kernels cannot always be safely called from other python threads
+    if n_jobs == 1:
+        _shapelet_distances_serial(*args)
     else:
-        subseq = np.zeros(length)
+        prev_threads = get_num_threads()
+        set_num_threads(min(n_jobs, config.NUMBA_NUM_THREADS))
+        try:
+            _shapelet_distances_parallel(*args)
+        finally:
+            set_num_threads(prev_threads)
+
+    return distances
+
+
+@njit(fastmath=True, cache=True, parallel=True)
+def _shapelet_distances_parallel(
+    X,
+    sums,
+    sums2,
+    shapelets,
+    sorted_indicies,
+    positions,
+    lengths,
+    dims,
+    inst_indices,
+    distances,
+):
+    for n in prange(distances.size):
+        _shapelet_distance_to_case(
+            X,
+            sums,
+            sums2,
+            shapelets,
+            sorted_indicies,
+            positions,
+            lengths,
+            dims,
+            inst_indices,
+            distances,
+            n // X.shape[0],
+            n % X.shape[0],
+        )
 
-    best_dist = 0
-    for i, n in zip(shapelet, subseq):
-        temp = i - n
-        best_dist += temp * temp
 
-    i = 1
-    traverse = [True, True]
-    sums = [sum, sum]
-    sums2 = [sum2, sum2]
+@njit(fastmath=True, cache=True)
+def _shapelet_distances_serial(
+    X,
+    sums,
+    sums2,
+    shapelets,
+    sorted_indicies,
+    positions,
+    lengths,
+    dims,
+    inst_indices,
+    distances,
+):
+    for i in range(distances.shape[0]):
+        for n in range(X.shape[0]):
+            _shapelet_distance_to_case(
+                X,
+                sums,
+                sums2,
+                shapelets,
+                sorted_indicies,
+                positions,
+                lengths,
+                dims,
+                inst_indices,
+                distances,
+                i,
+                n,
+            )
 
-    while traverse[0] or traverse[1]:
-        for n in range(2):
-            mod = -1 if n == 0 else 1
-            pos = position + mod * i
-            traverse[n] = pos >= 0 if n == 0 else pos <= len(series) - length
 
-            if not traverse[n]:
-                continue
+@njit(fastmath=True, cache=True)
+def _shapelet_distance_to_case(
+    X,
+    sums,
+    sums2,
+    shapelets,
+    sorted_indicies,
+    positions,
+    lengths,
+    dims,
+    inst_indices,
+    distances,
+    i,
+    n,
+):
+    # the distance to the case the shapelet was extracted from is left as 0
+    if n != inst_indices[i]:
+        length = lengths[i]
+        distances[i, n] = _online_shapelet_distance(
+            X[n, dims[i]],
+            sums[n, dims[i]],
+            sums2[n, dims[i]],
+            shapelets[i, :length],
+            sorted_indicies[i, :length],
+            positions[i],
+            length,
+        )
+
+
+@njit(fastmath=True, cache=True)
+def _calc_qualities(distances, y):
+    qualities = np.zeros(distances.shape[0])
+    for i in range(distances.shape[0]):
+        qualities[i] = _calc_correlation(distances[i], y)
+    return qualities
+
+
+@njit(fastmath=True, cache=True)
+def _online_shapelet_distance(
+    series, sums, sums2, shapelet, sorted_indicies, position, length
+):
+    mean = (sums[position + length] - sums[position]) / length
+    std = (sums2[position + length] - sums2[position] - mean * mean * length) / length
 
-            start = series[pos - n]
-            end = series[pos - n + length]
+    best_dist = 0
+    for j in range(length):
+        val = (series[position + j] - mean) / std if std > 0 else 0
+        temp = shapelet[j] - val
+        best_dist += temp * temp
 
-            sums[n] += mod * end - mod * start
-            sums2[n] += mod * end * end - mod * start * start
+    # search outwards from the position, alternating between the windows before and
+    # after it
+    max_pos = len(series) - length
+    for i in range(1, max(position, max_pos - position) + 1):
+        for n in range(2):
+            pos = position - i if n == 0 else position + i
+            if pos < 0 or pos > max_pos:
+                continue
 
-            mean = sums[n] / length
-            std = math.sqrt((sums2[n] - mean * mean * length) / length)
+            mean = (sums[pos + length] - sums[pos]) / length
+            std = math.sqrt(
+                (sums2[pos + length] - sums2[pos] - mean * mean * length) / length
+            )
 
             dist = 0
             use_std = std != 0
@@ -549,8 +710,6 @@ def _online_shapelet_distance(series, shapelet, sorted_indicies, position, lengt
             if dist < best_dist:
                 best_dist = dist
 
-        i += 1
-
     return best_dist if best_dist == 0 else 1 / length * best_dist
 
 
@@ -571,12 +730,31 @@ def _is_self_similar(s1, s2):
 
 def calc_correlation(orderline):
     orderline = np.array(orderline)
+    return _calc_correlation(orderline[:, 0], orderline[:, 1])
 
-    if len(np.unique(orderline[:, 0])) == 1:
+
+@njit(fastmath=True, cache=True)
+def _calc_correlation(distances, y):
+    # squared Pearson correlation, the r squared of a linear regression of y on the
+    # distances
+    if np.all(distances == distances[0]) or np.all(y == y[0]):
         return 0.0
 
-    _, _, r_value, _, _ = linregress(orderline[:, 0], orderline[:, 1])
-    return r_value**2
+    dist_mean = np.mean(distances)
+    y_mean = np.mean(y)
+
+    sxy = 0.0
+    sxx = 0.0
+    syy = 0.0
+    for i in range(len(distances)):
+        dx = distances[i] - dist_mean
+        dy = y[i] - y_mean
+        sxy += dx * dy
+        sxx += dx * dx
+        syy += dy * dy
+
+    r = min(max(sxy / math.sqrt(sxx * syy), -1.0), 1.0)
+    return r * r
 
 
 # def decision_tree_regressor_metric():
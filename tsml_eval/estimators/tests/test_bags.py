@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Tests for the CSR word count bags."""
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from tsml_eval.estimators._bags import BagVocabulary, CSRBags
+
+
+def _dense(bags):
+    return csr_matrix(
+        (bags.counts, bags.indices, bags.indptr), shape=(len(bags), bags.n_words)
+    ).toarray()
+
+
+def test_bag_vocabulary_lookup():
+    """Test that word ids are kept and new keys are added in sorted order."""
+    vocabulary = BagVocabulary()
+
+    ids = vocabulary.lookup(np.array([[3, 1], [1, 2], [3, 0]]), extend=True)
+    np.testing.assert_array_equal(ids, [2, 0, 1])
+
+    ids = vocabulary.lookup(np.array([[3, 1], [2, 2], [0, 5]]), extend=True)
+    np.testing.assert_array_equal(ids, [2, 4, 3])
+    assert len(vocabulary) == 5
+
+    ids = vocabulary.lookup(np.array([[9, 9], [1, 2]]))
+    np.testing.assert_array_equal(ids, [-1, 0])
+    assert len(vocabulary) == 5
+
+
+def test_csr_bags_from_keys():
+    """Test that CSR bags from keys match counting each case's keys directly."""
+    rng = np.random.RandomState(0)
+    vocabulary = BagVocabulary()
+
+    cases = [rng.choice(20, size=rng.randint(0, 10), replace=False) for _ in range(8)]
+    indptr = np.zeros(len(cases) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(c) for c in cases])
+    keys = np.concatenate(cases)[:, None]
+    counts = rng.randint(1, 5, size=len(keys))
+
+    bags = CSRBags.from_keys(indptr, keys, counts, vocabulary, extend_vocabulary=True)
+
+    word_keys = np.unique(keys)
+    expected = np.zeros((len(cases), len(word_keys)), dtype=np.uint32)
+    for i in range(len(cases)):
+        rows = slice(indptr[i], indptr[i + 1])
+        expected[i, np.searchsorted(word_keys, keys[rows, 0])] = counts[rows]
+
+    np.testing.assert_array_equal(_dense(bags), expected)
+    assert all(
+        np.all(np.diff(bags.indices[bags.indptr[i] : bags.indptr[i + 1]]) > 0)
+        for i in range(len(bags))
+    )
+
+    # unseen keys are dropped when the vocabulary is not extended
+    unseen = CSRBags.from_keys(
+        np.array([0, 2]), np.array([[word_keys[0]], [99]]), np.array([4, 1]), vocabulary
+    )
+    assert _dense(unseen)[0, 0] == 4
+    assert unseen.counts.sum() == 4
+
+
+def test_csr_bags_hstack():
+    """Test that joined bags offset the word ids of each input."""
+    vocabulary = [BagVocabulary(), BagVocabulary()]
+    bags = [
+        CSRBags.from_keys(
+            np.array([0, 2, 3]),
+            np.array([[1], [4], [1]]) + d,
+            np.array([1, 2, 3]),
+            vocabulary[d],
+            extend_vocabulary=True,
+        )
+        for d in range(2)
+    ]
+
+    joined = CSRBags.hstack(bags, 2)
+
+    assert joined.n_words == 4
+    np.testing.assert_array_equal(
+        _dense(joined), np.hstack([_dense(bags[0]), _dense(bags[1])])
+    )
+    assert len(CSRBags.hstack([], 3)) == 3
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Tests for the shared least recently used array cache."""
+
+import pickle
+
+import numpy as np
+
+from tsml_eval.estimators._cache import LRUArrayCache
+
+
+def test_lru_array_cache_evicts_least_recently_used():
+    """Test that entries are removed in least recently used order over the limit."""
+    cache = LRUArrayCache(max_mb=3 * 800 / (1024 * 1024))
+    for key in "abc":
+        cache.store(key, np.zeros(100))
+
+    cache.lookup("a")
+    cache.store("d", (np.zeros(50), np.zeros(50)))
+
+    assert cache.lookup("b") is None
+    assert all(cache.lookup(key) is not None for key in "acd")
+
+    cache.store("e", np.zeros(1000))
+    assert cache.lookup("e") is None
+
+
+def test_lru_array_cache_get():
+    """Test that get only computes values which are not cached."""
+    cache = LRUArrayCache()
+    calls = []
+
+    def _compute():
+        calls.append(1)
+        return np.arange(5)
+
+    first = cache.get("a", _compute)
+    second = cache.get("a", _compute)
+
+    assert first is second
+    assert len(calls) == 1
+
+
+def test_lru_array_cache_pickles_empty():
+    """Test that pickled copies keep the size limit but no entries."""
+    cache = LRUArrayCache(max_mb=10)
+    cache.store("a", np.zeros(10))
+
+    copy = pickle.loads(pickle.dumps(cache))
+
+    assert copy.max_mb == 10
+    assert copy.lookup("a") is None
+    copy.store("a", np.ones(10))
+    assert cache.lookup("a")[0] == 0
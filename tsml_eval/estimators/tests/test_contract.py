@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Tests for the contracted ensemble batch scheduler."""
+
+import time
+
+import numpy as np
+import pytest
+
+from tsml_eval.estimators._contract import fit_contracted
+from tsml_eval.estimators.regression.interval_based.drcif import DrCIF
+from tsml_eval.estimators.regression.sklearn.rotation_forest import RotationForest
+
+
+def _sleep_and_return(i, seconds=0.01):
+    time.sleep(seconds)
+    return i
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_fit_contracted_first_batch_after_time_limit(n_jobs):
+    """Test that the first batch is fit even if the time limit has passed."""
+    results = fit_contracted(
+        _sleep_and_return, 1, time.time() - 10, 100, n_jobs, prefer="threads"
+    )
+
+    assert results == list(range(n_jobs))
+
+
+def test_fit_contracted_max_n_estimators():
+    """Test that no more than max_n_estimators are fit."""
+    results = fit_contracted(_sleep_and_return, 60, time.time(), 7, 2, prefer="threads")
+
+    assert results == list(range(7))
+
+
+def test_fit_contracted_indices():
+    """Test that every estimator gets a unique index, returned in order."""
+    results = fit_contracted(
+        _sleep_and_return, 0.5, time.time(), np.inf, 3, prefer="threads"
+    )
+
+    assert len(results) > 3
+    assert results == list(range(len(results)))
+
+
+def test_fit_contracted_time_limit():
+    """Test that fitting stops before a round would go over the time limit."""
+    start_time = time.time()
+    fit_contracted(lambda i: _sleep_and_return(i, 0.05), 0.5, start_time, np.inf, 1)
+
+    assert time.time() - start_time < 1
+
+
+@pytest.mark.parametrize(
+    "estimator",
+    [
+        DrCIF(time_limit_in_minutes=1e-6, random_state=0),
+        RotationForest(time_limit_in_minutes=1e-7, random_state=0),
+    ],
+)
+def test_contracted_estimator_never_empty(estimator):
+    """Test that an estimator with an expired contract still fits members."""
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(10, 1, 20))
+    y = rng.normal(size=10)
+    if isinstance(estimator, RotationForest):
+        X = X[:, 0]
+
+    estimator.fit(X, y)
+
+    assert estimator._n_estimators > 0
+    assert not np.any(np.isnan(estimator.predict(X)))
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Tests for the WEASELDilation and MUSEDilation classifiers."""
+
+import numpy as np
+import pytest
+
+from tsml_eval.estimators._fourier import sliding_mft
+from tsml_eval.estimators.classification.dictionary_based import (
+    MUSEDilation,
+    WEASELDilation,
+)
+from tsml_eval.estimators.classification.transformations import DFTCache
+
+
+def _random_classes(n_dims):
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(24, n_dims, 40))
+    y = np.repeat([0, 1, 2], 8)
+    X[y == 1, :, 10:20] += 2
+    X[y == 2, :, 25:35] -= 2
+    return X, y
+
+
+@pytest.mark.parametrize(
+    "classifier, n_dims",
+    [
+        (WEASELDilation(random_state=0), 1),
+        (MUSEDilation(ensemble_size=10, random_state=0), 2),
+    ],
+)
+def test_predict_batch_size(classifier, n_dims):
+    """Test that batched predictions are the same as unbatched predictions."""
+    X, y = _random_classes(n_dims)
+    classifier.fit(X, y)
+    expected = classifier.predict(X)
+
+    for predict_batch_size in [1, 5, 100]:
+        classifier.predict_batch_size = predict_batch_size
+        np.testing.assert_array_equal(classifier.predict(X), expected)
+
+
+@pytest.mark.parametrize("predict_batch_size", [0, -2, 2.5])
+def test_invalid_predict_batch_size(predict_batch_size):
+    """Test that predict_batch_size must be a positive int."""
+    X, y = _random_classes(1)
+    classifier = WEASELDilation(random_state=0).fit(X, y)
+
+    classifier.predict_batch_size = predict_batch_size
+    with pytest.raises(ValueError, match="predict_batch_size"):
+        classifier.predict(X)
+
+
+@pytest.mark.parametrize("max_mb", [1024, 0.01])
+def test_dft_cache_sliding_mft(max_mb):
+    """Test that cached coefficients, including after eviction, match the MFT."""
+    X = np.random.RandomState(0).normal(size=(10, 60))
+    expected = sliding_mft(X, 16, 12, inverse_sqrt_win_size=0.25)
+
+    cache = DFTCache(max_mb=max_mb)
+    for coefficients in [[2, 6], [0, 2, 10], [0, 4, 6, 8, 10]]:
+        columns = np.ravel([[c, c + 1] for c in coefficients])
+        np.testing.assert_array_equal(
+            cache.sliding_mft(X, (1,), 16, np.array(coefficients), 0.25, True),
+            expected[:, :, columns],
+        )
+
+
+@pytest.mark.parametrize(
+    "classifier, n_dims",
+    [
+        (WEASELDilation(random_state=0), 1),
+        (MUSEDilation(ensemble_size=10, random_state=0), 2),
+    ],
+)
+def test_dft_cache_mb(classifier, n_dims):
+    """Test that the DFT cache does not change predictions."""
+    X, y = _random_classes(n_dims)
+
+    probas = [
+        classifier.set_params(dft_cache_mb=dft_cache_mb).fit(X, y).predict_proba(X)
+        for dft_cache_mb in [1024, 0.01, 0]
+    ]
+
+    np.testing.assert_array_equal(probas[0], probas[1])
+    np.testing.assert_array_equal(probas[0], probas[2])
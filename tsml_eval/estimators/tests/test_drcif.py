@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Tests for the regression DrCIF."""
+
+import numpy as np
+import pytest
+
+from tsml_eval.estimators.regression.interval_based.drcif import DrCIF
+from tsml_eval.utils.test_utils import _random_walks
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_drcif_feature_cache_mb(n_jobs):
+    """Test that the interval feature cache does not change predictions."""
+    X, y = _random_walks(n_dims=2)
+
+    preds = [
+        DrCIF(
+            n_estimators=4,
+            n_intervals=6,
+            feature_cache_mb=feature_cache_mb,
+            n_jobs=n_jobs,
+            random_state=0,
+        )
+        .fit(X, y)
+        .predict(X)
+        for feature_cache_mb in [256, 0.001, 0]
+    ]
+
+    np.testing.assert_array_equal(preds[0], preds[1])
+    np.testing.assert_array_equal(preds[0], preds[2])
+
+
+def test_drcif_use_float32():
+    """Test that float32 representations are close to the float64 ones."""
+    X, y = _random_walks(n_dims=2)
+
+    drcif = DrCIF(n_estimators=2, random_state=0)
+    X_p, X_d = drcif._representations(X)
+    drcif.use_float32 = True
+    X_p32, X_d32 = drcif._representations(X)
+
+    assert X_p32.dtype == np.float32 and X_d32.dtype == np.float32
+    np.testing.assert_allclose(X_p32, X_p, rtol=1e-5)
+    np.testing.assert_allclose(X_d32, X_d, rtol=1e-5, atol=1e-5)
+
+    preds = drcif.fit(X, y).predict(X)
+    assert preds.shape == y.shape and np.all(np.isfinite(preds))
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Tests for the sliding window Fourier transform."""
+
+import numpy as np
+import pytest
+
+from tsml_eval.estimators._fourier import sliding_mft
+
+
+def _windowed_dft(X, window_size, length, lower_bounding):
+    windows = np.lib.stride_tricks.sliding_window_view(X, window_size, axis=1)
+    fft = np.fft.rfft(windows, axis=2)[:, :, : length // 2]
+
+    dfts = np.empty(windows.shape[:2] + (length,))
+    dfts[:, :, 0::2] = fft.real
+    dfts[:, :, 1::2] = -fft.imag if lower_bounding else fft.imag
+
+    # windows with no variance are not normalised
+    stds = windows.std(axis=2)
+    stds[stds <= 1e-8] = 1
+    return dfts / np.sqrt(window_size) / stds[:, :, None]
+
+
+@pytest.mark.parametrize("lower_bounding", [True, False])
+def test_sliding_mft_equals_windowed_fft(lower_bounding):
+    """Test the momentary Fourier transform against an FFT of every window."""
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(5, 30))
+    X[0] = 1
+
+    dfts = sliding_mft(
+        X,
+        8,
+        6,
+        inverse_sqrt_win_size=1 / np.sqrt(8),
+        lower_bounding=lower_bounding,
+    )
+
+    np.testing.assert_allclose(dfts, _windowed_dft(X, 8, 6, lower_bounding), atol=1e-10)
+
+
+def test_sliding_mft_coefficients():
+    """Test that a subset of coefficients matches the full transform."""
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(5, 30))
+
+    dfts = sliding_mft(X, 10, 8)
+    subset = sliding_mft(X, 10, 8, coefficients=np.array([2, 6]))
+
+    np.testing.assert_array_equal(subset, dfts[:, :, [2, 3, 6, 7]])
+
+
+def test_sliding_mft_n_jobs_and_dtype():
+    """Test that threads and float32 output give the same values."""
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(7, 50))
+
+    dfts = sliding_mft(X, 12, 10)
+
+    # the serial and parallel kernels are compiled separately with fastmath
+    np.testing.assert_allclose(sliding_mft(X, 12, 10, n_jobs=2), dfts, atol=1e-12)
+    dfts_32 = sliding_mft(X, 12, 10, dtype=np.float32)
+    assert dfts_32.dtype == np.float32
+    np.testing.assert_allclose(dfts_32, dfts, rtol=1e-5, atol=1e-6)
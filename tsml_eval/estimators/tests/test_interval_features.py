@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Tests for the batched interval feature extraction."""
+
+import numpy as np
+import pytest
+from aeon.classification.sklearn._continuous_interval_tree import _drcif_feature
+from aeon.transformations.panel.catch22 import Catch22
+
+from tsml_eval.estimators._interval_features import (
+    IntervalFeatureCache,
+    interval_features,
+)
+
+
+def _random_intervals():
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(10, 2, 50))
+    # a constant series to cover zero variance intervals
+    X[0, 0] = 1
+    intervals = np.array([[0, 50], [3, 6], [10, 31], [25, 45]])
+    dims = np.array([0, 1, 0, 1])
+    return X, intervals, dims
+
+
+def test_interval_features_equal_drcif_feature():
+    """Test that batched features match aeon's per feature DrCIF extraction.
+
+    interval_features calls private aeon catch22 helpers, this checks the results
+    still match Catch22(outlier_norm=True) as used by _drcif_feature.
+    """
+    X, intervals, dims = _random_intervals()
+    atts = np.arange(29)
+
+    c22 = Catch22(outlier_norm=True)
+    expected = np.array(
+        [
+            _drcif_feature(X, intervals[j], dims[j], att, c22, case_id=j)
+            for j in range(len(intervals))
+            for att in atts
+        ],
+        dtype=np.float32,
+    ).T
+
+    np.testing.assert_array_equal(interval_features(X, intervals, dims, atts), expected)
+
+
+@pytest.mark.parametrize("max_mb", [256, 0.0005])
+def test_interval_features_cache(max_mb):
+    """Test that cached features, including after eviction, match uncached ones."""
+    X, intervals, dims = _random_intervals()
+    atts = np.array([2, 22, 5, 11])
+
+    expected = interval_features(X, intervals, dims, atts)
+    cache = IntervalFeatureCache(max_mb=max_mb)
+    for order in [atts, atts[::-1], atts]:
+        X_t = interval_features(X, intervals, dims, order, cache=cache, cache_key=(0,))
+        np.testing.assert_array_equal(
+            X_t.reshape(len(X), len(intervals), len(atts)),
+            expected.reshape(len(X), len(intervals), len(atts))[
+                :, :, [list(atts).index(a) for a in order]
+            ],
+        )
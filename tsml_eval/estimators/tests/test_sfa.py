@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""Tests for the regression SFA transformer."""
+
+import numpy as np
+import pytest
+
+from tsml_eval.estimators._bags import BagVocabulary
+from tsml_eval.estimators.regression.transformations import sfa as sfa_module
+from tsml_eval.estimators.regression.transformations.sfa import (
+    SFA,
+    _create_large_bags,
+    _limbs_to_ints,
+)
+
+
+def _reference_bags(sfa, X):
+    # per case dict bags built with python ints, as in the original transform
+    dfts = sfa._mft(X[:, 0, :])
+    tuple_keys = sfa.typed_dict and sfa.levels > 1
+
+    bags = []
+    for case_dfts in dfts:
+        words = []
+        for dft in case_dfts:
+            word = 0
+            for i in range(sfa.word_length):
+                for bp in range(sfa.alphabet_size):
+                    if dft[i] <= sfa.breakpoints[i][bp]:
+                        word = (word << sfa.letter_bits) | bp
+                        break
+            words.append(word)
+
+        bag = {}
+        last_word = -1
+        repeat_words = 0
+        for window, word in enumerate(words):
+            if sfa.remove_repeat_words and word == last_word:
+                repeat_words += 1
+            else:
+                window_ind = window - repeat_words // 2
+                start = 0
+                for level in range(sfa.levels):
+                    if sfa.levels == 1:
+                        key, count = word, 1
+                    else:
+                        count = 2**level
+                        quadrant = start + (window_ind + sfa.window_size // 2) // (
+                            sfa.series_length // count
+                        )
+                        key = (
+                            (word, quadrant)
+                            if tuple_keys
+                            else (word << sfa.level_bits) | quadrant
+                        )
+                        start += count
+                    bag[key] = bag.get(key, 0) + count
+                last_word = word
+                repeat_words = 0
+
+            for s in range(1, 4):
+                if (s == 1 and not sfa.bigrams) or (s > 1 and not sfa.skip_grams):
+                    continue
+                if window - s * sfa.window_size >= 0:
+                    key = (words[window - s * sfa.window_size] << sfa.word_bits) | word
+                    if sfa.levels > 1:
+                        key = (key, -1) if tuple_keys else key << sfa.level_bits
+                    bag[key] = bag.get(key, 0) + 1
+
+        bags.append(bag)
+
+    return bags
+
+
+def _random_series(n_instances=7, series_length=40):
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(n_instances, 1, series_length)).cumsum(axis=2)
+    # a repeated section so remove_repeat_words has words to remove
+    X[:, :, 20:30] = X[:, :, 20:21]
+    return X, rng.normal(size=n_instances)
+
+
+def _assert_bags_equal(bags, expected):
+    assert len(bags) == len(expected)
+    for bag, expected_bag in zip(bags, expected):
+        assert [(k, int(v)) for k, v in bag.items()] == list(expected_bag.items())
+
+
+@pytest.mark.parametrize("levels", [1, 3])
+@pytest.mark.parametrize(
+    "bigrams, skip_grams, remove_repeat_words",
+    [
+        (False, False, False),
+        (True, False, True),
+        (False, True, False),
+        (True, True, True),
+    ],
+)
+@pytest.mark.parametrize("typed_dict, n_jobs", [(False, 1), (True, 1), (True, 2)])
+@pytest.mark.parametrize("bag_buffer_mb", [64, 1e-4])
+def test_sfa_bags_equal_dict_reference(
+    monkeypatch,
+    levels,
+    bigrams,
+    skip_grams,
+    remove_repeat_words,
+    typed_dict,
+    n_jobs,
+    bag_buffer_mb,
+):
+    """Test that compiled bags match dict bags in keys, counts and key order.
+
+    A tiny bag buffer runs the bag kernel one case at a time.
+    """
+    monkeypatch.setattr(sfa_module, "_BAG_BUFFER_MB", bag_buffer_mb)
+    X, y = _random_series()
+
+    sfa = SFA(
+        word_length=6,
+        alphabet_size=4,
+        window_size=8,
+        levels=levels,
+        bigrams=bigrams,
+        skip_grams=skip_grams,
+        remove_repeat_words=remove_repeat_words,
+        typed_dict=typed_dict,
+        n_jobs=n_jobs,
+    ).fit(X, y)
+
+    bags = sfa.transform(X)[0]
+    assert isinstance(bags[0], dict) != (typed_dict and n_jobs == 1)
+    _assert_bags_equal(bags, _reference_bags(sfa, X))
+
+
+def test_sfa_transform_csr_equals_dict_bags():
+    """Test that CSR bags hold the same word counts as the dict bags."""
+    X, y = _random_series()
+    sfa = SFA(word_length=6, alphabet_size=4, window_size=8, levels=2, bigrams=True)
+    sfa.fit(X, y)
+
+    bags = sfa.transform(X)[0]
+    vocabulary = BagVocabulary()
+    csr = sfa.transform_csr(X, vocabulary=vocabulary, extend_vocabulary=True)
+
+    assert csr.n_words == len(set().union(*bags))
+    for i, bag in enumerate(bags):
+        ids = vocabulary.lookup(np.array(list(bag.keys()), dtype=np.int64)[:, None])
+        start, end = csr.indptr[i], csr.indptr[i + 1]
+        csr_bag = dict(zip(csr.indices[start:end].tolist(), csr.counts[start:end]))
+        assert {int(j): int(csr_bag[j]) for j in ids} == dict(zip(ids, bag.values()))
+        assert len(csr_bag) == len(bag)
+
+
+@pytest.mark.parametrize(
+    "levels, bigrams, skip_grams, remove_repeat_words",
+    [(1, True, False, False), (3, True, False, True), (2, True, True, False)],
+)
+def test_sfa_large_word_bags_equal_dict_reference(
+    levels, bigrams, skip_grams, remove_repeat_words
+):
+    """Test that bags of words over 64 bits match dict bags of python ints."""
+    X, y = _random_series(series_length=80)
+
+    sfa = SFA(
+        word_length=24,
+        alphabet_size=16,
+        window_size=32,
+        levels=levels,
+        bigrams=bigrams,
+        skip_grams=skip_grams,
+        remove_repeat_words=remove_repeat_words,
+    ).fit(X, y)
+
+    assert sfa.word_bits > 64
+    assert sfa._n_word_limbs() > 0
+    _assert_bags_equal(sfa.transform(X)[0], _reference_bags(sfa, X))
+
+
+def test_sfa_large_bigrams_keep_high_bit_words_distinct():
+    """Test that bigrams of words with the top bit set do not share a key.
+
+    Packing these bigrams into python ints from int64 words sign extends the
+    second word over the first, giving (a, w) and (b, w) the same key.
+    """
+    word = (1 << 63) | 5
+    first_words = [1, 2]
+    sequence = [first_words[0], word, first_words[1], word]
+    words = np.zeros((1, len(sequence), 2), dtype=np.uint64)
+    words[0, :, 0] = sequence
+
+    indptr, keys, _, counts = _create_large_bags(
+        words, 1, len(sequence), 64, 0, 1, False, True, False
+    )
+    bag = dict(zip(_limbs_to_ints(keys), counts.tolist()))
+
+    signed_word = int(np.uint64(word).astype(np.int64))
+    assert (first_words[0] << 64) | signed_word == (first_words[1] << 64) | signed_word
+    for first_word in first_words:
+        assert bag[(first_word << 64) | word] == 1
+    assert bag[(word << 64) | first_words[1]] == 1
+    assert bag[word] == 2
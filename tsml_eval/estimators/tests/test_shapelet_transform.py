@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Tests for the regression random shapelet transform."""
+
+import numpy as np
+import pytest
+from scipy.stats import linregress
+
+from tsml_eval.estimators.regression.transformations.shapelet_transform import (
+    RandomShapeletTransform,
+    calc_correlation,
+)
+from tsml_eval.utils.test_utils import _random_walks
+
+
+def test_calc_correlation():
+    """Test calc_correlation against the r squared of scipy linregress."""
+    rng = np.random.RandomState(0)
+    orderline = list(zip(rng.random_sample(20), rng.random_sample(20)))
+
+    _, _, r_value, _, _ = linregress(*np.array(orderline).T)
+    assert calc_correlation(orderline) == pytest.approx(r_value**2)
+    assert calc_correlation([(1.0, y) for _, y in orderline]) == 0.0
+
+
+def test_shapelet_transform_n_jobs():
+    """Test that serial and threaded kernels find the same shapelets and output."""
+    X, y = _random_walks(n_instances=15, n_dims=2, series_length=30)
+
+    transforms = [
+        RandomShapeletTransform(
+            n_shapelet_samples=50, max_shapelets=10, n_jobs=n_jobs, random_state=0
+        ).fit(X, y)
+        for n_jobs in [1, 2]
+    ]
+
+    assert [s[:6] for s in transforms[0].shapelets] == [
+        s[:6] for s in transforms[1].shapelets
+    ]
+    np.testing.assert_array_almost_equal(
+        transforms[0].transform(X), transforms[1].transform(X)
+    )
+
+
+def test_shapelet_transform_parallel_backend_deprecated():
+    """Test that setting parallel_backend raises a FutureWarning."""
+    X, y = _random_walks(n_instances=15, n_dims=2, series_length=30)
+
+    with pytest.warns(FutureWarning, match="parallel_backend"):
+        RandomShapeletTransform(
+            n_shapelet_samples=10, parallel_backend="threading", random_state=0
+        ).fit(X, y)
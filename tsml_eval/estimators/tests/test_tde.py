@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""Tests for the regression Temporal Dictionary Ensemble."""
+
+import numpy as np
+import pytest
+from sklearn.utils import check_random_state
+
+from tsml_eval.estimators.regression.dictionary_based.tde import (
+    IndividualTDE,
+    TemporalDictionaryEnsemble,
+)
+from tsml_eval.utils.test_utils import _random_walks
+
+
+def _dict_nn(test_bag, train_bags, exclude=None, tie_draws=None):
+    # 1-NN by histogram intersection of dict bags, ties broken with the draws in
+    # the order they are found or kept at the first neighbour without draws
+    best_sim = -1
+    nn = None
+    n_ties = 0
+    for j, bag in enumerate(train_bags):
+        if j == exclude:
+            continue
+        sim = sum(min(count, bag.get(word, 0)) for word, count in test_bag.items())
+        if sim > best_sim:
+            best_sim = sim
+            nn = j
+        elif sim == best_sim and tie_draws is not None:
+            if tie_draws[n_ties] < 0.5:
+                nn = j
+            n_ties += 1
+    return nn, n_ties
+
+
+def test_tde_batch_size_independent_of_n_jobs():
+    """Test that a fixed batch_size gives the same ensemble for any n_jobs."""
+    X, y = _random_walks()
+
+    preds = [
+        TemporalDictionaryEnsemble(
+            n_parameter_samples=8,
+            max_ensemble_size=3,
+            randomly_selected_params=4,
+            batch_size=2,
+            n_jobs=n_jobs,
+            random_state=0,
+        )
+        .fit(X, y)
+        .predict(X)
+        for n_jobs in [1, 2]
+    ]
+
+    np.testing.assert_array_equal(preds[0], preds[1])
+
+
+@pytest.mark.parametrize("save_train_predictions", [True, False])
+def test_tde_members_drop_train_similarity(save_train_predictions):
+    """Test that ensemble members do not keep a train similarity matrix."""
+    X, y = _random_walks()
+
+    tde = TemporalDictionaryEnsemble(
+        n_parameter_samples=4,
+        max_ensemble_size=2,
+        save_train_predictions=save_train_predictions,
+        random_state=0,
+    )
+    tde.fit(X, y)
+    assert all(getattr(e, "_train_similarity", None) is None for e in tde.estimators_)
+
+    assert tde._get_train_preds(X, y).shape == (len(y),)
+    assert all(getattr(e, "_train_similarity", None) is None for e in tde.estimators_)
+
+
+@pytest.mark.parametrize("batch_size", [0, -1, 1.5])
+def test_tde_invalid_batch_size(batch_size):
+    """Test that batch_size must be a positive int."""
+    X, y = _random_walks()
+
+    with pytest.raises(ValueError, match="batch_size"):
+        TemporalDictionaryEnsemble(n_parameter_samples=4, batch_size=batch_size).fit(
+            X, y
+        )
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_individual_tde_nn_equals_dict_reference(n_jobs):
+    """Test CSR nearest neighbours against dict bags, including ties.
+
+    Duplicated train series give tied neighbours, which must follow the shared
+    sequence of tie draws.
+    """
+    X, y = _random_walks(n_instances=8)
+    X = np.concatenate((X, X[:4]))
+    y = np.concatenate((y, y[:4] + 1))
+    X_test = np.concatenate((X[:6], _random_walks(n_instances=14)[0][8:]))
+
+    tde = IndividualTDE(
+        window_size=8, word_length=6, typed_dict=False, n_jobs=n_jobs, random_state=0
+    ).fit(X, y)
+
+    sfa = tde._transformers[0]
+    train_bags = sfa.transform(X)[0]
+    test_bags = sfa.transform(X_test)[0]
+    tie_draws = check_random_state(0).random_sample(len(y))
+
+    nn = [_dict_nn(bag, train_bags, tie_draws=tie_draws) for bag in test_bags]
+    assert sum(n_ties for _, n_ties in nn) > 0
+    np.testing.assert_array_equal(tde.predict(X_test), y[[j for j, _ in nn]])
+
+    loo = [_dict_nn(bag, train_bags, exclude=i)[0] for i, bag in enumerate(train_bags)]
+    np.testing.assert_array_equal(tde._train_predict_all(), y[loo])
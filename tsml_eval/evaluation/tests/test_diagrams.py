@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""Tests for the work in progress evaluation diagrams in tsml_eval._wip."""
+
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import wilcoxon
+
+from tsml_eval._wip.evaluation.diagrams import (
+    _batch_diagrams,
+    critical_difference_statistics,
+    pairwise_comparison,
+    render_diagrams,
+)
+from tsml_eval._wip.evaluation.diagrams._critical_difference_diagram import (
+    _form_cliques_from_matrix,
+)
+
+
+def test_critical_difference_statistics():
+    """Test the matrix based critical difference statistics."""
+    rng = np.random.RandomState(0)
+    scores = rng.random_sample((4, 20)) + np.arange(4)[:, None] * 0.5
+    rows = [
+        (f"cls{i}", f"data{j}", scores[i, j])
+        for i in range(scores.shape[0])
+        for j in range(scores.shape[1])
+    ]
+    df = pd.DataFrame(rows, columns=["estimator", "dataset", "ACC"]).sample(
+        frac=1, random_state=0
+    )
+
+    statistics = critical_difference_statistics(df, n_jobs=2)
+
+    assert list(statistics["estimators"]) == ["cls0", "cls1", "cls2", "cls3"]
+    assert np.all(np.diff(statistics["average_ranks"]) <= 0)
+    assert np.allclose(statistics["p_values"], statistics["p_values"].T)
+    assert np.all(statistics["significant"] == statistics["significant"].T)
+    assert np.isclose(
+        statistics["p_values"][0, 3],
+        wilcoxon(scores[0], scores[3], zero_method="pratt")[1],
+    )
+
+
+def test_form_cliques_ordered():
+    """Test the ordered clique formation against the clique enumeration."""
+    ranks = np.array([1.0, 1.2, 1.5, 2.4, 2.6, 3.5, 3.6])
+    significant = np.abs(ranks[:, None] - ranks[None, :]) > 0.6
+
+    ordered = _form_cliques_from_matrix(significant, method="ordered")
+    cliques = _form_cliques_from_matrix(significant, method="clique")
+
+    assert ordered == [[0, 1, 2], [3, 4], [5, 6]]
+    assert sorted(sorted(c) for c in cliques if len(c) > 1) == ordered
+
+
+def test_pairwise_comparison():
+    """Test the pairwise win/draw/loss and p value matrices."""
+    scores = np.array(
+        [
+            [0.5, 0.6, 0.7, 0.8, 0.9],
+            [0.5, 0.7, 0.6, 0.9, 1.0],
+            [0.1, 0.2, 0.3, 0.4, 0.5],
+        ]
+    )
+
+    comparison = pairwise_comparison(scores, ["a", "b", "c"], n_jobs=2)
+
+    assert comparison["wins"][0, 1] == 1
+    assert comparison["draws"][0, 1] == 1
+    assert comparison["losses"][0, 1] == 3
+    assert comparison["wins"][2].sum() == 0
+    assert np.all(
+        comparison["wins"] + comparison["draws"] + comparison["losses"]
+        == scores.shape[1]
+    )
+    assert np.isclose(comparison["mean_differences"][0, 2], 0.4)
+    assert np.allclose(comparison["p_values"], comparison["p_values"].T)
+
+
+def _random_metric_results():
+    rng = np.random.RandomState(0)
+    rows = [
+        (f"cls{i}", f"data{j}", rng.random_sample(), rng.random_sample())
+        for i in range(3)
+        for j in range(10)
+    ]
+    return pd.DataFrame(rows, columns=["estimator", "dataset", "ACC", "AUROC"])
+
+
+def test_render_diagrams(tmp_path):
+    """Test batch rendering of diagrams skips outputs which are up to date."""
+    df = _random_metric_results()
+
+    specifications = [
+        {
+            "diagram": "critical_difference",
+            "output_path": str(tmp_path / f"cd_{metric}.png"),
+            "metric_results": df,
+            "metric": metric,
+        }
+        for metric in ["ACC", "AUROC"]
+    ]
+    specifications.append(
+        {
+            "diagram": "scatter",
+            "output_path": str(tmp_path / "scatter" / "cls0_cls1.png"),
+            "metric_results": df,
+            "metric": "ACC",
+            "estimators": ["cls0", "cls1"],
+            "kwargs": {"figure_width": 4, "figure_height": 4},
+        }
+    )
+
+    written = render_diagrams(specifications, n_jobs=2)
+    assert written == [spec["output_path"] for spec in specifications]
+    assert all(os.path.exists(path) for path in written)
+
+    assert render_diagrams(specifications, n_jobs=2) == []
+    assert len(render_diagrams(specifications, overwrite=True)) == 3
+
+
+def test_render_diagrams_keeps_pyplot_state(tmp_path):
+    """Test that rendering in process leaves the pyplot backend and figures alone."""
+    backend = plt.get_backend()
+    figure = plt.figure()
+
+    render_diagrams(
+        [
+            {
+                "diagram": "critical_difference",
+                "output_path": str(tmp_path / "cd.png"),
+                "metric_results": _random_metric_results(),
+            }
+        ]
+    )
+
+    assert plt.get_backend() == backend
+    assert plt.get_fignums() == [figure.number]
+    plt.close(figure)
+
+
+def test_render_diagrams_shares_equal_statistics(tmp_path, monkeypatch):
+    """Test that statistics are shared between equal results frames."""
+    calls = []
+
+    def _count_statistics(*args, **kwargs):
+        calls.append(1)
+        return critical_difference_statistics(*args, **kwargs)
+
+    monkeypatch.setattr(
+        _batch_diagrams, "critical_difference_statistics", _count_statistics
+    )
+
+    specifications = [
+        {
+            "diagram": "critical_difference",
+            "output_path": str(tmp_path / f"cd_{i}.png"),
+            "metric_results": _random_metric_results(),
+            "metric": "ACC",
+        }
+        for i in range(2)
+    ]
+    specifications.append(
+        {
+            "diagram": "critical_difference",
+            "output_path": str(tmp_path / "cd_alpha.png"),
+            "metric_results": _random_metric_results(),
+            "metric": "ACC",
+            "kwargs": {"alpha": 0.1},
+        }
+    )
+    render_diagrams(specifications)
+
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize(
+    "diagram, kwargs",
+    [
+        ("critical_difference", {"n_jobs": 2}),
+        ("scatter", {"output_path": "scatter"}),
+    ],
+)
+def test_render_diagrams_invalid_kwargs(tmp_path, diagram, kwargs):
+    """Test that keyword arguments the diagram does not plot with are rejected."""
+    with pytest.raises(ValueError, match="Unknown keyword arguments"):
+        render_diagrams(
+            [
+                {
+                    "diagram": diagram,
+                    "output_path": str(tmp_path / "diagram.png"),
+                    "metric_results": _random_metric_results(),
+                    "estimators": ["cls0", "cls1"],
+                    "kwargs": kwargs,
+                }
+            ]
+        )
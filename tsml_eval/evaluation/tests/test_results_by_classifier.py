@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Tests for the work in progress local results loading in tsml_eval._wip."""
+
+import os
+
+import numpy as np
+
+from tsml_eval._wip.results.results_by_classifier import (
+    _results_stores,
+    get_classifier_results,
+    get_single_classifier_results,
+    load_classifier_results_store,
+)
+
+ROOT = os.path.join(os.path.dirname(__file__), "..", "..", "..")
+RESULTS_DIR = os.path.join(ROOT, "results", "tsml", "ByClassifier", "Univariate")
+
+
+def test_classifier_results_store():
+    """Test that results collated from the store match the csv files."""
+    classifiers = ["HC2", "TDE"]
+    datasets = ["Adiac", "NotADataset", "Yoga"]
+    files = set(os.listdir(RESULTS_DIR))
+
+    store = load_classifier_results_store(root=ROOT)
+    assert store["results"].shape == (
+        len(store["classifiers"]),
+        len(store["datasets"]),
+        30,
+    )
+    assert set(os.listdir(RESULTS_DIR)) == files
+
+    results = get_classifier_results(classifiers, datasets, resample=2, root=ROOT)
+    for j, cls in enumerate(classifiers):
+        csv_results = get_single_classifier_results(cls, root=ROOT)
+        assert results[0, j] == csv_results["Adiac"][2]
+        assert np.isnan(results[1, j])
+        assert results[2, j] == csv_results["Yoga"][2]
+
+
+def test_classifier_results_store_cache_path(tmp_path):
+    """Test that the store is written to and read from cache_path."""
+    cache_path = str(tmp_path / "cache.npz")
+
+    store = load_classifier_results_store(root=ROOT, cache_path=cache_path)
+    assert os.path.exists(cache_path)
+
+    _results_stores.clear()
+    cached = load_classifier_results_store(root=ROOT, cache_path=cache_path)
+    for name in store:
+        np.testing.assert_array_equal(cached[name], store[name])
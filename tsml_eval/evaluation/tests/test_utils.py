@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Tests for the work in progress evaluation utilities in tsml_eval._wip."""
+
+import numpy as np
+
+from tsml_eval._wip.evaluation import (
+    StreamingMetricAggregator,
+    bootstrap_confidence_intervals,
+)
+
+
+def test_bootstrap_confidence_intervals():
+    """Test vectorised bootstrap confidence intervals."""
+    rng = np.random.RandomState(0)
+    results = rng.random_sample((3, 50, 10))
+    results[2] += 0.5
+
+    (
+        means,
+        intervals,
+        differences,
+        difference_intervals,
+    ) = bootstrap_confidence_intervals(results, n_bootstrap=200, random_state=0)
+
+    assert np.allclose(means, results.mean(axis=(1, 2)))
+    assert np.all(intervals[:, 0] <= means) and np.all(means <= intervals[:, 1])
+    assert np.allclose(differences, -differences.T)
+    assert difference_intervals.shape == (3, 3, 2)
+    assert difference_intervals[2, 0, 0] > 0
+    assert difference_intervals[0, 2, 1] < 0
+
+    again = bootstrap_confidence_intervals(results, n_bootstrap=200, random_state=0)
+    assert np.array_equal(intervals, again[1])
+
+
+def test_streaming_metric_aggregator():
+    """Test the streaming aggregator matches statistics over all resamples."""
+    rng = np.random.RandomState(0)
+    values = rng.random_sample((2, 3, 10, 2))
+    aggregator = StreamingMetricAggregator(
+        [{"name": "ACC", "callable": None}, {"name": "F1", "callable": None}]
+    )
+    for resample in range(values.shape[2]):
+        for i in range(values.shape[0]):
+            for j in range(values.shape[1]):
+                aggregator.update(
+                    f"cls{i}",
+                    f"data{j}",
+                    {
+                        "ACC": values[i, j, resample, 0],
+                        "F1": values[i, j, resample, 1],
+                    },
+                )
+
+    summary = aggregator.summary().set_index(["estimator", "dataset", "metric"])
+    row = summary.loc[("cls1", "data2", "F1")]
+    assert row["count"] == 10
+    assert np.isclose(row["mean"], values[1, 2, :, 1].mean())
+    assert np.isclose(row["std"], values[1, 2, :, 1].std(ddof=1))
+    assert row["min"] == values[1, 2, :, 1].min()
+    assert row["max"] == values[1, 2, :, 1].max()
+
+    ranks = aggregator.rank_summary()
+    assert len(ranks) == 4
+    assert np.allclose(ranks.groupby("metric")["average_rank"].sum(), 3)
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import numpy as np
+
 EXEMPT_ESTIMATOR_NAMES = ["ColumnEnsembleRegressor", "GridSearchCV"]
 
 
@@ -29,3 +31,11 @@ def _check_set_method(
                 estimator_dict[c_name] = True
             elif c_name not in estimator_dict:
                 estimator_dict[c_name] = False
+
+
+def _random_walks(n_instances=20, n_dims=1, series_length=40, random_state=0):
+    # random walk series with a regression target from the start of the first
+    # dimension
+    rng = np.random.RandomState(random_state)
+    X = rng.normal(size=(n_instances, n_dims, series_length)).cumsum(axis=2)
+    return X, X[:, 0, :5].sum(axis=1)